@@ -1,31 +1,101 @@
+import os
+import sys
 import streamlit as st
+import numpy as np
 import pandas as pd
-import joblib
+import matplotlib.pyplot as plt
 
-# Load model
-model = joblib.load('models/random_forest_model.pkl')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from batch_predict import read_input_chunks, score_chunks, file_format
+from forest_engine import DEFAULT_QUANTILES, load_forest_engine
+from feature_schema import load_schema
+from feature_store import FeatureStore
+from instrumentation import measure
+from scenarios import plot_heatmap, run_sweep
+
+# prediction timings/memory are only recorded when CROP_METRICS names a file
+# (e.g. CROP_METRICS=results/metrics.jsonl streamlit run app.py)
+
+# Load model (kept resident across reruns, reloaded only when the pickle changes)
+# as the flattened array engine: single rows and prediction ranges skip sklearn's per-call
+# setup, large sweep/batch chunks are handed back to sklearn by batch_predict.predict_matrix
+model = load_forest_engine('models/random_forest_model.pkl')
+schema = load_schema('models/random_forest_model.pkl', model)
+# lags and macro figures as of any season, memory-mapped from the prebuilt store
+store = FeatureStore.load('models/feature_store')
 
 # Streamlit app
 st.title("Sri Lankan Rice Yield Predictor (Season-Specific)")
 
-# Input fields
-year = st.number_input("Year", min_value=2025, max_value=2030, value=2025)
-season = st.selectbox("Season", ["Maha", "Yala"])
-sown_ha = st.number_input("Sown Area (Ha)", min_value=0.0, value=500.0)
-sown_to_harvested_ratio = st.number_input("Sown-to-Harvested Ratio", min_value=0.0, max_value=1.0, value=0.95)
-rfh_avg = st.number_input("Average Rainfall (mm)", min_value=0.0, value=100.0)
-
-# Prepare input data
-input_data = pd.DataFrame({
-    'Sown_Ha': [sown_ha],
-    'Sown_to_Harvest_Ratio': [sown_to_harvested_ratio],
-    'rfh_avg': [rfh_avg],
-    'r1h_avg': [rfh_avg],
-    'Prev_Rainfall': [rfh_avg],
-    'Season_Encoded': [1 if season == 'Maha' else 0]
-})
-
-# Predict
-if st.button("Predict Yield"):
-    prediction = model.predict(input_data)[0]
-    st.success(f"Predicted Rice Yield for {season} {year}: {prediction:.2f} Kg/Ha")
\ No newline at end of file
+mode = st.radio("Mode", ["Single prediction", "Batch file upload", "Scenario sweep"], horizontal=True)
+
+if mode == "Single prediction":
+    # Input fields
+    year = st.number_input("Year", min_value=2025, max_value=2030, value=2025)
+    season = st.selectbox("Season", ["Maha", "Yala"])
+    sown_ha = st.number_input("Sown Area (Ha)", min_value=0.0, value=500.0)
+    sown_to_harvested_ratio = st.number_input("Sown-to-Harvested Ratio", min_value=0.0, max_value=1.0, value=0.95)
+    rfh_avg = st.number_input("Average Rainfall (mm)", min_value=0.0, value=100.0)
+
+    # Prepare input data: the store fills the previous season's rainfall, inflation and the
+    # other rainfall statistics as of the requested season, the schema derives
+    # Season_Encoded/Crisis_Indicator and falls back to training defaults for anything left
+    row = store.fill({
+        'Year': year,
+        'season': season,
+        'Sown_Ha': sown_ha,
+        'Sown_to_Harvest_Ratio': sown_to_harvested_ratio,
+        'rfh_avg': rfh_avg,
+    })
+    st.caption(f"Previous {season} rainfall: {row['Prev_Rainfall']:.1f} mm, inflation: {row['Inflation']:.1f}%")
+    input_data = schema.build_matrix(row)
+
+    # Predict
+    if st.button("Predict Yield"):
+        # mean and 5th/95th percentiles of the per-tree predictions, from one pass over the forest
+        with measure('app.single_prediction', rows_in=1) as record:
+            prediction = model.predict_distribution(input_data)
+            record['rows_out'] = len(prediction['mean'])
+        st.success(f"Predicted Rice Yield for {season} {year}: {prediction['mean'][0]:.2f} Kg/Ha")
+        st.info(f"90% range across the forest's trees: {prediction['p5'][0]:.2f} - {prediction['p95'][0]:.2f} Kg/Ha "
+                f"(std {prediction['std'][0]:.2f})")
+elif mode == "Scenario sweep":
+    # every combination of the ranges below is scored in batched chunks
+    year = st.number_input("Year", min_value=2025, max_value=2030, value=2025)
+    season = st.selectbox("Season", ["Maha", "Yala"])
+    sown_range = st.slider("Sown Area (Ha)", min_value=0.0, max_value=1500.0, value=(200.0, 800.0))
+    rain_range = st.slider("Average Rainfall (mm)", min_value=0.0, max_value=300.0, value=(30.0, 200.0))
+    ratio_range = st.slider("Sown-to-Harvested Ratio", min_value=0.0, max_value=1.0, value=(0.85, 1.0))
+    steps = st.slider("Steps per range", min_value=5, max_value=100, value=40)
+
+    if st.button("Run Sweep"):
+        levers = {
+            'Year': [year],
+            'season': [season],
+            'Sown_Ha': np.linspace(*sown_range, steps),
+            'rfh_avg': np.linspace(*rain_range, steps),
+            'Sown_to_Harvest_Ratio': np.linspace(*ratio_range, steps),
+        }
+        with measure('app.scenario_sweep') as record:
+            result = run_sweep(model, schema, levers, pairs=[('Sown_Ha', 'rfh_avg')])
+            record['rows_in'] = record['rows_out'] = result['n_scenarios']
+        st.success(f"Scored {result['n_scenarios']} scenarios in {result['seconds']:.2f}s, "
+                   f"mean predicted yield {result['mean_yield']:.2f} Kg/Ha")
+        fig, ax = plt.subplots(figsize=(10, 6))
+        plot_heatmap(result['heatmaps'][('Sown_Ha', 'rfh_avg')].round(0), ax=ax)
+        st.pyplot(fig)
+        for name in ['Sown_Ha', 'rfh_avg', 'Sown_to_Harvest_Ratio']:
+            st.line_chart(result['partial_dependence'][name].set_index(name)['mean_yield'])
+else:
+    uploaded = st.file_uploader("Input rows (CSV or Parquet)", type=['csv', 'parquet'])
+    intervals = st.checkbox("Include prediction ranges (std, 5th/50th/95th percentiles)", value=True)
+    if uploaded is not None and st.button("Predict Yields"):
+        # same chunked scoring path as src/batch_predict.py
+        chunks = read_input_chunks(uploaded, fmt=file_format(uploaded.name), typed_columns=schema.input_columns)
+        quantiles = DEFAULT_QUANTILES if intervals else None
+        with measure('app.batch_prediction') as record:
+            results = pd.concat(score_chunks(model, chunks, schema, fill_defaults=True, quantiles=quantiles), ignore_index=True)
+            record['rows_in'] = record['rows_out'] = len(results)
+        st.success(f"Scored {len(results)} rows")
+        st.dataframe(results)
+        st.download_button("Download predictions", results.to_csv(index=False), file_name='predictions.csv', mime='text/csv')
@@ -0,0 +1,187 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.ensemble import RandomForestRegressor
+from feature_schema import build_schema
+from model_registry import MODEL_PATH, load_model
+from storage import read_table, table_path, write_table
+
+RESULTS_PATH = table_path('results/backtest_predictions.csv')
+CURVES_PATH = table_path('results/backtest_error_curves.csv')
+# the deployed model's own test-set predictions, written by modeling.py
+HOLDOUT_PATH = table_path('results/holdout_predictions.csv')
+FIRST_CUTOFF = 1990
+# the cutoff of modeling.py's train/test split (visualize_results.py --backtest-cutoff)
+HOLDOUT_CUTOFF = 2018
+SEASONS = ['Maha', 'Yala']
+DEFAULT_PARAMS = {'n_estimators': 150, 'max_depth': 20, 'max_features': 'sqrt', 'min_samples_leaf': 1}
+TUNED_PARAMS = ['n_estimators', 'max_depth', 'min_samples_leaf', 'max_features']
+
+_shared = {}
+
+
+def _init_worker(data):
+    # runs once per worker process, so the arrays are sent once rather than with every fold
+    _shared.update(data)
+
+
+def model_params(path=MODEL_PATH):
+    # the tuned hyperparameters of the trained forest, or the defaults without one
+    try:
+        model = load_model(path)
+    except (OSError, ValueError):
+        return dict(DEFAULT_PARAMS)
+    params = model.get_params() if hasattr(model, 'get_params') else {}
+    return {name: params.get(name, DEFAULT_PARAMS[name]) for name in TUNED_PARAMS}
+
+
+def fit_fold(cutoff, data=None, horizon=None):
+    # refit on every season up to the cutoff year and predict the later ones
+    # (all of them, or the next `horizon` years)
+    data = data or _shared
+    years = data['years']
+    train = years <= cutoff
+    test = years > cutoff if horizon is None else (years > cutoff) & (years <= cutoff + horizon)
+    model = RandomForestRegressor(**data['params'], random_state=42, n_jobs=1)
+    model.fit(data['X'][train], data['y'][train])
+    rows = np.flatnonzero(test)
+    return cutoff, rows, model.predict(data['X'][rows]), int(train.sum())
+
+
+def run_backtest(df, schema, params=None, first_cutoff=FIRST_CUTOFF, last_cutoff=None, horizon=None, max_workers=None):
+    # Rolling-origin backtest: one refit per cutoff year, folds spread over a process pool,
+    # every fold's predictions collected into one table
+    df = df.reset_index(drop=True)
+    years = df['Year'].to_numpy(dtype=np.int64)
+    last_cutoff = int(years.max()) - 1 if last_cutoff is None else last_cutoff
+    cutoffs = [c for c in range(first_cutoff, last_cutoff + 1) if (years <= c).any() and (years > c).any()]
+    data = {
+        'X': np.ascontiguousarray(schema.build_matrix(df, fill_defaults=False)),
+        'y': df[schema.target].to_numpy(dtype=np.float64),
+        'years': years,
+        'params': dict(params or DEFAULT_PARAMS),
+    }
+
+    parts = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data,)) as pool:
+        futures = [pool.submit(fit_fold, cutoff, horizon=horizon) for cutoff in cutoffs]
+        for future in as_completed(futures):
+            cutoff, rows, predictions, n_train = future.result()
+            parts.append(pd.DataFrame({
+                'cutoff': cutoff,
+                'Year': years[rows],
+                'season': df['season'].astype(str).to_numpy()[rows],
+                'horizon': years[rows] - cutoff,
+                'actual': data['y'][rows],
+                'predicted': predictions,
+                'train_rows': n_train,
+            }))
+    results = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+        columns=['cutoff', 'Year', 'season', 'horizon', 'actual', 'predicted', 'train_rows'])
+    results['error'] = results['actual'] - results['predicted']
+    results = results.sort_values(['cutoff', 'Year', 'season']).reset_index(drop=True)
+    print(f"Backtested {len(cutoffs)} cutoffs, {len(results)} predictions")
+    return results
+
+
+def error_curves(results, by='cutoff'):
+    # RMSE/MAE/bias per value of `by` ('cutoff', 'Year' or 'horizon') and season, plus 'All'
+    scored = results.assign(squared=results['error'] ** 2, absolute=results['error'].abs())
+    curves = []
+    for frame in [scored, scored.assign(season='All')]:
+        grouped = frame.groupby([by, 'season'])
+        curves.append(pd.DataFrame({
+            'rmse': grouped['squared'].mean() ** 0.5,
+            'mae': grouped['absolute'].mean(),
+            'bias': grouped['error'].mean(),
+            'n': grouped.size(),
+        }).reset_index())
+    return pd.concat(curves, ignore_index=True).sort_values([by, 'season']).reset_index(drop=True)
+
+
+def holdout(results, cutoff=HOLDOUT_CUTOFF):
+    # the predictions of one fold as a test set with the usual column names
+    fold = results[results['cutoff'] == cutoff]
+    if fold.empty:
+        raise ValueError(f"No backtest fold with cutoff {cutoff}, rerun backtesting.py with it in range")
+    return fold.rename(columns={'actual': 'Avg_Yield_Kg_Ha', 'predicted': 'Predicted_Yield'})
+
+
+def plot_error_curves(curves, by, path):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for season, frame in curves.groupby('season'):
+        ax.plot(frame[by], frame['rmse'], label=season, marker='o', linestyle='--' if season == 'All' else '-')
+    ax.set_title(f'Backtest RMSE by {by}')
+    ax.set_xlabel(by.capitalize())
+    ax.set_ylabel('RMSE (Kg/Ha)')
+    ax.legend()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_actual_vs_predicted(test_df, path, title='Actual vs. Predicted Rice Yield (Test Set)'):
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(10, 6))
+    for season in SEASONS:
+        season_data = test_df[test_df['season'] == season]
+        plt.plot(season_data['Year'], season_data['Avg_Yield_Kg_Ha'], label=f'{season} Actual', marker='o')
+        plt.plot(season_data['Year'], season_data['Predicted_Yield'], label=f'{season} Predicted', marker='x', linestyle='--')
+    plt.title(title)
+    plt.xlabel('Year')
+    plt.ylabel('Average Yield (Kg/Ha)')
+    plt.legend()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_error_distribution(test_df, path):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.figure(figsize=(10, 6))
+    for season in SEASONS:
+        season_data = test_df[test_df['season'] == season]
+        errors = season_data['Avg_Yield_Kg_Ha'] - season_data['Predicted_Yield']
+        sns.kdeplot(errors, label=season, fill=True)
+    plt.title('Prediction Error Distribution by Season')
+    plt.xlabel('Error (Kg/Ha)')
+    plt.ylabel('Density')
+    plt.legend()
+    plt.savefig(path)
+    plt.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest: refit the forest at every cutoff year")
+    parser.add_argument('--first-cutoff', type=int, default=FIRST_CUTOFF)
+    parser.add_argument('--last-cutoff', type=int, default=None)
+    parser.add_argument('--horizon', type=int, default=None, help="only score this many years after each cutoff")
+    parser.add_argument('--workers', type=int, default=None, help="size of the process pool")
+    parser.add_argument('--model', default=MODEL_PATH, help="take the hyperparameters from this trained forest")
+    parser.add_argument('--output', default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
+    schema = build_schema(df[df['Year'] <= args.first_cutoff])
+    results = run_backtest(df, schema, model_params(args.model), args.first_cutoff, args.last_cutoff,
+                           args.horizon, args.workers)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    write_table(results, args.output)
+    print(f"Successfully created {args.output}")
+
+    # per-season error by cutoff, by years ahead and by the year being predicted
+    all_curves = []
+    for by in ['cutoff', 'horizon', 'Year']:
+        curves = error_curves(results, by)
+        path = os.path.join(os.path.dirname(args.output) or '.', f'backtest_rmse_by_{by.lower()}.png')
+        plot_error_curves(curves, by, path)
+        print(f"Successfully created {path}")
+        all_curves.append(curves.rename(columns={by: 'value'}).assign(by=by))
+    write_table(pd.concat(all_curves, ignore_index=True), CURVES_PATH)
+    print(f"Successfully created {CURVES_PATH}")
+    # one-year-ahead error for each cutoff: how the model holds up over time
+    one_ahead = error_curves(results[results['horizon'] == 1], 'cutoff')
+    print(one_ahead[one_ahead['season'] == 'All'].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
@@ -0,0 +1,148 @@
+import argparse
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from feature_schema import load_schema
+from forest_engine import DEFAULT_QUANTILES, ENGINE_MAX_ROWS, load_forest_engine
+from model_registry import load_model
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def file_format(name):
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext == '.csv':
+        return 'csv'
+    raise ValueError(f"Unsupported input format '{ext}', expected .csv or .parquet")
+
+
+def _csv_header(source):
+    if hasattr(source, 'seek'):
+        start = source.tell()
+        columns = pd.read_csv(source, nrows=0).columns
+        source.seek(start)
+        return columns
+    return pd.read_csv(source, nrows=0).columns
+
+
+def read_input_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, fmt=None, typed_columns=None):
+    # source can be a path or a file-like object (e.g. a Streamlit upload). With typed_columns
+    # (e.g. schema.input_columns), every other CSV column is read as text, so a pass-through
+    # column that is empty in early chunks and text later keeps one dtype across chunks.
+    fmt = fmt or file_format(getattr(source, 'name', source))
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        dtype = None
+        if typed_columns is not None:
+            dtype = {column: str for column in _csv_header(source) if column not in set(typed_columns)}
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=dtype)
+
+
+def predict_matrix(model, X, chunk_size=DEFAULT_CHUNK_SIZE):
+    # a flattened forest keeps small batches, large ones go to the sklearn forest behind it
+    if X.shape[0] > ENGINE_MAX_ROWS and getattr(model, 'sklearn_model', None) is not None:
+        model = model.sklearn_model
+    predictions = np.empty(X.shape[0], dtype=np.float64)
+    with warnings.catch_warnings():
+        # X is built in schema order, so sklearn's feature-name check has nothing to add
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        # one vectorized predict per chunk instead of one per row
+        for start in range(0, X.shape[0], chunk_size):
+            predictions[start:start + chunk_size] = model.predict(X[start:start + chunk_size])
+    return predictions
+
+
+def predict_batch(model, df, schema, chunk_size=DEFAULT_CHUNK_SIZE, fill_defaults=False):
+    if hasattr(model, 'predict_frame'):
+        # a ShardRouter picks each row's shard from its season/adm_id columns
+        return model.predict_frame(df, fill_defaults=fill_defaults)
+    return predict_matrix(model, schema.build_matrix(df, fill_defaults=fill_defaults), chunk_size)
+
+
+def predict_distribution_batch(model, df, schema, quantiles=DEFAULT_QUANTILES, fill_defaults=False):
+    # per-tree spread of a flattened forest (see forest_engine.load_forest_engine)
+    if hasattr(model, 'predict_distribution_frame'):
+        return model.predict_distribution_frame(df, quantiles, fill_defaults=fill_defaults)
+    if not hasattr(model, 'predict_distribution'):
+        raise TypeError(f"{type(model).__name__} has no per-tree outputs, load the model with load_forest_engine")
+    return model.predict_distribution(schema.build_matrix(df, fill_defaults=fill_defaults), quantiles)
+
+
+def distribution_columns(distribution):
+    # 'mean' keeps the usual Predicted_Yield name, the rest become suffixed columns
+    return {'Predicted_Yield' if name == 'mean' else f"Predicted_Yield_{name.capitalize()}": values
+            for name, values in distribution.items()}
+
+
+def score_chunks(model, chunks, schema, fill_defaults=False, quantiles=None):
+    for chunk in chunks:
+        chunk = chunk.copy()
+        if quantiles is None:
+            chunk['Predicted_Yield'] = predict_batch(model, chunk, schema, chunk_size=max(len(chunk), 1), fill_defaults=fill_defaults)
+        else:
+            distribution = predict_distribution_batch(model, chunk, schema, quantiles, fill_defaults=fill_defaults)
+            for name, values in distribution_columns(distribution).items():
+                chunk[name] = values
+        yield chunk
+
+
+def score_file(model, schema, input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, fill_defaults=False, quantiles=None):
+    out_fmt = file_format(output_path)
+    writer = None
+    n_rows = 0
+    try:
+        chunks = read_input_chunks(input_path, chunk_size, typed_columns=schema.input_columns)
+        for i, scored in enumerate(score_chunks(model, chunks, schema, fill_defaults, quantiles)):
+            # results are written as they are produced so memory stays bounded by the chunk size
+            if out_fmt == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(scored, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                elif not table.schema.equals(writer.schema):
+                    # e.g. an int column that picks up a missing value in a later chunk
+                    table = table.cast(writer.schema)
+                writer.write_table(table)
+            else:
+                scored.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            n_rows += len(scored)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of inputs with the yield model")
+    parser.add_argument('input_path')
+    parser.add_argument('output_path')
+    parser.add_argument('--model', default='models/random_forest_model.pkl')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--mmap', action='store_true', help="load the model with joblib's mmap_mode='r' (plain numpy arrays only, sklearn trees are still copied)")
+    parser.add_argument('--fill-defaults', action='store_true', help="use the schema defaults for missing feature columns")
+    parser.add_argument('--shards', default=None, help="score with the sharded models of this manifest instead of --model")
+    parser.add_argument('--intervals', action='store_true', help="add std and quantile columns from the per-tree outputs")
+    parser.add_argument('--quantiles', default=','.join(str(q) for q in DEFAULT_QUANTILES), help="comma-separated quantiles for --intervals")
+    args = parser.parse_args()
+
+    mmap_mode = 'r' if args.mmap else None
+    if args.shards:
+        from sharding import ShardRouter
+        model = ShardRouter(args.shards, mmap_mode=mmap_mode)
+        schema = model.schema
+    else:
+        # intervals need the per-tree outputs of the flattened forest
+        model = load_forest_engine(args.model, mmap_mode=mmap_mode) if args.intervals else load_model(args.model, mmap_mode=mmap_mode)
+        schema = load_schema(args.model, model)
+    quantiles = [float(q) for q in args.quantiles.split(',')] if args.intervals else None
+    n_rows = score_file(model, schema, args.input_path, args.output_path, chunk_size=args.chunk_size,
+                        fill_defaults=args.fill_defaults, quantiles=quantiles)
+    print(f"Successfully created {args.output_path}")
+    print(f"Scored rows: {n_rows}")
@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+USER_AGENT = "Mozilla/5.0"
+CACHE_DIR = 'data/raw/.http_cache'
+FIXTURES_DIR = 'tests/fixtures/http'
+MODES = ('live', 'record', 'replay')
+# query parameters kept out of fixture files, so recordings hold no credentials
+SECRET_PARAMS = ('appid', 'api_key', 'apikey', 'key', 'token')
+
+
+class CollectorError(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, url, status, headers, body, from_cache=False):
+        self.url = url
+        self.status = status
+        self.headers = {k.lower(): v for k, v in headers.items()}
+        self.body = body
+        self.from_cache = from_cache
+
+    def text(self, encoding='utf-8'):
+        return self.body.decode(encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise CollectorError(f"{self.status} from {self.url}")
+        return self
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return parts.scheme, parts.hostname, port
+
+
+class RateLimiter:
+    # token bucket: `rate` requests per second on average, at most `burst` back to back
+    # (clock and sleep can be swapped for a fake pair in tests)
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # a refill that lands a rounding error short of one token counts as one,
+                # or the next sleep would be too short to move the clock
+                if self.tokens >= 1 - 1e-9:
+                    self.tokens = max(self.tokens - 1, 0.0)
+                    return
+                await self.sleep((1 - self.tokens) / self.rate)
+
+
+class ConnectionPool:
+    # Keep-alive http.client connections per host, at most max_per_host in use at once.
+    # The blocking request runs in a worker thread; a connection is only ever used by the
+    # one request that took it from the idle list.
+    def __init__(self, max_per_host=4, timeout=30.0):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._slots = {}
+
+    def _connect(self, key):
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    @staticmethod
+    def _send(conn, method, target, headers):
+        conn.request(method, target, headers=headers)
+        resp = conn.getresponse()
+        return resp.status, dict(resp.getheaders()), resp.read(), resp.will_close
+
+    async def request(self, method, url, headers):
+        key = _host_key(url)
+        parts = urlsplit(url)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        slots = self._slots.setdefault(key, asyncio.Semaphore(self.max_per_host))
+        async with slots:
+            idle = self._idle.setdefault(key, [])
+            reused = bool(idle)
+            conn = idle.pop() if reused else self._connect(key)
+            try:
+                status, resp_headers, body, will_close = await asyncio.to_thread(self._send, conn, method, target, headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # the server dropped an idle keep-alive connection, try once on a fresh one
+                conn = self._connect(key)
+                status, resp_headers, body, will_close = await asyncio.to_thread(self._send, conn, method, target, headers)
+            except BaseException:
+                conn.close()
+                raise
+            if will_close:
+                conn.close()
+            else:
+                idle.append(conn)
+            return status, resp_headers, body
+
+    def close(self):
+        for conns in self._idle.values():
+            for conn in conns:
+                conn.close()
+        self._idle.clear()
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ResponseCache:
+    # Bodies are stored once under their sha256 (objects/<sha>); index.json maps each URL to
+    # its body and the validators (ETag/Last-Modified) used to revalidate it
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def lookup(self, url):
+        entry = self.index.get(url)
+        if entry is not None and os.path.exists(self._object_path(entry['sha256'])):
+            return entry
+        return None
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _object_path(self, sha256):
+        return os.path.join(self.root, 'objects', sha256)
+
+    def body(self, entry):
+        with open(self._object_path(entry['sha256']), 'rb') as f:
+            return f.read()
+
+    def store(self, response):
+        sha256 = hashlib.sha256(response.body).hexdigest()
+        if not os.path.exists(self._object_path(sha256)):
+            _write_atomic(self._object_path(sha256), response.body)
+        self.index[response.url] = {
+            'sha256': sha256,
+            'status': response.status,
+            'headers': response.headers,
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+        }
+        _write_atomic(self.index_path, json.dumps(self.index, indent=2, sort_keys=True).encode('utf-8'))
+
+    def response(self, url, entry):
+        return Response(url, entry['status'], entry['headers'], self.body(entry), from_cache=True)
+
+
+def redact_url(url):
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class FixtureStore:
+    # record/replay files: <sha256(url)>.json holds status and headers, <sha256(url)>.body the bytes,
+    # keyed by the URL without its credentials so a replay matches whatever key it is given
+    def __init__(self, root=FIXTURES_DIR):
+        self.root = root
+
+    def _paths(self, url):
+        key = hashlib.sha256(redact_url(url).encode('utf-8')).hexdigest()
+        base = os.path.join(self.root, key)
+        return f"{base}.json", f"{base}.body"
+
+    def save(self, response):
+        os.makedirs(self.root, exist_ok=True)
+        meta_path, body_path = self._paths(response.url)
+        _write_atomic(body_path, response.body)
+        meta = {'url': redact_url(response.url), 'status': response.status, 'headers': response.headers}
+        _write_atomic(meta_path, json.dumps(meta, indent=2, sort_keys=True).encode('utf-8'))
+
+    def load(self, url):
+        meta_path, body_path = self._paths(url)
+        if not os.path.exists(meta_path):
+            raise CollectorError(f"No recorded fixture for {url} in {self.root}")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            return Response(url, meta['status'], meta['headers'], f.read())
+
+
+def _retry_after(headers, default):
+    value = headers.get('retry-after')
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return default
+
+
+class Collector:
+    # Concurrent GETs with a per-host connection pool and rate limit, retries with
+    # exponential backoff on connection errors, 429 and 5xx, an on-disk cache revalidated
+    # with ETag/If-Modified-Since, and record/replay of every response to fixture files
+    def __init__(self, mode='live', max_per_host=4, rate_per_host=2.0, burst=2, retries=3, backoff=0.5,
+                 timeout=30.0, cache_dir=CACHE_DIR, fixtures_dir=FIXTURES_DIR):
+        if mode not in MODES:
+            raise ValueError(f"Unknown collector mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = ConnectionPool(max_per_host, timeout)
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.fixtures = FixtureStore(fixtures_dir)
+        self._limiters = {}
+        self.stats = {'requests': 0, 'cache_hits': 0, 'retries': 0}
+
+    def _limiter(self, url):
+        key = _host_key(url)
+        if key not in self._limiters:
+            self._limiters[key] = RateLimiter(self.rate_per_host, self.burst)
+        return self._limiters[key]
+
+    async def fetch(self, url, headers=None):
+        if self.mode == 'replay':
+            return self.fixtures.load(url)
+
+        entry = self.cache.lookup(url) if self.cache else None
+        request_headers = {'User-Agent': USER_AGENT, **(headers or {}), **ResponseCache.conditional_headers(entry)}
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats['retries'] += 1
+            await self._limiter(url).acquire()
+            self.stats['requests'] += 1
+            delay = self.backoff * 2 ** attempt
+            try:
+                status, resp_headers, body = await self.pool.request('GET', url, request_headers)
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+            else:
+                response = Response(url, status, resp_headers, body)
+                if status == 304 and entry is not None:
+                    self.stats['cache_hits'] += 1
+                    response = self.cache.response(url, entry)
+                    break
+                if status == 429 or status >= 500:
+                    error = CollectorError(f"{status} from {url}")
+                    delay = _retry_after(response.headers, delay)
+                else:
+                    if status == 200 and self.cache:
+                        self.cache.store(response)
+                    break
+            if attempt == self.retries:
+                raise CollectorError(f"Giving up on {url} after {self.retries + 1} attempts: {error}") from error
+            await asyncio.sleep(delay)
+
+        if self.mode == 'record':
+            self.fixtures.save(response)
+        return response
+
+    async def fetch_all(self, urls, headers=None, return_exceptions=False):
+        return await asyncio.gather(*(self.fetch(url, headers) for url in urls), return_exceptions=return_exceptions)
+
+    def close(self):
+        self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
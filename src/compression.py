@@ -0,0 +1,153 @@
+import argparse
+import io
+import os
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from batch_predict import predict_matrix
+from feature_schema import load_schema, schema_path
+from forest_engine import FlatForest
+from model_registry import MODEL_PATH, load_model
+from storage import read_table, table_path
+
+COMPRESSED_PATH = 'models/random_forest_model.compressed.pkl'
+REPORT_PATH = 'results/compression_report.csv'
+# pruning grid searched by compress_to_budget, smallest artifacts last
+TREE_FRACTIONS = [1.0, 0.75, 0.5, 0.33, 0.25]
+DEPTH_LIMITS = [None, 14, 12, 10, 8]
+
+
+def _rmse(y_true, y_pred):
+    return mean_squared_error(y_true, y_pred) ** 0.5
+
+
+def serialized_size(model):
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.getbuffer().nbytes
+
+
+def drift(model, reference, X):
+    # how far a compressed model's predictions move from the original forest's
+    return _rmse(reference, predict_matrix(model, X))
+
+
+def compress_to_budget(forest, X_ref, max_drift=25.0, max_bytes=None):
+    # Smallest pruned + float32-quantized forest whose predictions on X_ref stay within
+    # max_drift Kg/Ha RMSE of the full forest. Judged against the forest itself rather
+    # than labels, so the holdout years are never used to pick the model.
+    reference = forest.predict(X_ref)
+    best = None
+    for fraction in TREE_FRACTIONS:
+        n_trees = max(1, int(round(forest.n_estimators * fraction)))
+        for max_depth in DEPTH_LIMITS:
+            candidate = forest.prune(n_trees=n_trees, max_depth=max_depth).quantize()
+            if drift(candidate, reference, X_ref) > max_drift:
+                continue
+            if max_bytes is not None and candidate.nbytes > max_bytes:
+                continue
+            if best is None or candidate.nbytes < best.nbytes:
+                best = candidate
+    if best is None:
+        raise ValueError(f"No pruned forest stays within {max_drift} Kg/Ha drift and {max_bytes} bytes")
+    return best
+
+
+def augment(X, n_copies=4, noise=0.05, seed=42):
+    # jittered copies of the training rows give the student more points to match the
+    # teacher on; 0/1 indicator columns are left as they are
+    rng = np.random.default_rng(seed)
+    continuous = np.array([len(np.unique(X[:, j][~np.isnan(X[:, j])])) > 2 for j in range(X.shape[1])])
+    scale = np.nanstd(X, axis=0) * noise * continuous
+    copies = [X]
+    for _ in range(n_copies):
+        copies.append(X + rng.normal(size=X.shape) * scale)
+    return np.vstack(copies)
+
+
+def distill(teacher, X, kind='forest', n_copies=4, seed=42):
+    # student trained on the teacher's predictions rather than on the labels
+    X_student = augment(X, n_copies=n_copies, seed=seed)
+    y_student = predict_matrix(teacher, X_student)
+    if kind == 'forest':
+        student = RandomForestRegressor(n_estimators=30, max_depth=10, max_features='sqrt', random_state=seed)
+        return FlatForest.from_sklearn(student.fit(X_student, y_student)).quantize()
+    if kind == 'gbm':
+        return HistGradientBoostingRegressor(max_iter=200, max_depth=6, learning_rate=0.1, random_state=seed).fit(X_student, y_student)
+    raise ValueError(f"Unknown student kind '{kind}', expected 'forest' or 'gbm'")
+
+
+def report_row(name, model, X_test, y_test, reference, path):
+    joblib.dump(model, path)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        loaded = joblib.load(path)
+    load_time = time.perf_counter() - start
+    os.remove(path)
+
+    start = time.perf_counter()
+    y_pred = predict_matrix(loaded, X_test)
+    batch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(len(X_test)):
+        predict_matrix(loaded, X_test[i:i + 1])
+    row_time = (time.perf_counter() - start) / max(len(X_test), 1)
+
+    return {
+        'variant': name,
+        'bytes': serialized_size(model),
+        'load_ms': load_time * 1000,
+        'batch_predict_ms': batch_time * 1000,
+        'row_predict_ms': row_time * 1000,
+        'holdout_rmse': _rmse(y_test, y_pred),
+        'holdout_mae': mean_absolute_error(y_test, y_pred),
+        'drift_rmse': _rmse(reference, y_pred),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune, quantize and distill the yield forest, and report the trade-offs")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--output', default=COMPRESSED_PATH, help="where the budget-pruned forest is saved")
+    parser.add_argument('--max-drift', type=float, default=25.0, help="allowed RMSE (Kg/Ha) against the full forest's predictions")
+    parser.add_argument('--max-bytes', type=int, default=None, help="size budget for the pruned forest arrays")
+    parser.add_argument('--report', default=REPORT_PATH)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    schema = load_schema(args.model, model)
+    df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
+    X_train = schema.build_matrix(df[df['Year'] <= 2018], fill_defaults=False)
+    test_df = df[df['Year'] > 2018]
+    X_test = schema.build_matrix(test_df, fill_defaults=False)
+    y_test = test_df[schema.target].to_numpy()
+
+    forest = FlatForest.from_sklearn(model)
+    compressed = compress_to_budget(forest, X_train, max_drift=args.max_drift, max_bytes=args.max_bytes)
+    variants = [
+        ('sklearn', model),
+        ('flat float64', forest),
+        ('flat float32', forest.quantize()),
+        ('flat float16', forest.quantize(np.float16, np.float16)),
+        (f'pruned to budget ({compressed.n_estimators} trees, depth {compressed.max_depth})', compressed),
+        ('distilled forest', distill(forest, X_train, 'forest')),
+        ('distilled gbm', distill(forest, X_train, 'gbm')),
+    ]
+
+    reference = predict_matrix(model, X_test)
+    scratch = args.output + '.tmp'
+    report = pd.DataFrame([report_row(name, variant, X_test, y_test, reference, scratch) for name, variant in variants])
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    report.to_csv(args.report, index=False)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print(f"Successfully created {args.report}")
+
+    # the compressed forest is a drop-in artifact for load_forest_engine, with the same schema
+    joblib.dump(compressed, args.output)
+    schema.save(schema_path(args.output))
+    print(f"Successfully created {args.output}")
@@ -1,43 +1,47 @@
-# import requests
-# import cdsapi
-# import pandas as pd
-# import os
-# import pdfplumber
-# import earthaccess
-# from datetime import datetime
-# from bs4 import BeautifulSoup
-# import time
-# import xarray as xr
-# from urllib.parse import urljoin
-# from dotenv import load_dotenv
-
-
-# # current/forecast weather
-# def fetch_openweather_data(api_key, cities, output_path): 
-#     base_url = "http://api.openweathermap.org/data/2.5/weather"
-#     data = []
-#     for city in cities:
-#         params = {"q": f"{city},LK", "appid": api_key, "units": "metric"}
-#         try:
-#             response = requests.get(base_url, params=params)
-#             response.raise_for_status()
-#             json_data = response.json()
-#             data.append({
-#                 "city": city,
-#                 "date": datetime.utcfromtimestamp(json_data["dt"]).strftime("%Y-%m-%d %H:%M:%S"),
-#                 "temperature": json_data["main"]["temp"],
-#                 "rainfall": json_data.get("rain", {}).get("1h", 0),
-#                 "humidity": json_data["main"]["humidity"]
-#             })
-#             time.sleep(1)
-#         except Exception as e:
-#             print(f"Error fetching data for {city}: {e}")
-#     df = pd.DataFrame(data)
-#     df.to_csv(output_path, index=False)
-#     return df
-
-
-# # historical weather
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from urllib.parse import urlencode, urljoin
+import pandas as pd
+from collector import FIXTURES_DIR, MODES, Collector
+from pdf_extraction import CACHE_DIR as PDF_CACHE_DIR, extract_prices
+
+OPENWEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+CBSL_URL = "https://www.cbsl.gov.lk/en/statistics/economic-indicators/price-report"
+CITIES = ["Kurunegala", "Anuradhapura", "Kandy", "Matale"]
+
+
+# current/forecast weather
+def openweather_url(api_key, city, base_url=OPENWEATHER_URL):
+    return f"{base_url}?{urlencode({'q': f'{city},LK', 'appid': api_key, 'units': 'metric'})}"
+
+
+async def fetch_openweather_data(collector, api_key, cities, output_path, base_url=OPENWEATHER_URL):
+    # all cities at once; the collector's per-host rate limit replaces the old sleep(1)
+    responses = await collector.fetch_all([openweather_url(api_key, city, base_url) for city in cities], return_exceptions=True)
+    data = []
+    for city, response in zip(cities, responses):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            json_data = response.raise_for_status().json()
+            data.append({
+                "city": city,
+                "date": datetime.fromtimestamp(json_data["dt"], tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "temperature": json_data["main"]["temp"],
+                "rainfall": json_data.get("rain", {}).get("1h", 0),
+                "humidity": json_data["main"]["humidity"]
+            })
+        except Exception as e:
+            print(f"Error fetching data for {city}: {e}")
+    df = pd.DataFrame(data)
+    df.to_csv(output_path, index=False)
+    return df
+
+
+# historical weather
 # def fetch_era5_data(years):
 #     client = cdsapi.Client()
 #     data = []
@@ -60,49 +64,46 @@
 #     print(f"ERA5 data saved to era5_{year}.nc")
 
 
+class _PdfLinks(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.links = []
 
-# # Market prices from cbsl(PDF extraction))
-# def scrape_cbsl_prices(url, output_path):
-#     headers = {"User-Agent": "Mozilla/5.0"}
-#     response = requests.get(url, headers=headers)
-#     response.raise_for_status()
+    def handle_starttag(self, tag, attrs):
+        href = dict(attrs).get('href')
+        if tag == 'a' and href and href.endswith('.pdf'):
+            self.links.append(href)
 
-#     soup = BeautifulSoup(response.text, "html.parser")
-#     pdf_links = [a["href"] for a in soup.find_all("a", href=True) if a["href"].endswith(".pdf")]
 
-#     data = []
-#     for link in pdf_links[:10]:
-#         # pdf_url = f"https://www.cbsl.gov.lk{link}" if link.startswith("/") else link
-#         pdf_url = urljoin(url, link)
-#         print(f"Processing: {pdf_url}")
-#         try:
-#             pdf_response = requests.get(pdf_url, headers=headers)
-#             pdf_response.raise_for_status()
-
-#             with open("temp.pdf", "wb") as f:
-#                 f.write(pdf_response.content)
-
-#             with pdfplumber.open("temp.pdf") as pdf:
-#                 for page in pdf.pages:
-#                     table = page.extract_table()
-#                     if table:
-#                         for row in table[1:]:
-#                             if row and len(row) >= 3 and row[0] and row[2]:
-#                                 data.append({
-#                                     "crop": row[0].strip(),
-#                                     "date": row[1].strip(),
-#                                     "price": float(row[2].replace("LKR", "").strip())
-#                                 })
-#             time.sleep(2)
-#         except Exception as e:
-#             print(f"Error processing {pdf_url}: {e}")
-    
-#     df = pd.DataFrame(data)
-#     df.to_csv(output_path, index=False)
-#     return df
-
-
-# # NASA Earthdata: NDVI
+def pdf_links(html):
+    parser = _PdfLinks()
+    parser.feed(html)
+    return parser.links
+
+
+# Market prices from cbsl(PDF extraction))
+async def scrape_cbsl_prices(collector, url, output_path, max_pdfs=None, reader=None, cache_dir=PDF_CACHE_DIR, max_workers=None):
+    # every linked report is downloaded concurrently, then their pages are extracted on a
+    # process pool; rows come out in the schema of data/raw/prices.csv
+    response = (await collector.fetch(url)).raise_for_status()
+    pdf_urls = [urljoin(url, link) for link in pdf_links(response.text())[:max_pdfs]]
+
+    documents = {}
+    for pdf_url, pdf_response in zip(pdf_urls, await collector.fetch_all(pdf_urls, return_exceptions=True)):
+        print(f"Processing: {pdf_url}")
+        try:
+            if isinstance(pdf_response, Exception):
+                raise pdf_response
+            documents[pdf_url] = pdf_response.raise_for_status().body
+        except Exception as e:
+            print(f"Error processing {pdf_url}: {e}")
+
+    df = await asyncio.to_thread(extract_prices, documents, cache_dir, reader, max_workers)
+    df.to_csv(output_path, index=False)
+    return df
+
+
+# NASA Earthdata: NDVI
 # def fetch_ndvi_data(start_date, end_date, output_path):
 #     auth = earthaccess.login()
 #     results = earthaccess.search_data(
@@ -129,29 +130,37 @@
 #     else:
 #         print("No NDVI data retrieved.")
 #         return pd.DataFrame()
-    
-#     # df = pd.DataFrame(data)
-#     # df.to_csv(output_path, index=False)
-#     # return df
-
-
-# if __name__ == "__main__":
-#     load_dotenv()
-
-#     os.makedirs("data/raw", exist_ok=True)
-
-#     # set api key for open  weather
-#     API_KEY = os.getenv("OPENWEATHER_API_KEY")
-#     if not API_KEY:
-#         raise ValueError("OPENWEATHER_API_KEY not set in .env file")
-    
-#     CITIES = ["Kurunegala", "Anuradhapura", "Kandy", "Matale"]
-#     fetch_openweather_data(API_KEY, CITIES, "data/raw/weather_current.csv")
-
-#     YEARS = [2023, 2024]
-#     fetch_era5_data(YEARS)
 
-#     CBSL_URL = "https://www.cbsl.gov.lk/en/statistics/economic-indicators/price-report"
-#     scrape_cbsl_prices(CBSL_URL, "data/raw/market_prices.csv")
 
-#     fetch_ndvi_data("2025-01-01", "2025-08-01", "data/raw/ndvi.csv")
+async def collect(args):
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key and args.mode != 'replay':
+        raise ValueError("OPENWEATHER_API_KEY not set in .env file")
+
+    async with Collector(mode=args.mode, max_per_host=args.max_per_host, rate_per_host=args.rate, fixtures_dir=args.fixtures) as collector:
+        # the two sources are on different hosts, so they run side by side
+        await asyncio.gather(
+            fetch_openweather_data(collector, api_key or 'replay', CITIES, "data/raw/weather_current.csv"),
+            scrape_cbsl_prices(collector, CBSL_URL, "data/raw/market_prices.csv", max_pdfs=args.max_pdfs, max_workers=args.workers),
+        )
+        print(f"Collector stats: {collector.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the raw weather and market price data")
+    parser.add_argument('--mode', choices=MODES, default='live', help="replay serves recorded fixtures without network access")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--max-per-host', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=2.0, help="requests per second per host")
+    parser.add_argument('--max-pdfs', type=int, default=None, help="only the first N linked price reports")
+    parser.add_argument('--workers', type=int, default=None, help="processes for PDF extraction")
+    args = parser.parse_args()
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    os.makedirs("data/raw", exist_ok=True)
+    asyncio.run(collect(args))
@@ -1,9 +1,10 @@
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from storage import read_table, table_path
 
 def run_eda(data_path):
-    df = pd.read_csv(data_path)
+    df = read_table(data_path)
 
     df['season'] = pd.Categorical(df['season'], categories=['Maha', 'Yala'], ordered=True)
 
@@ -62,6 +63,6 @@ def run_eda(data_path):
 
 
 if __name__ == "__main__":
-    run_eda("data/processed/merged_data.csv")
+    run_eda(table_path("data/processed/merged_data.csv"))
 
     print("EDA plots saved to 'assets' directory")
@@ -0,0 +1,167 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from batch_predict import predict_matrix
+from feature_schema import load_schema
+from forest_engine import DEFAULT_QUANTILES, load_forest_engine, quantile_label
+from model_registry import MODEL_PATH
+from seasons import agricultural_year, season_from_month
+from storage import read_table, table_path
+
+# dekads per rolling window, like the 1- and 3-month sums (r1h/r3h) of the rainfall feed
+WINDOWS = {'rfh': 1, 'r1h': 3, 'r3h': 9}
+DEFAULT_MEMBER_BLOCK = 10
+DEFAULT_CSV_CHUNKSIZE = 100_000
+
+
+def _season_mask(times, year, season):
+    times = pd.DatetimeIndex(times)
+    months = times.month.to_numpy()
+    return (agricultural_year(times.year.to_numpy(), months) == year) & (np.asarray(season_from_month(months)) == season)
+
+
+def _rolling_sum(values, window):
+    # trailing sum over the last axis; NaN until a full window of history is available
+    if window == 1:
+        return values
+    cs = np.cumsum(np.nan_to_num(values), axis=-1)
+    out = np.full(values.shape, np.nan)
+    out[..., window - 1:] = cs[..., window - 1:] - np.concatenate(
+        [np.zeros(values.shape[:-1] + (1,)), cs[..., :-window]], axis=-1)
+    return out
+
+
+def member_features(block, times, year, season, climatology):
+    # block: (members, districts, dekads) of dekadal rainfall. Reduced to the seasonal means of
+    # the rainfall table: rfh/r1h/r3h over the season's dekads (windows may reach back before
+    # the season) and rfq, the rainfall as a percentage of its long-term average
+    mask = _season_mask(times, year, season)
+    if not mask.any():
+        raise ValueError(f"No dekads of {season} {year} in the ensemble")
+    features = {}
+    for name, window in WINDOWS.items():
+        features[name] = np.nanmean(_rolling_sum(block, window)[..., mask], axis=(1, 2))
+    if isinstance(climatology.get('rfh_avg'), np.ndarray):
+        # (districts, dekads) long-term averages shipped with the ensemble
+        clim = climatology['rfh_avg']
+        features['rfq'] = np.nanmean((100 * block / clim)[..., mask], axis=(1, 2))
+        for name, window in WINDOWS.items():
+            features[f'{name}_avg'] = np.full(len(block), np.nanmean(_rolling_sum(clim, window)[..., mask]))
+    else:
+        features['rfq'] = 100 * features['rfh'] / climatology['rfh_avg']
+        for name in WINDOWS:
+            features[f'{name}_avg'] = np.full(len(block), climatology[f'{name}_avg'])
+    return features
+
+
+def historical_climatology(season, rainfall_path=table_path('data/processed/seasonal_rainfall.csv')):
+    # long-term seasonal averages from the processed rainfall table, for ensembles without *_avg
+    rainfall = read_table(rainfall_path)
+    rainfall = rainfall[rainfall['season'].astype(str) == season]
+    return {f'{name}_avg': float(rainfall[f'{name}_avg'].mean()) for name in WINDOWS}
+
+
+def netcdf_member_blocks(path, var='rfh', member_dim='member', time_dim='time', member_block=DEFAULT_MEMBER_BLOCK):
+    # Lazily opened: only one block of members is read from disk at a time. Any dims other
+    # than member/time (districts, grid cells) are averaged over by member_features.
+    import xarray as xr
+    with xr.open_dataset(path) as ds:
+        da = ds[var]
+        other_dims = [dim for dim in da.dims if dim not in (member_dim, time_dim)]
+        da = da.transpose(member_dim, *other_dims, time_dim)
+        times = pd.DatetimeIndex(da[time_dim].values)
+        members = da[member_dim].values
+        clim = None
+        if f'{var}_avg' in ds:
+            clim = ds[f'{var}_avg'].transpose(*other_dims, time_dim).values.reshape(-1, len(times))
+        for start in range(0, len(members), member_block):
+            block = da.isel({member_dim: slice(start, start + member_block)}).values
+            yield members[start:start + member_block], block.reshape(block.shape[0], -1, len(times)), times, clim
+
+
+def csv_member_blocks(path, var='rfh', member_col='member', district_col='adm_id', date_col='date', chunksize=DEFAULT_CSV_CHUNKSIZE):
+    # Long format (member, district, date, rfh[, rfh_avg]) written member by member; only the
+    # rows of the member being assembled are held in memory
+    done = set()
+    pending = []
+
+    def flush(rows):
+        df = pd.concat(rows)
+        member = df[member_col].iloc[0]
+        cube = df.pivot_table(index=district_col, columns=date_col, values=var, aggfunc='mean')
+        times = pd.DatetimeIndex(cube.columns)
+        clim = None
+        if f'{var}_avg' in df:
+            clim = df.pivot_table(index=district_col, columns=date_col, values=f'{var}_avg', aggfunc='mean').to_numpy()
+        return np.array([member]), cube.to_numpy()[None], times, clim
+
+    for chunk in pd.read_csv(path, parse_dates=[date_col], chunksize=chunksize):
+        # split the chunk where the member changes
+        starts = np.flatnonzero(np.r_[True, chunk[member_col].to_numpy()[1:] != chunk[member_col].to_numpy()[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(chunk)]):
+            part = chunk.iloc[start:end]
+            member = part[member_col].iloc[0]
+            if pending and pending[0][member_col].iloc[0] != member:
+                yield flush(pending)
+                done.add(pending[0][member_col].iloc[0])
+                pending = []
+            if member in done:
+                raise ValueError(f"Member {member} appears in more than one run of rows, sort the file by {member_col}")
+            pending.append(part)
+    if pending:
+        yield flush(pending)
+
+
+def ensemble_features(blocks, year, season, climatology=None):
+    frames = []
+    for members, block, times, clim in blocks:
+        clim_values = {'rfh_avg': clim} if clim is not None else (climatology or historical_climatology(season))
+        features = member_features(block, times, year, season, clim_values)
+        frames.append(pd.DataFrame({'member': members, **features}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def score_members(model, schema, features, base, quantiles=DEFAULT_QUANTILES):
+    # every member in one batch: the season's other inputs are broadcast, the rest use defaults
+    data = {name: np.full(len(features), value) if np.ndim(value) == 0 else value for name, value in base.items()}
+    data.update({col: features[col].to_numpy() for col in features.columns if col != 'member'})
+    X = schema.build_matrix(data, fill_defaults=True)
+    scored = features.copy()
+    scored['Predicted_Yield'] = predict_matrix(model, X)
+    summary = {'members': len(scored), 'mean': scored['Predicted_Yield'].mean(), 'std': scored['Predicted_Yield'].std(ddof=0)}
+    summary.update({quantile_label(q): np.quantile(scored['Predicted_Yield'], q) for q in quantiles})
+    return scored, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a rainfall forecast ensemble into a yield distribution")
+    parser.add_argument('ensemble_path', help="NetCDF (member x ... x time) or long-format CSV sorted by member")
+    parser.add_argument('--year', type=int, required=True)
+    parser.add_argument('--season', choices=['Maha', 'Yala'], required=True)
+    parser.add_argument('--var', default='rfh')
+    parser.add_argument('--sown-ha', type=float, default=None)
+    parser.add_argument('--sown-to-harvest-ratio', type=float, default=None)
+    parser.add_argument('--inflation', type=float, default=None)
+    parser.add_argument('--member-block', type=int, default=DEFAULT_MEMBER_BLOCK)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--output', default='results/ensemble_yield.csv')
+    args = parser.parse_args()
+
+    if os.path.splitext(args.ensemble_path)[1].lower() == '.csv':
+        blocks = csv_member_blocks(args.ensemble_path, var=args.var)
+    else:
+        blocks = netcdf_member_blocks(args.ensemble_path, var=args.var, member_block=args.member_block)
+    features = ensemble_features(blocks, args.year, args.season)
+
+    model = load_forest_engine(args.model)
+    schema = load_schema(args.model, model)
+    base = {'Year': args.year, 'season': args.season, 'Sown_Ha': args.sown_ha,
+            'Sown_to_Harvest_Ratio': args.sown_to_harvest_ratio, 'Inflation': args.inflation}
+    base = {name: value for name, value in base.items() if value is not None}
+    scored, summary = score_members(model, schema, features, base)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    scored.to_csv(args.output, index=False)
+    print(f"Successfully created {args.output}")
+    print(", ".join(f"{name}: {value:.2f}" for name, value in summary.items()))
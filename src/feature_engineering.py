@@ -1,18 +1,261 @@
+import argparse
+import numpy as np
 import pandas as pd
+from feature_schema import CRISIS_YEARS
+from instrumentation import add_arguments, configure_from_args, describe, measure
+from storage import read_table, resolve_table, table_path, write_table
 
-df = pd.read_csv('data/processed/merged_data.csv')
+# lag feature -> column of the previous season of the same kind it is taken from
+LAG_FEATURES = {'Prev_Yield': 'Avg_Yield_Kg_Ha', 'Prev_Rainfall': 'rfh_avg'}
 
-# Lagged features (previous season's yield and rainfall)
-df = df.sort_values(['Year', 'season'])
-df['Prev_Yield'] = df.groupby('season')['Avg_Yield_Kg_Ha'].shift(1)
-df['Prev_Rainfall'] = df.groupby('season')['rfh_avg'].shift(1)
+# Features are declared as specs and evaluated together by compute_features:
+#   {'name', 'op': 'lag', 'source', 'lag'}
+#   {'name', 'op': 'rolling_mean' | 'rolling_std', 'source', 'window', 'shift': 1}
+#   {'name', 'op': 'ewma', 'source', 'span', 'shift': 1}
+#   {'name', 'op': 'growth', 'source', 'periods': 1, 'shift': 1}
+#   {'name', 'op': 'cross_season', 'source'}
+# Every op but cross_season runs over each season's own sequence of years (of each district,
+# when the rows carry an adm_id). 'shift' is how many seasons back a window ends, so by default
+# nothing from the season itself leaks in. cross_season takes the latest season of the other
+# kind (the previous Maha for a Yala row) of the same district.
+DEFAULT_SPECS = [{'name': name, 'op': 'lag', 'source': source, 'lag': 1} for name, source in LAG_FEATURES.items()]
 
-# Crisis indicator (2021-2022 economic crisis)
-df['Crisis_Indicator'] = df['Year'].isin([1968, 1969, 1970, 1973, 1974, 1981, 1983, 1987, 1988, 1989, 1997, 2001, 2020, 2021, 2022, 2023]).astype(int)
 
-df[['Prev_Yield', 'Prev_Rainfall']] = df[
-    ['Prev_Yield', 'Prev_Rainfall']
-].fillna(df[['Prev_Yield', 'Prev_Rainfall']].median())
+def candidate_specs(sources, lags=(1, 2, 3), windows=(3, 5), spans=(3,), growth=True, cross_season=True):
+    # the usual grid of candidates for each source column
+    specs = []
+    for source in sources:
+        specs += [{'name': f"{source}_lag{k}", 'op': 'lag', 'source': source, 'lag': k} for k in lags]
+        for w in windows:
+            specs += [{'name': f"{source}_mean{w}", 'op': 'rolling_mean', 'source': source, 'window': w},
+                      {'name': f"{source}_std{w}", 'op': 'rolling_std', 'source': source, 'window': w}]
+        specs += [{'name': f"{source}_ewm{span}", 'op': 'ewma', 'source': source, 'span': span} for span in spans]
+        if growth:
+            specs.append({'name': f"{source}_growth", 'op': 'growth', 'source': source})
+        if cross_season:
+            specs.append({'name': f"{source}_cross", 'op': 'cross_season', 'source': source})
+    return specs
 
-df.to_csv('data/processed/feature_engineered_dataset.csv', index=False)
-print("Feature-engineered dataset saved to 'data/processed/feature_engineered_dataset.csv'")
\ No newline at end of file
+
+def _shifted(values, pos, k):
+    # values k rows earlier in the same group, NaN where the group has no such row
+    out = np.full(values.shape, np.nan)
+    rows = np.flatnonzero(pos >= k)
+    out[rows] = values[rows - k]
+    return out
+
+
+def _full_windows(x, pos, window, shift):
+    # rows whose last `window` rows all sit in their own group and hold no gap (pandas'
+    # min_periods=window), counted with a cumulative sum
+    counts = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(~np.isnan(x), axis=0)])
+    end = np.arange(1, len(x) + 1)
+    return (pos >= shift + window - 1)[:, None] & (counts[end] - counts[np.maximum(end - window, 0)] == window)
+
+
+def _lag(values, pos, lag):
+    return _shifted(values, pos, lag)
+
+
+def _rolling_mean(values, pos, window, shift=1):
+    x = _shifted(values, pos, shift)
+    cs = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(np.nan_to_num(x), axis=0)])
+    end = np.arange(1, len(x) + 1)
+    total = cs[end] - cs[np.maximum(end - window, 0)]
+    return np.where(_full_windows(x, pos, window, shift), total / window, np.nan)
+
+
+def _rolling_std(values, pos, window, shift=1):
+    # a strided (rows, columns, window) view instead of sums of squares, which lose
+    # precision when the spread is small next to the values
+    x = _shifted(values, pos, shift)
+    padded = np.vstack([np.full((window - 1, x.shape[1]), np.nan), x])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = windows.std(axis=2, ddof=1)
+    return np.where(_full_windows(x, pos, window, shift), std, np.nan)
+
+
+def _ewma(values, pos, span, shift=1):
+    # pandas' ewm(span, adjust=True) over each group's full history: one strided view of
+    # the last L rows per row (L = longest group), weights by distance, rows of earlier groups masked
+    x = _shifted(values, pos, shift)
+    decay = 1 - 2 / (span + 1)
+    L = int(pos.max()) + 1 if len(pos) else 1
+    padded = np.vstack([np.full((L - 1, x.shape[1]), np.nan), x])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, L, axis=0)
+    distance = np.arange(L - 1, -1, -1)
+    weights = np.where(distance[None, :] <= pos[:, None], decay ** distance, 0.0)[:, None, :]
+    observed = ~np.isnan(windows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (np.where(observed, windows, 0) * weights).sum(axis=2) / (observed * weights).sum(axis=2)
+
+
+def _growth(values, pos, periods=1, shift=1):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _shifted(values, pos, shift) / _shifted(values, pos, shift + periods) - 1
+
+
+OPS = {'lag': _lag, 'rolling_mean': _rolling_mean, 'rolling_std': _rolling_std, 'ewma': _ewma, 'growth': _growth}
+
+
+def _cross_season(values, years, is_maha, districts):
+    # seasons in time order within each district: Yala (Apr-Aug) comes before the Maha of the same year
+    order = np.lexsort((is_maha, years, districts))
+    maha = is_maha[order]
+    idx = np.arange(len(order))
+    sorted_districts = districts[order]
+    start = np.maximum.accumulate(np.where(np.r_[True, sorted_districts[1:] != sorted_districts[:-1]], idx, 0))
+    last_maha = np.maximum.accumulate(np.where(maha, idx, -1))
+    last_yala = np.maximum.accumulate(np.where(~maha, idx, -1))
+    # latest row of the other kind strictly before each row, in the same district
+    other = np.where(maha, np.r_[-1, last_yala[:-1]], np.r_[-1, last_maha[:-1]])
+    out = np.full(values.shape, np.nan)
+    has = other >= start
+    out[order[has]] = values[order][other[has]]
+    return out
+
+
+def group_keys(df):
+    # the columns whose values make up one row's history
+    return ['season'] + (['adm_id'] if 'adm_id' in df else [])
+
+
+def compute_features(df, specs=DEFAULT_SPECS):
+    # Every spec in one pass: rows are grouped by season (and district) once, specs that share
+    # an op and parameters are evaluated together on a matrix of all their source columns
+    n = len(df)
+    sources = list(dict.fromkeys(spec['source'] for spec in specs))
+    years = df['Year'].to_numpy(dtype=np.int64)
+    seasons = df['season'].astype(str).to_numpy()
+    keys = group_keys(df)
+    groups = df.groupby(keys, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    if 'adm_id' in keys:
+        districts = df.groupby('adm_id', sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        districts = np.zeros(n, dtype=np.int64)
+    values = df[sources].to_numpy(dtype=np.float64)
+    column = {source: j for j, source in enumerate(sources)}
+
+    order = np.lexsort((years, groups))
+    grouped = values[order]
+    new_group = np.r_[True, groups[order][1:] != groups[order][:-1]] if n else np.zeros(0, dtype=bool)
+    pos = np.arange(n) - np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+
+    out = np.empty((n, len(specs)))
+    batches = {}
+    for i, spec in enumerate(specs):
+        params = tuple(sorted((k, v) for k, v in spec.items() if k not in ('name', 'op', 'source')))
+        batches.setdefault((spec['op'], params), []).append(i)
+    for (op, params), members in batches.items():
+        cols = [column[specs[i]['source']] for i in members]
+        if op == 'cross_season':
+            out[:, members] = _cross_season(values[:, cols], years, seasons == 'Maha', districts)
+            continue
+        if op not in OPS:
+            raise ValueError(f"Unknown feature op '{op}', expected one of {list(OPS) + ['cross_season']}")
+        result = np.empty((n, len(cols)))
+        result[order] = OPS[op](grouped[:, cols], pos, **dict(params))
+        out[:, members] = result
+    return pd.DataFrame(out, index=df.index, columns=[spec['name'] for spec in specs])
+
+
+def feature_row(history, row, specs=DEFAULT_SPECS):
+    # the same specs for one serving row: evaluated on its history plus the row itself
+    frame = pd.concat([history, pd.DataFrame([row])], ignore_index=True)
+    return compute_features(frame, specs).iloc[-1].to_dict()
+
+
+def build_features(df, specs=DEFAULT_SPECS, crisis_years=CRISIS_YEARS):
+    # Lagged features (previous season's yield and rainfall by default)
+    df = df.sort_values(['Year', 'season'])
+    features = compute_features(df, specs)
+    for name in features.columns:
+        df[name] = features[name]
+
+    # Crisis indicator (2021-2022 economic crisis among them)
+    df['Crisis_Indicator'] = df['Year'].isin(crisis_years).astype(int)
+
+    feature_cols = list(features.columns)
+    df[feature_cols] = df[feature_cols].fillna(df[feature_cols].median())
+    return df
+
+
+def update_features(features, merged, specs=DEFAULT_SPECS):
+    # Brings an existing feature table up to date with a freshly merged table (old seasons
+    # plus newly released ones). Every op only looks back, so the rows from the first new,
+    # changed or removed season of a group onwards are affected (of any group, in time order,
+    # once a spec crosses seasons). Those rows are recomputed by compute_features over their
+    # groups' history and every other row keeps its stored value, except where that may be a
+    # fill value. The median fill is a column statistic, so it is re-applied to all gaps.
+    keys = group_keys(merged)
+    key = ['Year'] + keys
+    names = [spec['name'] for spec in specs]
+    sources = list(dict.fromkeys(spec['source'] for spec in specs))
+
+    df = merged.sort_values(['Year', 'season']).copy()
+    features = features.sort_values(['Year', 'season'])
+    stored_cols = [name for name in names if name in features]
+    stored = features[key + sources + stored_cols].assign(_pos=features.groupby(keys, observed=True).cumcount().to_numpy())
+    old = df[key].merge(stored, on=key, how='left', indicator=True)
+
+    # new rows, rows whose source values changed and rows that moved in their group's history
+    changed = (old['_merge'] == 'left_only').to_numpy()
+    changed = changed | (old['_pos'].to_numpy(dtype=np.float64) != df.groupby(keys, observed=True).cumcount().to_numpy())
+    for src in sources:
+        new_values, old_values = df[src].to_numpy(dtype=np.float64), old[src].to_numpy(dtype=np.float64)
+        changed = changed | ~((new_values == old_values) | (np.isnan(new_values) & np.isnan(old_values)))
+    if len(stored_cols) < len(names):
+        changed = np.ones(len(df), dtype=bool)
+
+    years = df['Year'].to_numpy(dtype=np.int64)
+    if any(spec['op'] == 'cross_season' for spec in specs):
+        groups = np.zeros(len(df), dtype=np.int64)
+        # Yala comes before the Maha of the same year
+        order = np.lexsort((df['season'].astype(str).to_numpy() == 'Maha', years))
+    else:
+        groups = df.groupby(keys, observed=True).ngroup().to_numpy()
+        order = np.lexsort((years, groups))
+    affected = np.empty(len(df), dtype=bool)
+    affected[order] = pd.Series(changed[order]).groupby(groups[order]).cummax().to_numpy()
+    # a stored value equal to its column's median may be a fill, so its raw value is needed
+    for name in stored_cols:
+        values = old[name].to_numpy(dtype=np.float64)
+        affected = affected | np.isnan(values) | (values == np.nanmedian(features[name].to_numpy(dtype=np.float64)))
+
+    # whole groups go to compute_features, the windows need the rows before the affected ones
+    rows = np.isin(groups, np.unique(groups[affected]))
+    recomputed = compute_features(df[rows], specs) if rows.any() else None
+    for name in names:
+        values = old[name].to_numpy(dtype=np.float64, copy=True) if name in stored_cols else np.full(len(df), np.nan)
+        if recomputed is not None:
+            values[rows] = np.where(affected[rows], recomputed[name].to_numpy(), values[rows])
+        df[name] = values
+
+    df['Crisis_Indicator'] = df['Year'].isin(CRISIS_YEARS).astype(int)
+    df[names] = df[names].fillna(df[names].median())
+    print(f"Recomputed features for {int(affected.sum())} of {len(df)} rows ({int((old['_merge'] == 'left_only').sum())} new)")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the feature-engineered dataset from the merged data")
+    parser.add_argument('--incremental', action='store_true', help="update the existing dataset instead of rebuilding it")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    merged = read_table(table_path('data/processed/merged_data.csv'))
+    output_path = table_path('data/processed/feature_engineered_dataset.csv')
+
+    incremental = args.incremental and resolve_table(output_path) is not None
+    with measure('feature_engineering', rows_in=len(merged), incremental=incremental) as record:
+        if incremental:
+            df = update_features(read_table(output_path), merged)
+        else:
+            df = build_features(merged)
+        record['rows_out'] = len(df)
+    print(f"Built features: {describe(record)}")
+
+    write_table(df, output_path)
+    print(f"Feature-engineered dataset saved to '{output_path}'")
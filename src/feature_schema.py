@@ -0,0 +1,154 @@
+import json
+import os
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+SEASON_CODES = {'Maha': 1, 'Yala': 0}
+
+# Economic/political crisis years used for Crisis_Indicator (incl. the 2021-2022 economic crisis)
+CRISIS_YEARS = [1968, 1969, 1970, 1973, 1974, 1981, 1983, 1987, 1988, 1989, 1997, 2001, 2020, 2021, 2022, 2023]
+
+# Column order is the order the model was trained on. 'derive' says how to compute a feature
+# from raw columns when it isn't given; 'default' (filled in from the training data when the
+# schema is built) is used when it can be neither read nor derived.
+FEATURE_SPECS = [
+    {'name': 'Sown_Ha', 'dtype': 'float64'},
+    {'name': 'Sown_to_Harvest_Ratio', 'dtype': 'float64',
+     'derive': {'op': 'ratio', 'numerator': 'Harvested_Ha', 'denominator': 'Sown_Ha'}},
+    {'name': 'rfh_avg', 'dtype': 'float64'},
+    {'name': 'r1h_avg', 'dtype': 'float64'},
+    {'name': 'r3h_avg', 'dtype': 'float64'},
+    {'name': 'rfq', 'dtype': 'float64'},
+    {'name': 'Inflation', 'dtype': 'float64'},
+    {'name': 'Prev_Rainfall', 'dtype': 'float64'},
+    {'name': 'Season_Encoded', 'dtype': 'int8',
+     'derive': {'op': 'map', 'source': 'season', 'mapping': SEASON_CODES}},
+    {'name': 'Crisis_Indicator', 'dtype': 'int8', 'default': 0,
+     'derive': {'op': 'isin', 'source': 'Year', 'values': CRISIS_YEARS}},
+]
+FEATURE_NAMES = [spec['name'] for spec in FEATURE_SPECS]
+TARGET = 'Avg_Yield_Kg_Ha'
+
+
+def _n_rows(data):
+    if hasattr(data, 'columns'):
+        return len(data)
+    for value in data.values():
+        return 1 if np.ndim(value) == 0 else len(value)
+    return 0
+
+
+def _column(data, name):
+    if name not in data:
+        return None
+    return np.asarray(data[name])
+
+
+def _derive(rule, data):
+    if rule['op'] == 'ratio':
+        numerator, denominator = _column(data, rule['numerator']), _column(data, rule['denominator'])
+        if numerator is None or denominator is None:
+            return None
+        return numerator.astype(np.float64) / denominator.astype(np.float64)
+
+    source = _column(data, rule['source'])
+    if source is None:
+        return None
+    if rule['op'] == 'map':
+        mapping = rule['mapping']
+        codes = np.array([mapping.get(v, np.nan) for v in np.atleast_1d(source).tolist()], dtype=np.float64)
+        if np.isnan(codes).any():
+            unknown = sorted({str(v) for v in np.atleast_1d(source)[np.isnan(codes)]})
+            raise ValueError(f"Unknown {rule['source']} values {unknown}, expected one of {list(mapping)}")
+        return codes
+    if rule['op'] == 'isin':
+        return np.isin(source.astype(np.int64), rule['values']).astype(np.float64)
+    raise ValueError(f"Unknown derivation op '{rule['op']}'")
+
+
+class FeatureSchema:
+    def __init__(self, features, version=SCHEMA_VERSION, target=TARGET):
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Feature schema version {version} is newer than supported version {SCHEMA_VERSION}")
+        self.features = features
+        self.version = version
+        self.target = target
+
+    @property
+    def names(self):
+        return [spec['name'] for spec in self.features]
+
+    @property
+    def input_columns(self):
+        # every raw column build_matrix may read: the features and the columns they derive from
+        columns = []
+        for spec in self.features:
+            rule = spec.get('derive', {})
+            for name in [spec['name'], rule.get('numerator'), rule.get('denominator'), rule.get('source')]:
+                if name and name not in columns:
+                    columns.append(name)
+        return columns
+
+    def build_matrix(self, data, fill_defaults=True):
+        # data is a DataFrame, a dict of columns or a dict of scalars for one row
+        n_rows = _n_rows(data)
+        X = np.empty((n_rows, len(self.features)), dtype=np.float64)
+        missing = []
+        for j, spec in enumerate(self.features):
+            values = _column(data, spec['name'])
+            if values is None and 'derive' in spec:
+                values = _derive(spec['derive'], data)
+            if values is None and fill_defaults and spec.get('default') is not None:
+                values = spec['default']
+            if values is None:
+                missing.append(spec['name'])
+                continue
+            X[:, j] = values
+        if missing:
+            raise ValueError(f"Input is missing feature columns: {missing}")
+        return X
+
+    def check_model(self, model):
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None and list(names) != self.names:
+            raise ValueError(f"Model was trained on {list(names)}, but the feature schema lists {self.names}")
+        n_features = getattr(model, 'n_features_in_', len(self.features))
+        if n_features != len(self.features):
+            raise ValueError(f"Model expects {n_features} features, but the feature schema lists {len(self.features)}")
+
+    def to_dict(self):
+        return {'version': self.version, 'target': self.target, 'features': self.features}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Successfully created {path}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            payload = json.load(f)
+        return cls(payload['features'], version=payload['version'], target=payload.get('target', TARGET))
+
+
+def build_schema(train_df, specs=FEATURE_SPECS, target=TARGET):
+    # Training medians become the serving defaults for features a caller can't supply
+    features = [dict(spec) for spec in specs]
+    X = FeatureSchema(features, target=target).build_matrix(train_df, fill_defaults=False)
+    medians = np.nanmedian(X, axis=0)
+    for spec, median in zip(features, medians):
+        if 'default' not in spec and spec['dtype'] == 'float64':
+            spec['default'] = float(median)
+    return FeatureSchema(features, target=target)
+
+
+def schema_path(model_path):
+    return os.path.splitext(model_path)[0] + '.schema.json'
+
+
+def load_schema(model_path, model=None):
+    schema = FeatureSchema.load(schema_path(model_path))
+    if model is not None:
+        schema.check_model(model)
+    return schema
@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from feature_schema import SEASON_CODES
+from storage import read_table, table_path
+
+STORE_DIR = 'models/feature_store'
+# keys are ((adm + 1) * 2 + season code) * YEAR_SPAN + year, so the rows of one
+# (district, season) are contiguous and ordered by year; the national rows use adm -1
+YEAR_SPAN = 10_000
+NATIONAL = -1
+SEASON_COLUMNS = ['Avg_Yield_Kg_Ha', 'Sown_Ha', 'Sown_to_Harvest_Ratio', 'rfh_avg', 'r1h_avg', 'r3h_avg', 'rfq']
+RAINFALL_COLUMNS = ['rfh_avg', 'r1h_avg', 'r3h_avg', 'rfq']
+YEAR_COLUMNS = ['Population', 'Population_Growth_Rate', 'Inflation']
+
+
+def season_codes(seasons):
+    seasons = np.atleast_1d(np.asarray(seasons, dtype=object))
+    unique, inverse = np.unique(seasons.astype(str), return_inverse=True)
+    unknown = [s for s in unique if s not in SEASON_CODES]
+    if unknown:
+        raise ValueError(f"Unknown season values {unknown}, expected one of {list(SEASON_CODES)}")
+    return np.array([SEASON_CODES[s] for s in unique], dtype=np.int64)[inverse]
+
+
+def season_keys(years, seasons, adm_ids=None):
+    years = np.atleast_1d(np.asarray(years, dtype=np.int64))
+    adm = np.full(len(years), NATIONAL, dtype=np.int64) if adm_ids is None else np.atleast_1d(np.asarray(adm_ids, dtype=np.int64))
+    return ((adm + 1) * 2 + season_codes(seasons)) * YEAR_SPAN + years
+
+
+class FeatureStore:
+    # Sorted int64 keys and a float64 value matrix per table: 'seasons' keyed by
+    # (adm_id, season, Year) and 'years' keyed by Year. Every lookup is a searchsorted
+    # as-of query, i.e. the latest row at or before the requested point in time.
+    def __init__(self, tables):
+        self.tables = tables
+
+    def asof(self, table, keys, block=YEAR_SPAN):
+        # values of the latest row with key <= keys within the same block (key // block, or
+        # the whole table for block=None); NaN where there is no row early enough
+        table_keys, values, columns = self.tables[table]
+        keys = np.asarray(keys, dtype=np.int64)
+        idx = np.searchsorted(table_keys, keys, side='right') - 1
+        found = idx >= 0
+        if block is not None:
+            found[found] = table_keys[idx[found]] // block == keys[found] // block
+        out = np.full((len(keys), len(columns)), np.nan)
+        out[found] = values[idx[found]]
+        return dict(zip(columns, out.T))
+
+    def _seasons_asof(self, keys, national_keys, columns):
+        # district rows first, national rows wherever the district has no value
+        values = self.asof('seasons', keys)
+        if national_keys is not None:
+            national = self.asof('seasons', national_keys)
+            for col in columns:
+                values[col] = np.where(np.isnan(values[col]), national[col], values[col])
+        return {col: values[col] for col in columns}
+
+    def lookup(self, years, seasons, adm_ids=None):
+        # Point-in-time features for each requested (Year, season[, adm_id]): last season's
+        # yield and rainfall as the lags, the latest macro figures and rainfall statistics
+        # known as of that season. Years past the end of the data get the latest values.
+        years = np.atleast_1d(np.asarray(years, dtype=np.int64))
+        seasons = np.broadcast_to(np.asarray(seasons, dtype=object), years.shape)
+        adm = None if adm_ids is None else np.broadcast_to(np.asarray(adm_ids, dtype=np.int64), years.shape)
+        national = None if adm is None else season_keys(years, seasons)
+
+        previous = self._seasons_asof(season_keys(years - 1, seasons, adm),
+                                      None if adm is None else season_keys(years - 1, seasons),
+                                      ['Avg_Yield_Kg_Ha', 'rfh_avg'])
+        features = {'Prev_Yield': previous['Avg_Yield_Kg_Ha'], 'Prev_Rainfall': previous['rfh_avg']}
+        features.update(self._seasons_asof(season_keys(years, seasons, adm), national, RAINFALL_COLUMNS))
+        features.update(self.asof('years', years, block=None))
+        return features
+
+    def fill(self, data, overwrite=False):
+        # data: dict of columns (or of scalars for one row) with Year and season, optionally
+        # adm_id. Columns the caller didn't give, and NaN gaps in those it did, are filled.
+        scalar = np.ndim(data['Year']) == 0
+        filled = dict(data)
+        for name, values in self.lookup(data['Year'], data['season'], data.get('adm_id')).items():
+            given = data.get(name)
+            if given is not None and not overwrite:
+                given = np.asarray(given, dtype=np.float64)
+                values = np.where(np.isnan(given), values, given)
+            filled[name] = values[0] if scalar else values
+        return filled
+
+    def save(self, directory=STORE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        manifest = {}
+        for name, (keys, values, columns) in self.tables.items():
+            np.save(os.path.join(directory, f"{name}.keys.npy"), keys)
+            np.save(os.path.join(directory, f"{name}.values.npy"), values)
+            manifest[name] = columns
+        with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Successfully created {directory}")
+
+    @classmethod
+    def load(cls, directory=STORE_DIR, mmap_mode='r'):
+        # memory-mapped by default: loading costs nothing and pages come in as lookups touch them
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        tables = {}
+        for name, columns in manifest.items():
+            tables[name] = (np.load(os.path.join(directory, f"{name}.keys.npy"), mmap_mode=mmap_mode),
+                            np.load(os.path.join(directory, f"{name}.values.npy"), mmap_mode=mmap_mode),
+                            columns)
+        return cls(tables)
+
+
+def _sorted_table(keys, frame, columns, block=None):
+    # gaps are forward-filled within each block, so the as-of row of a key always holds the
+    # latest known value of every column rather than a NaN from a partial row
+    keys = np.asarray(keys, dtype=np.int64)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if len(keys) and (np.diff(keys) == 0).any():
+        raise ValueError("Feature store keys must be unique")
+    values = frame.reindex(columns=columns).iloc[order].reset_index(drop=True)
+    values = values.groupby(keys // block if block is not None else np.zeros(len(keys))).ffill()
+    return keys, np.ascontiguousarray(values.to_numpy(dtype=np.float64)), columns
+
+
+def build_feature_store(features_df, population_df, inflation_df, rainfall_df=None):
+    # national season rows from the feature-engineered dataset, district rainfall rows from
+    # the processed seasonal rainfall table, macro series keyed by Year
+    national_keys = season_keys(features_df['Year'], features_df['season'])
+    frames = [(national_keys, features_df)]
+    if rainfall_df is not None:
+        rainfall = rainfall_df.rename(columns={'year': 'Year'})
+        frames.append((season_keys(rainfall['Year'], rainfall['season'], rainfall['adm_id']), rainfall))
+    seasons = _sorted_table(np.concatenate([keys for keys, _ in frames]),
+                            pd.concat([df.reindex(columns=SEASON_COLUMNS) for _, df in frames], ignore_index=True),
+                            SEASON_COLUMNS, block=YEAR_SPAN)
+
+    macro = population_df.merge(inflation_df, on='Year', how='outer').sort_values('Year')
+    years = _sorted_table(macro['Year'], macro, YEAR_COLUMNS)
+    return FeatureStore({'seasons': seasons, 'years': years})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the point-in-time feature store used at serving time")
+    parser.add_argument('--output', default=STORE_DIR)
+    parser.add_argument('--no-districts', action='store_true', help="leave out the per-district rainfall rows")
+    args = parser.parse_args()
+
+    store = build_feature_store(
+        read_table(table_path('data/processed/feature_engineered_dataset.csv')),
+        read_table(table_path('data/processed/population.csv')),
+        read_table(table_path('data/processed/inflation.csv')),
+        None if args.no_districts else read_table(table_path('data/processed/seasonal_rainfall.csv')),
+    )
+    store.save(args.output)
@@ -0,0 +1,222 @@
+import numpy as np
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from model_registry import MODEL_PATH, load_model, model_version
+
+DEFAULT_CHUNK_ROWS = 1024
+# 90% interval and the median
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+# The engine wins on small batches, where sklearn's per-call setup dominates, but its
+# one-numpy-step-per-level traversal loses to sklearn's compiled trees beyond a few hundred
+# rows (about 7x slower at 50k rows for the 150-tree model), so larger batches go to the
+# sklearn forest the engine was built from (see batch_predict.predict_matrix)
+ENGINE_MAX_ROWS = 512
+
+# model sha256 -> FlatForest, so the conversion also only happens once per artifact
+_engines = {}
+
+
+class FlatForest:
+    # All trees of a fitted forest flattened into contiguous arrays. Node ids are global
+    # (tree offset already added to the children) and leaves point to themselves, so every
+    # row can be advanced one level per step without checking which tree it is in.
+
+    def __init__(self, feature, threshold, missing_left, left, right, value, roots, max_depth, feature_names_in_=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_left = missing_left
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_estimators = len(roots)
+        if feature_names_in_ is not None:
+            self.feature_names_in_ = np.asarray(feature_names_in_, dtype=object)
+        self.n_features_in_ = int(feature.max()) + 1 if feature_names_in_ is None else len(feature_names_in_)
+        # set by from_sklearn; only a fast path for large batches, so artifacts don't carry it
+        self.sklearn_model = None
+
+    def __getstate__(self):
+        return {**self.__dict__, 'sklearn_model': None}
+
+    @classmethod
+    def from_sklearn(cls, model):
+        features, thresholds, missing_lefts, lefts, rights, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            # NaN routing learned by sklearn >= 1.3; older trees send NaN right like `nan <= t` does
+            missing_lefts.append(getattr(tree, 'missing_go_to_left', np.zeros(n_nodes, dtype=np.uint8)))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        forest = cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            missing_left=np.ascontiguousarray(np.concatenate(missing_lefts), dtype=bool),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=int(max_depth),
+            feature_names_in_=getattr(model, 'feature_names_in_', None),
+        )
+        forest.sklearn_model = model
+        return forest
+
+    def _to_matrix(self, X):
+        if hasattr(X, 'columns') and hasattr(self, 'feature_names_in_'):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features_in_}")
+        # sklearn compares float32 inputs against the thresholds, do the same for identical splits
+        return np.ascontiguousarray(X, dtype=np.float32).astype(np.float64)
+
+    def _leaves(self, X):
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        row_offsets = np.arange(n_rows) * n_features
+        has_missing = np.isnan(flat_X).any()
+        for _ in range(self.max_depth):
+            x = flat_X[row_offsets + self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if has_missing:
+                go_left |= np.isnan(x) & self.missing_left[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            # most trees are much shallower than the deepest one
+            if np.array_equal(next_nodes, nodes):
+                break
+            nodes = next_nodes
+        return nodes
+
+    @property
+    def nbytes(self):
+        arrays = [self.feature, self.threshold, self.missing_left, self.left, self.right, self.value, self.roots]
+        return sum(a.nbytes for a in arrays)
+
+    def node_depths(self):
+        depths = np.full(len(self.feature), -1, dtype=np.intp)
+        frontier, depth = self.roots, 0
+        while len(frontier):
+            depths[frontier] = depth
+            internal = frontier[self.left[frontier] != frontier]
+            frontier = np.concatenate([self.left[internal], self.right[internal]])
+            depth += 1
+        return depths
+
+    def prune(self, n_trees=None, max_depth=None):
+        # Keeps the first n_trees trees (they are i.i.d., any subset is an unbiased forest)
+        # and turns nodes at max_depth into leaves; internal nodes already hold the mean
+        # target of their samples, so a collapsed node predicts what its subtree averages to
+        roots = self.roots[:n_trees]
+        tree_end = np.append(self.roots[1:], len(self.feature))[:len(roots)]
+        in_trees = np.zeros(len(self.feature), dtype=bool)
+        for start, end in zip(roots, tree_end):
+            in_trees[start:end] = True
+
+        depths = self.node_depths()
+        keep = in_trees & (depths >= 0)
+        if max_depth is not None:
+            keep &= depths <= max_depth
+        kept = np.flatnonzero(keep)
+        new_ids = np.full(len(self.feature), -1, dtype=np.intp)
+        # ascending old ids keep every tree contiguous with its root first
+        new_ids[kept] = np.arange(len(kept))
+
+        is_leaf = self.left[kept] == kept
+        if max_depth is not None:
+            is_leaf |= depths[kept] == max_depth
+        own = new_ids[kept]
+        return FlatForest(
+            feature=np.where(is_leaf, 0, self.feature[kept]).astype(self.feature.dtype),
+            threshold=np.where(is_leaf, 0, self.threshold[kept]).astype(self.threshold.dtype),
+            missing_left=self.missing_left[kept] & ~is_leaf,
+            left=np.where(is_leaf, own, new_ids[self.left[kept]]).astype(self.left.dtype),
+            right=np.where(is_leaf, own, new_ids[self.right[kept]]).astype(self.right.dtype),
+            value=self.value[kept],
+            roots=new_ids[roots],
+            max_depth=int(depths[kept].max()) if max_depth is None else min(self.max_depth, max_depth),
+            feature_names_in_=getattr(self, 'feature_names_in_', None),
+        )
+
+    def quantize(self, threshold_dtype=np.float32, value_dtype=np.float32):
+        # Inputs are compared as float32 (see _to_matrix), so rounding every threshold down
+        # to the nearest float32 keeps all splits identical; float16 is lossy and only
+        # worth it when the size report says the accuracy holds. Node ids and feature
+        # indices get the smallest integer type that holds them.
+        threshold = self.threshold.astype(threshold_dtype)
+        too_high = threshold.astype(np.float64) > self.threshold
+        threshold[too_high] = np.nextafter(threshold[too_high], threshold_dtype(-np.inf))
+        index_dtype = np.int32 if len(self.feature) < 2 ** 31 else np.intp
+        feature_dtype = np.uint8 if self.n_features_in_ <= 256 else np.int32
+        return FlatForest(
+            feature=self.feature.astype(feature_dtype),
+            threshold=threshold,
+            missing_left=self.missing_left,
+            left=self.left.astype(index_dtype),
+            right=self.right.astype(index_dtype),
+            value=self.value.astype(value_dtype),
+            roots=self.roots,
+            max_depth=self.max_depth,
+            feature_names_in_=getattr(self, 'feature_names_in_', None),
+        )
+
+    def tree_predictions(self, X, chunk_rows=DEFAULT_CHUNK_ROWS):
+        # (n_trees, n_rows) matrix of every tree's output
+        X = self._to_matrix(X)
+        out = np.empty((self.n_estimators, X.shape[0]), dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_rows):
+            out[:, start:start + chunk_rows] = self.value[self._leaves(X[start:start + chunk_rows])]
+        return out
+
+    def predict(self, X, chunk_rows=DEFAULT_CHUNK_ROWS):
+        return self.tree_predictions(X, chunk_rows).mean(axis=0)
+
+    def predict_distribution(self, X, quantiles=DEFAULT_QUANTILES, chunk_rows=DEFAULT_CHUNK_ROWS):
+        # mean, std and quantiles of the per-tree outputs; each chunk's (n_trees, rows)
+        # matrix is reduced right away so memory stays bounded by chunk_rows
+        X = self._to_matrix(X)
+        n_rows = X.shape[0]
+        out = {'mean': np.empty(n_rows), 'std': np.empty(n_rows)}
+        out.update({quantile_label(q): np.empty(n_rows) for q in quantiles})
+        for start in range(0, n_rows, chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            per_tree = self.value[self._leaves(X[rows])]
+            out['mean'][rows] = per_tree.mean(axis=0)
+            out['std'][rows] = per_tree.std(axis=0)
+            if len(quantiles):
+                for q, values in zip(quantiles, np.quantile(per_tree, quantiles, axis=0)):
+                    out[quantile_label(q)][rows] = values
+        return out
+
+
+def quantile_label(q):
+    return f"p{q * 100:g}"
+
+
+def load_forest_engine(path=MODEL_PATH, mmap_mode=None):
+    model = load_model(path, mmap_mode=mmap_mode)
+    # already flattened (e.g. a compressed artifact), or a model that isn't a forest
+    if isinstance(model, FlatForest) or not isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        return model
+
+    key = model_version(path, mmap_mode)
+    if key not in _engines:
+        _engines[key] = FlatForest.from_sklearn(model)
+    return _engines[key]
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+METRICS_PATH = 'results/metrics.jsonl'
+PROFILE_DIR = 'results/profiles'
+PROFILERS = ['cprofile', 'pyinstrument']
+# Settings live in the environment so the preprocessing worker processes inherit them:
+# CROP_METRICS is the JSON lines file (unset: nothing is written), CROP_PROFILE a
+# comma-separated list of steps to profile (or 'all'), CROP_PROFILER the profiler and
+# CROP_TRACE_MEMORY=1 adds a tracemalloc peak.
+PROMETHEUS_FIELDS = [
+    ('wall_seconds', 'crop_step_wall_seconds', 'Wall-clock time of the last run'),
+    ('cpu_seconds', 'crop_step_cpu_seconds', 'CPU time of the last run (whole process)'),
+    ('rss_growth_bytes', 'crop_step_rss_growth_bytes', 'How far the last run raised the process peak RSS'),
+    ('process_peak_rss_bytes', 'crop_process_peak_rss_bytes', 'Peak RSS of the whole process after the last run'),
+    ('tracemalloc_peak_bytes', 'crop_step_tracemalloc_peak_bytes', 'Peak Python allocations during the last run'),
+    ('rows_in', 'crop_step_rows_in', 'Rows going into the last run'),
+    ('rows_out', 'crop_step_rows_out', 'Rows coming out of the last run'),
+]
+
+
+def configure(metrics_path=None, profile=None, profiler='cprofile', trace_memory=False):
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler '{profiler}', expected one of {PROFILERS}")
+    settings = {
+        'CROP_METRICS': metrics_path or '',
+        'CROP_PROFILE': ','.join(profile or []),
+        'CROP_PROFILER': profiler,
+        'CROP_TRACE_MEMORY': '1' if trace_memory else '0',
+    }
+    os.environ.update(settings)
+
+
+def add_arguments(parser):
+    parser.add_argument('--metrics', default=METRICS_PATH, help="append timing/memory records to this JSON lines file ('' to disable)")
+    parser.add_argument('--profile', action='append', default=[], metavar='STEP',
+                        help="profile this step (repeatable, 'all' for every step)")
+    parser.add_argument('--profiler', choices=PROFILERS, default='cprofile')
+    parser.add_argument('--trace-memory', action='store_true', help="also record the tracemalloc peak of every step")
+
+
+def configure_from_args(args):
+    configure(args.metrics, args.profile, args.profiler, args.trace_memory)
+
+
+def count_rows(value):
+    if hasattr(value, 'shape') and len(getattr(value, 'shape', ())) > 0:
+        return int(value.shape[0])
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return None
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # the high-water mark of the whole process so far, not of one step;
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak) if sys.platform == 'darwin' else int(peak) * 1024
+
+
+def _profiling(step):
+    steps = [s.strip() for s in os.environ.get('CROP_PROFILE', '').split(',') if s.strip()]
+    return 'all' in steps or step in steps
+
+
+def _start_profiler():
+    if os.environ.get('CROP_PROFILER', 'cprofile') == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _save_profile(profiler, step):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = step.replace('/', '_')
+    if hasattr(profiler, 'output_html'):
+        profiler.stop()
+        path = os.path.join(PROFILE_DIR, f'{name}.html')
+        with open(path, 'w') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        # open with: python -m pstats results/profiles/<step>.prof
+        path = os.path.join(PROFILE_DIR, f'{name}.prof')
+        profiler.dump_stats(path)
+    return path
+
+
+def write_record(record, path=None):
+    path = os.environ.get('CROP_METRICS', '') if path is None else path
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # one short line per append, so concurrent worker processes don't interleave
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+@contextmanager
+def measure(step, rows_in=None, **labels):
+    # Times the block and records it; set record['rows_out'] inside the block
+    record = {'step': step, 'rows_in': rows_in, 'rows_out': None, 'pid': os.getpid(), 'started': time.time()}
+    record.update(labels)
+    # only the outermost traced step owns tracemalloc, nested ones would reset its peak
+    trace = os.environ.get('CROP_TRACE_MEMORY', '0') == '1' and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    profiler = _start_profiler() if _profiling(step) else None
+    rss_before = peak_rss_bytes()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = time.perf_counter() - wall
+        record['cpu_seconds'] = time.process_time() - cpu
+        if profiler is not None:
+            record['profile'] = _save_profile(profiler, step)
+        record['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1] if trace else None
+        if trace:
+            tracemalloc.stop()
+        # pool workers run several steps, so the process peak may belong to an earlier one;
+        # the growth is what this step added on top of it (0 if it stayed below)
+        record['process_peak_rss_bytes'] = peak_rss_bytes()
+        record['rss_growth_bytes'] = None if rss_before is None else record['process_peak_rss_bytes'] - rss_before
+        write_record(record)
+
+
+def describe(record):
+    parts = [f"{record['wall_seconds']:.2f}s wall", f"{record['cpu_seconds']:.2f}s cpu"]
+    if record.get('rss_growth_bytes') is not None:
+        parts.append(f"peak RSS +{record['rss_growth_bytes'] / 2 ** 20:.0f} MiB "
+                     f"(process {record['process_peak_rss_bytes'] / 2 ** 20:.0f} MiB)")
+    if record.get('rows_in') is not None:
+        parts.append(f"{record['rows_in']} rows in")
+    if record.get('rows_out') is not None:
+        parts.append(f"{record['rows_out']} rows out")
+    return ', '.join(parts)
+
+
+def read_records(path=METRICS_PATH):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def prometheus_text(records):
+    # Prometheus text exposition of the latest record of every step, plus a run counter
+    latest, runs = {}, {}
+    for record in records:
+        latest[record['step']] = record
+        runs[record['step']] = runs.get(record['step'], 0) + 1
+    lines = ['# HELP crop_step_runs_total Recorded runs of the step', '# TYPE crop_step_runs_total counter']
+    lines += [f'crop_step_runs_total{{step="{step}"}} {runs[step]}' for step in sorted(runs)]
+    for field, metric, text in PROMETHEUS_FIELDS:
+        values = [(step, latest[step].get(field)) for step in sorted(latest) if latest[step].get(field) is not None]
+        if not values:
+            continue
+        lines += [f'# HELP {metric} {text}', f'# TYPE {metric} gauge']
+        lines += [f'{metric}{{step="{step}"}} {value}' for step, value in values]
+    return '\n'.join(lines) + '\n'
+
+
+def summarize(records):
+    import pandas as pd
+    frame = pd.DataFrame(records)
+    for column in ['rows_in', 'rows_out', 'rss_growth_bytes', 'process_peak_rss_bytes']:
+        if column not in frame:
+            frame[column] = None
+    grouped = frame.groupby('step', sort=False)
+    return pd.DataFrame({
+        'runs': grouped.size(),
+        'wall_seconds': grouped['wall_seconds'].median(),
+        'cpu_seconds': grouped['cpu_seconds'].median(),
+        'rss_growth_mib': grouped['rss_growth_bytes'].max() / 2 ** 20,
+        'process_peak_rss_mib': grouped['process_peak_rss_bytes'].max() / 2 ** 20,
+        'rows_in': grouped['rows_in'].last(),
+        'rows_out': grouped['rows_out'].last(),
+    }).sort_values('wall_seconds', ascending=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the recorded step metrics, slowest first")
+    parser.add_argument('--metrics', default=METRICS_PATH)
+    parser.add_argument('--prometheus', default=None, help="also write the Prometheus text exposition here")
+    args = parser.parse_args()
+
+    records = read_records(args.metrics)
+    print(summarize(records).to_string(float_format=lambda v: f"{v:.2f}"))
+    if args.prometheus:
+        os.makedirs(os.path.dirname(args.prometheus) or '.', exist_ok=True)
+        with open(args.prometheus, 'w') as f:
+            f.write(prometheus_text(records))
+        print(f"Successfully created {args.prometheus}")
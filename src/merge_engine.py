@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+def _plain_keys(frame, keys):
+    # join keys with one dtype on both sides: int64 years and ids, text seasons
+    columns = {}
+    for key in keys:
+        values = frame[key]
+        if key == 'season' or not pd.api.types.is_numeric_dtype(values):
+            columns[key] = values.astype(object).astype(str).to_numpy()
+        else:
+            columns[key] = values.to_numpy(dtype=np.int64)
+    return columns
+
+
+def key_index(frame, keys):
+    # the (Year, season[, adm_id]) index every source is aligned to
+    columns = _plain_keys(frame, keys)
+    if len(keys) == 1:
+        return pd.Index(columns[keys[0]], name=keys[0])
+    return pd.MultiIndex.from_arrays([columns[key] for key in keys], names=keys)
+
+
+def join_sources(base, sources):
+    # Left-joins every source onto base in one pass. sources: [(frame, source_keys)], each
+    # source keyed by a subset of keys (e.g. population by Year only); repeated keys in a
+    # source (districts under a national key) are averaged in one grouped reduction.
+    base = base.reset_index(drop=True)
+    parts = [base]
+    for frame, source_keys in sources:
+        source_keys = list(source_keys)
+        values = frame.drop(columns=source_keys)
+        index = key_index(frame, source_keys)
+        if index.has_duplicates:
+            values = values.groupby(index, sort=False).mean()
+        else:
+            values = values.set_axis(index)
+        aligned = values.reindex(key_index(base, source_keys))
+        parts.append(aligned.reset_index(drop=True))
+    return pd.concat(parts, axis=1)
+
+
+# Imputers fill values[target] from values[train] within each group. values is a float
+# (rows, columns) matrix, groups integer group codes and years the row years.
+def seasonal_median(values, groups, years, train, target, **_):
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    medians = pd.DataFrame(values[train]).groupby(groups[train]).median().reindex(range(n_groups)).to_numpy()
+    return medians[groups[target]]
+
+
+def trend(values, groups, years, train, target, **_):
+    # per-group least-squares line over the years, from grouped sums (bincount) per column
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    out = np.empty((int(target.sum()), values.shape[1]))
+    for j in range(values.shape[1]):
+        rows = train & ~np.isnan(values[:, j])
+        g, x, y = groups[rows], years[rows].astype(np.float64), values[rows, j]
+        n = np.bincount(g, minlength=n_groups)
+        sx, sy = np.bincount(g, x, n_groups), np.bincount(g, y, n_groups)
+        sxx, sxy = np.bincount(g, x * x, n_groups), np.bincount(g, x * y, n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denom = n * sxx - sx ** 2
+            slope = np.where(denom != 0, (n * sxy - sx * sy) / denom, 0.0)
+            intercept = (sy - slope * sx) / n
+        out[:, j] = intercept[groups[target]] + slope[groups[target]] * years[target]
+    return out
+
+
+def knn_years(values, groups, years, train, target, k=5, **_):
+    # mean of the k training rows of the same group closest in year
+    out = np.empty((int(target.sum()), values.shape[1]))
+    distance = np.abs(years[target][:, None] - years[train][None, :]).astype(np.float64)
+    distance[groups[target][:, None] != groups[train][None, :]] = np.inf
+    for j in range(values.shape[1]):
+        d = np.where(np.isnan(values[train, j])[None, :], np.inf, distance)
+        kk = min(k, d.shape[1])
+        if kk == 0:
+            out[:, j] = np.nan
+            continue
+        nearest = np.argpartition(d, kk - 1, axis=1)[:, :kk]
+        found = np.isfinite(np.take_along_axis(d, nearest, axis=1))
+        counts = found.sum(axis=1)
+        sums = np.where(found, values[train, j][nearest], 0.0).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[:, j] = np.where(counts > 0, sums / counts, np.nan)
+    return out
+
+
+IMPUTERS = {'seasonal_median': seasonal_median, 'trend': trend, 'knn': knn_years}
+
+
+def impute(frame, columns, group_keys, train, target, strategy='seasonal_median', **options):
+    # Overwrites columns on the target rows with values estimated from the train rows of the
+    # same group (e.g. season, or season and district)
+    if strategy not in IMPUTERS:
+        raise ValueError(f"Unknown imputation strategy '{strategy}', expected one of {list(IMPUTERS)}")
+    train, target = np.asarray(train, dtype=bool), np.asarray(target, dtype=bool)
+    groups = key_index(frame, list(group_keys)).factorize()[0] if group_keys else np.zeros(len(frame), dtype=np.intp)
+    years = frame['Year'].to_numpy(dtype=np.int64)
+    values = frame[columns].to_numpy(dtype=np.float64, copy=True)
+    if target.any():
+        values[target] = IMPUTERS[strategy](values, groups, years, train, target, **options)
+    frame = frame.copy()
+    frame[columns] = values
+    return frame
@@ -0,0 +1,52 @@
+import logging
+import os
+import threading
+import joblib
+from storage import file_digest
+
+MODEL_PATH = 'models/random_forest_model.pkl'
+
+# (abs path, mmap_mode) -> {'stat': ..., 'sha256': ..., 'model': ...}
+# Lives at module level so it survives Streamlit reruns and is shared by every session in the process
+_registry = {}
+_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_model(path=MODEL_PATH, mmap_mode=None):
+    # mmap_mode is passed on to joblib.load, which maps the plain numpy arrays of an
+    # uncompressed dump read-only. sklearn trees copy their node arrays when unpickled,
+    # so a pickled forest still gets a private copy in every process.
+    key = (os.path.abspath(path), mmap_mode)
+    stat = _file_stat(path)
+
+    with _lock:
+        entry = _registry.get(key)
+        if entry is not None and entry['stat'] == stat:
+            return entry['model']
+
+        # mtime/size changed: only unpickle again if the content really changed
+        sha256 = file_digest(path)
+        if entry is not None and entry['sha256'] == sha256:
+            entry['stat'] = stat
+            return entry['model']
+
+        model = joblib.load(path, mmap_mode=mmap_mode)
+        _registry[key] = {'stat': stat, 'sha256': sha256, 'model': model}
+        logger.debug("Loaded model from %s (sha256 %s)", path, sha256[:12])
+        return model
+
+
+def model_version(path=MODEL_PATH, mmap_mode=None):
+    entry = _registry.get((os.path.abspath(path), mmap_mode))
+    return entry['sha256'] if entry is not None else None
+
+
+def clear_registry():
+    with _lock:
+        _registry.clear()
@@ -0,0 +1,174 @@
+import argparse
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from storage import read_table, table_path
+from feature_schema import build_schema
+
+LEADERBOARD_PATH = 'results/model_leaderboard.csv'
+SEASONS = ['Maha', 'Yala']
+
+
+# Factories are module-level functions so worker processes can look them up by name.
+# Each model runs single-threaded: the parallelism is across candidates.
+def random_forest():
+    return RandomForestRegressor(n_estimators=150, max_depth=20, max_features='sqrt', random_state=42, n_jobs=1)
+
+
+def extra_trees():
+    return ExtraTreesRegressor(n_estimators=150, max_depth=20, max_features='sqrt', random_state=42, n_jobs=1)
+
+
+def hist_gradient_boosting():
+    return HistGradientBoostingRegressor(max_iter=300, learning_rate=0.05, random_state=42)
+
+
+def xgboost():
+    from xgboost import XGBRegressor
+    return XGBRegressor(n_estimators=300, max_depth=4, learning_rate=0.05, tree_method='hist', device='cpu',
+                        random_state=42, n_jobs=1)
+
+
+def linear_regression():
+    return make_pipeline(SimpleImputer(strategy='median'), StandardScaler(), LinearRegression())
+
+
+def ridge():
+    return make_pipeline(SimpleImputer(strategy='median'), StandardScaler(), Ridge(alpha=1.0))
+
+
+MODEL_ZOO = {
+    'random_forest': random_forest,
+    'extra_trees': extra_trees,
+    'hist_gradient_boosting': hist_gradient_boosting,
+    'xgboost': xgboost,
+    'linear_regression': linear_regression,
+    'ridge': ridge,
+}
+
+
+def prepare_data(train_df, test_df, schema, n_splits=5):
+    # Feature matrices and fold indices are built once and shared by every candidate
+    X_train = np.ascontiguousarray(schema.build_matrix(train_df, fill_defaults=False), dtype=np.float32)
+    X_test = np.ascontiguousarray(schema.build_matrix(test_df, fill_defaults=False), dtype=np.float32)
+    folds = [(train_idx.astype(np.intp), test_idx.astype(np.intp))
+             for train_idx, test_idx in TimeSeriesSplit(n_splits=n_splits).split(X_train)]
+    return {
+        'X_train': X_train,
+        'y_train': train_df[schema.target].to_numpy(dtype=np.float64),
+        'X_test': X_test,
+        'y_test': test_df[schema.target].to_numpy(dtype=np.float64),
+        'test_seasons': test_df['season'].astype(str).to_numpy(),
+        'folds': folds,
+    }
+
+
+_shared = {}
+
+
+def _init_worker(data):
+    # runs once per worker process, so the arrays are sent once rather than with every task
+    _shared.update(data)
+
+
+def _rmse(y_true, y_pred):
+    return mean_squared_error(y_true, y_pred) ** 0.5
+
+
+def evaluate_model(name, data=None):
+    data = data or _shared
+    X_train, y_train, X_test, y_test = data['X_train'], data['y_train'], data['X_test'], data['y_test']
+
+    fold_rmse = []
+    for train_idx, test_idx in data['folds']:
+        model = MODEL_ZOO[name]().fit(X_train[train_idx], y_train[train_idx])
+        fold_rmse.append(_rmse(y_train[test_idx], model.predict(X_train[test_idx])))
+
+    start = time.perf_counter()
+    model = MODEL_ZOO[name]().fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+
+    # serving cost: one batch over the test set and the median of single-row calls
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    batch_time = time.perf_counter() - start
+    row_times = []
+    for i in range(min(len(X_test), 50)):
+        start = time.perf_counter()
+        model.predict(X_test[i:i + 1])
+        row_times.append(time.perf_counter() - start)
+
+    row = {
+        'model': name,
+        'cv_rmse': float(np.mean(fold_rmse)),
+        'cv_rmse_std': float(np.std(fold_rmse)),
+        'test_rmse': _rmse(y_test, y_pred),
+        'test_mae': mean_absolute_error(y_test, y_pred),
+    }
+    for season in SEASONS:
+        mask = data['test_seasons'] == season
+        row[f'{season}_rmse'] = _rmse(y_test[mask], y_pred[mask]) if mask.any() else np.nan
+        row[f'{season}_mae'] = mean_absolute_error(y_test[mask], y_pred[mask]) if mask.any() else np.nan
+    row.update({
+        'fit_seconds': fit_time,
+        'batch_predict_ms': batch_time * 1000,
+        'row_predict_ms': float(np.median(row_times)) * 1000 if row_times else np.nan,
+        'model_bytes': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+    })
+    return row
+
+
+def train_zoo(data, names=None, max_workers=None):
+    names = list(names or MODEL_ZOO)
+    unknown = [name for name in names if name not in MODEL_ZOO]
+    if unknown:
+        raise ValueError(f"Unknown models {unknown}, expected some of {list(MODEL_ZOO)}")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data,)) as pool:
+        futures = {pool.submit(evaluate_model, name): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                rows.append(future.result())
+            except ImportError as e:
+                # optional libraries (xgboost) are skipped when they aren't installed
+                print(f"[{name}] skipped: {e}")
+                continue
+            print(f"[{name}] cv RMSE {rows[-1]['cv_rmse']:.2f}, fit {rows[-1]['fit_seconds']:.2f}s")
+
+    leaderboard = pd.DataFrame(rows)
+    if not leaderboard.empty:
+        leaderboard = leaderboard.sort_values('cv_rmse').reset_index(drop=True)
+    return leaderboard
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train several regressors on the same folds and rank them")
+    parser.add_argument('--models', default=','.join(MODEL_ZOO), help="comma-separated names from the model zoo")
+    parser.add_argument('--workers', type=int, default=None, help="size of the process pool")
+    parser.add_argument('--output', default=LEADERBOARD_PATH)
+    args = parser.parse_args()
+
+    df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
+    train_df = df[df['Year'] <= 2018]
+    test_df = df[df['Year'] > 2018]
+    data = prepare_data(train_df, test_df, build_schema(train_df))
+
+    leaderboard = train_zoo(data, args.models.split(','), args.workers)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    leaderboard.to_csv(args.output, index=False)
+    print("\nLeaderboard:")
+    print(leaderboard.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print(f"Successfully created {args.output}")
@@ -1,28 +1,39 @@
+import argparse
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, mean_absolute_error
-from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.model_selection import TimeSeriesSplit
 import joblib
+from storage import file_digest, read_table, table_path, write_table
+from feature_schema import FEATURE_NAMES, TARGET, build_schema, schema_path
+from tuning import CACHE_PATH, tune_forest
+from backtesting import HOLDOUT_PATH
+from instrumentation import add_arguments, configure_from_args, describe, measure
 
-df = pd.read_csv('data/processed/feature_engineered_dataset.csv')
+parser = argparse.ArgumentParser(description="Tune and train the Random Forest yield model")
+parser.add_argument('--search', choices=['halving', 'grid'], default='halving',
+                    help="successive halving over n_estimators, or every cell of the grid")
+parser.add_argument('--no-cache', action='store_true', help="ignore and don't update the fold score cache")
+add_arguments(parser)
+args = parser.parse_args()
+configure_from_args(args)
 
-df['Season_Encoded'] = df['season'].map({'Maha': 1, 'Yala': 0})
-if 'Season_Encoded' not in df.columns:
-    raise ValueError("Season_Encoded column not created. Check 'Season' column values.")
+df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
 
-features = [
-    'Sown_Ha', 'Sown_to_Harvest_Ratio', 'rfh_avg', 'r1h_avg', 'r3h_avg', 'rfq', 'Inflation',
-     'Prev_Rainfall', 'Season_Encoded', 'Crisis_Indicator',
-]
-target = 'Avg_Yield_Kg_Ha'
+features = FEATURE_NAMES
+target = TARGET
 
 # Split data
 train_df = df[df['Year'] <= 2018]
 test_df = df[df['Year'] > 2018]
-X_train = train_df[features]
+
+# Feature schema (column order, derivations, serving defaults) is saved next to the model
+schema = build_schema(train_df)
+# fitted on named columns so the saved model keeps feature_names_in_ for FeatureSchema.check_model
+X_train = pd.DataFrame(schema.build_matrix(train_df, fill_defaults=False), columns=schema.names)
 y_train = train_df[target]
-X_test = test_df[features]
+X_test = pd.DataFrame(schema.build_matrix(test_df, fill_defaults=False), columns=schema.names)
 y_test = test_df[target]
 
 param_grid = {
@@ -38,22 +49,23 @@ model = RandomForestRegressor(random_state=42)
 
 tscv = TimeSeriesSplit(n_splits=5)
 
-grid_search = GridSearchCV(estimator=model, 
-                           param_grid=param_grid, 
-                           cv=tscv, 
-                           scoring='neg_mean_squared_error', 
-                           n_jobs=-1, 
-                           verbose=2)
-
-grid_search.fit(X_train, y_train)
+# Fold scores are cached per (data, params, fold), so only new cells are fitted on a re-run
+with measure('modeling.tune', rows_in=len(X_train), search=args.search) as record:
+    best_params, cv_results = tune_forest(X_train.to_numpy(), y_train.to_numpy(), param_grid, tscv, mode=args.search,
+                                          cache_path=None if args.no_cache else CACHE_PATH)
+print(f"Tuning: {describe(record)}")
 
-print(f"Best Hyperparameters: {grid_search.best_params_}")
+print(f"Best Hyperparameters: {best_params}")
 
-model = grid_search.best_estimator_
-# model.fit(X_train, y_train)
+model.set_params(**best_params)
+with measure('modeling.fit', rows_in=len(X_train)) as record:
+    model.fit(X_train, y_train)
+print(f"Training: {describe(record)}")
 
 # Predict and evaluate
-y_pred = model.predict(X_test)
+with measure('modeling.predict', rows_in=len(X_test)) as record:
+    y_pred = model.predict(X_test)
+    record['rows_out'] = len(y_pred)
 test_df['Predicted_Yield'] = y_pred
 rmse = mean_squared_error(y_test, y_pred) ** 0.5
 mae = mean_absolute_error(y_test, y_pred)
@@ -72,6 +84,14 @@ for season in ['Maha', 'Yala']:
         print(f"No test data for {season}")
 
 joblib.dump(model, 'models/random_forest_model.pkl')
+schema.save(schema_path('models/random_forest_model.pkl'))
+
+# the deployed model's test-set predictions, tagged with the pickle they came from, so
+# visualize_results.py plots them without loading the model and predicting again
+holdout_df = test_df[['Year', 'season', target, 'Predicted_Yield']].reset_index(drop=True)
+holdout_df['model_sha256'] = file_digest('models/random_forest_model.pkl')
+write_table(holdout_df, HOLDOUT_PATH)
+print(f"Successfully created {HOLDOUT_PATH}")
 
 # Feature importance
 feature_importance = pd.DataFrame({'Feature': features, 'Importance': model.feature_importances_})
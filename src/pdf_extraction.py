@@ -0,0 +1,157 @@
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from storage import file_digest
+
+CACHE_DIR = 'data/raw/.pdf_tables'
+DEFAULT_PAGES_PER_TASK = 4
+# the columns of data/raw/prices.csv, which preprocess_price reads
+PRICE_COLUMNS = ['date', 'admin1', 'admin2', 'market', 'market_id', 'latitude', 'longitude', 'category', 'commodity',
+                 'commodity_id', 'unit', 'priceflag', 'pricetype', 'currency', 'price', 'usdprice']
+# what the CBSL reports don't say, filled in for every row
+CBSL_DEFAULTS = {'market': 'CBSL', 'unit': 'KG', 'priceflag': 'actual', 'pricetype': 'Retail', 'currency': 'LKR'}
+
+
+class PdfplumberReader:
+    # pdfplumber is only needed where PDFs are actually opened, i.e. in the workers
+    def page_count(self, content):
+        import pdfplumber
+        with pdfplumber.open(content) as pdf:
+            return len(pdf.pages)
+
+    def tables(self, content, pages):
+        import pdfplumber
+        with pdfplumber.open(content) as pdf:
+            return [(page, pdf.pages[page].extract_tables()) for page in pages]
+
+
+def _open(source):
+    # a document is either its bytes (just downloaded) or a path to it
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def _page_count(reader, source):
+    return reader.page_count(_open(source))
+
+
+def _extract_pages(reader, source, pages):
+    return reader.tables(_open(source), pages)
+
+
+def document_hash(source):
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    return file_digest(source)
+
+
+def _cache_path(cache_dir, digest):
+    return os.path.join(cache_dir, f"{digest}.json")
+
+
+def _load_cached(cache_dir, digest):
+    if cache_dir is None or not os.path.exists(_cache_path(cache_dir, digest)):
+        return None
+    with open(_cache_path(cache_dir, digest)) as f:
+        return json.load(f)['tables']
+
+
+def _save_cached(cache_dir, digest, tables):
+    if cache_dir is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, digest)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'tables': tables}, f)
+    os.replace(tmp, path)
+
+
+def extract_tables(documents, cache_dir=CACHE_DIR, reader=None, max_workers=None, pages_per_task=DEFAULT_PAGES_PER_TASK):
+    # documents: {name: bytes or path}. Returns {name: [table, ...]} in page order, each table a
+    # list of rows. Pages of every uncached document are split into tasks of pages_per_task and
+    # spread over one process pool; tables are cached per document hash, so a backfill rerun
+    # only extracts the reports it hasn't seen. Documents that fail to open are left out.
+    reader = reader or PdfplumberReader()
+    digests = {name: document_hash(source) for name, source in documents.items()}
+    tables = {}
+    pending = {}
+    for name, digest in digests.items():
+        cached = _load_cached(cache_dir, digest)
+        if cached is not None:
+            tables[name] = cached
+        elif digest not in pending.values():
+            pending[name] = digest
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            counts = {name: pool.submit(_page_count, reader, documents[name]) for name in pending}
+            tasks = {}
+            for name, future in counts.items():
+                try:
+                    n_pages = future.result()
+                except Exception as e:
+                    print(f"Error opening {name}: {e}")
+                    continue
+                tasks[name] = [pool.submit(_extract_pages, reader, documents[name], range(start, min(start + pages_per_task, n_pages)))
+                               for start in range(0, n_pages, pages_per_task)]
+            for name, futures in tasks.items():
+                try:
+                    pages = [page for future in futures for page in future.result()]
+                except Exception as e:
+                    print(f"Error processing {name}: {e}")
+                    continue
+                tables[name] = [table for _, page_tables in sorted(pages, key=lambda page: page[0]) for table in page_tables]
+                _save_cached(cache_dir, pending[name], tables[name])
+
+    # identical documents under several names are extracted once
+    for name, digest in digests.items():
+        if name not in tables:
+            same = next((other for other in tables if digests[other] == digest), None)
+            if same is not None:
+                tables[name] = tables[same]
+    return {name: tables[name] for name in documents if name in tables}
+
+
+def price_rows(tables):
+    # CBSL tables are (crop, date, price in LKR, ...) under a header row; rows without a
+    # readable date or price are dropped
+    rows = [row[:3] for table in tables for row in table[1:] if row and len(row) >= 3 and row[0] and row[2]]
+    raw = pd.DataFrame(rows, columns=['commodity', 'date', 'price'], dtype=object)
+    prices = pd.DataFrame(index=raw.index, columns=PRICE_COLUMNS)
+    prices['commodity'] = raw['commodity'].str.strip()
+    prices['date'] = pd.to_datetime(raw['date'].str.strip(), errors='coerce', format='mixed').dt.strftime('%Y-%m-%d')
+    prices['price'] = pd.to_numeric(raw['price'].str.replace('LKR', '').str.replace(',', '').str.strip(), errors='coerce')
+    for col, value in CBSL_DEFAULTS.items():
+        prices[col] = value
+    return prices.dropna(subset=['date', 'price']).reset_index(drop=True)
+
+
+def extract_prices(documents, cache_dir=CACHE_DIR, reader=None, max_workers=None, pages_per_task=DEFAULT_PAGES_PER_TASK):
+    extracted = extract_tables(documents, cache_dir, reader, max_workers, pages_per_task)
+    frames = [price_rows(tables) for tables in extracted.values()]
+    if not frames:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract price rows from a directory of CBSL price report PDFs")
+    parser.add_argument('pdf_dir')
+    parser.add_argument('--output', default='data/raw/cbsl_prices.csv')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--pages-per-task', type=int, default=DEFAULT_PAGES_PER_TASK)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.pdf_dir, '*.pdf')))
+    prices = extract_prices({path: path for path in paths}, args.cache_dir, max_workers=args.workers, pages_per_task=args.pages_per_task)
+    prices.to_csv(args.output, index=False)
+    print(f"Successfully created {args.output}")
+    print(f"Documents: {len(paths)}, Price rows: {len(prices)}")
@@ -0,0 +1,156 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from instrumentation import count_rows, describe, measure
+from storage import file_digest, resolve_table, table_rows
+
+STATE_PATH = 'data/processed/.pipeline_state.json'
+
+
+class Stage:
+    # func is called as func(*inputs, *outputs, **options), matching the
+    # (input paths..., output_path) signature every preprocessing function already has
+    def __init__(self, name, func, inputs, outputs, options=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.options = dict(options or {})
+
+
+def _module_of(obj):
+    if inspect.ismodule(obj):
+        return obj
+    name = getattr(obj, '__module__', None)
+    return sys.modules.get(name) if isinstance(name, str) else None
+
+
+def code_files(func):
+    # The file defining func plus every module from the same directory that it reaches
+    # through its imports, so an edited helper (streaming.py, workbooks.py, ...) also
+    # changes the fingerprint of the stages that use it
+    module = _module_of(func)
+    code_dir = os.path.dirname(os.path.abspath(module.__file__))
+    files = set()
+    todo = [module]
+    while todo:
+        module = todo.pop()
+        path = getattr(module, '__file__', None)
+        if path is None:
+            continue
+        path = os.path.abspath(path)
+        if path in files or os.path.dirname(path) != code_dir:
+            continue
+        files.add(path)
+        todo.extend(dep for dep in map(_module_of, vars(module).values()) if dep is not None)
+    return sorted(files)
+
+
+def stage_fingerprint(stage):
+    digest = hashlib.sha256()
+    for path in code_files(stage.func):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(file_digest(path).encode('utf-8'))
+    for path in stage.inputs:
+        # a processed table may only exist as its committed CSV snapshot
+        digest.update(path.encode('utf-8'))
+        digest.update(file_digest(resolve_table(path)).encode('utf-8'))
+    for path in stage.outputs:
+        digest.update(path.encode('utf-8'))
+    digest.update(json.dumps(stage.options, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def stage_dependencies(stages):
+    producers = {path: stage.name for stage in stages for path in stage.outputs}
+    return {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in stages}
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def input_rows(paths):
+    # rows across the stage's input tables, from metadata or a line count (None if none can be counted)
+    counts = [table_rows(path) for path in map(resolve_table, paths) if path is not None]
+    counts = [n for n in counts if n is not None]
+    return sum(counts) if counts else None
+
+
+def _run_stage(name, func, inputs, outputs, options):
+    # runs in a worker process; only the timing/memory record goes back, not the DataFrame
+    with measure(name, rows_in=input_rows(inputs)) as record:
+        record['rows_out'] = count_rows(func(*inputs, *outputs, **options))
+    return record
+
+
+def run_pipeline(stages, state_path=STATE_PATH, max_workers=None, force=False):
+    deps = stage_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    state = {} if force else load_state(state_path)
+    remaining = set(by_name)
+    done = set()
+    running = {}
+    summary = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            ready = sorted(name for name in remaining if deps[name] <= done)
+            for name in ready:
+                remaining.discard(name)
+                stage = by_name[name]
+
+                missing = [path for path in stage.inputs if resolve_table(path) is None]
+                if missing:
+                    if all(resolve_table(path) is not None for path in stage.outputs):
+                        print(f"[{name}] inputs {missing} not found, keeping existing outputs")
+                        done.add(name)
+                        summary[name] = 'kept'
+                        continue
+                    raise FileNotFoundError(f"Stage '{name}' is missing inputs {missing}")
+
+                # inputs of downstream stages are upstream outputs, so hashing them
+                # means an unchanged upstream result also skips everything after it
+                fingerprint = stage_fingerprint(stage)
+                outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+                if outputs_exist and state.get(name, {}).get('fingerprint') == fingerprint:
+                    print(f"[{name}] up to date, skipped")
+                    done.add(name)
+                    summary[name] = 'skipped'
+                    continue
+
+                future = pool.submit(_run_stage, name, stage.func, stage.inputs, stage.outputs, stage.options)
+                running[future] = (name, fingerprint)
+
+            if ready:
+                # skipped stages finish immediately and may have unblocked others
+                continue
+            if not running:
+                if remaining:
+                    raise ValueError(f"Pipeline has a dependency cycle among {sorted(remaining)}")
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint = running.pop(future)
+                record = future.result()
+                state[name] = {'fingerprint': fingerprint}
+                # persist after every stage so an interrupted run keeps its progress
+                save_state(state, state_path)
+                done.add(name)
+                summary[name] = 'ran'
+                print(f"[{name}] finished: {describe(record)}")
+
+    return summary
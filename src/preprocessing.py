@@ -1,5 +1,14 @@
+import argparse
+import os
 import pandas as pd
 import numpy as np
+from merge_engine import impute, join_sources
+from instrumentation import add_arguments, configure_from_args
+from pipeline import Stage, run_pipeline
+from storage import read_table, table_path, write_table
+from streaming import DEFAULT_CHUNKSIZE, GroupedMean, SeenHashes, state_path, streaming_median
+from seasons import SEASON_DTYPE, add_calendar_columns
+from workbooks import CACHE_DIR as WORKBOOK_CACHE_DIR, PADDY_COLUMNS, read_sheet, season_layout
 
 # def preprocess_data(weather_path, prices_path, ndvi_path, output_path):
 #     weather = pd.read_csv(weather_path)
@@ -53,7 +62,73 @@ import numpy as np
 #     print(f"Successfully created {output_path}")
 #     return merged
 
-def preprocess_price(price_path, output_path):
+def _clean_price_rows(prices_data):
+    # rice rows of one chunk, cleaned the same way as the in-memory path
+    riceprice_data = prices_data[prices_data['commodity'].str.contains('rice', case=False, na=False)].copy()
+    riceprice_data['date'] = pd.to_datetime(riceprice_data['date'], errors='coerce')
+    for col in ['latitude', 'longitude', 'price', 'usdprice']:
+        riceprice_data[col] = pd.to_numeric(riceprice_data[col], errors='coerce')
+    riceprice_data = riceprice_data.dropna(subset=['date', 'price'])
+
+    categorical_cols = ['admin1', 'admin2', 'market', 'category', 'commodity', 'unit', 'priceflag', 'pricetype', 'currency']
+    riceprice_data[categorical_cols] = riceprice_data[categorical_cols].fillna('Unknown')
+    riceprice_data[['market_id', 'commodity_id']] = riceprice_data[['market_id', 'commodity_id']].fillna('Unknown')
+
+    riceprice_data = add_calendar_columns(riceprice_data)
+    return riceprice_data
+
+def _load_aggregates(output_path, keys, columns, incremental):
+    # incremental runs resume from the running sums/counts of the last run
+    # and only fold in rows dated after its watermark
+    if incremental and os.path.exists(state_path(output_path)):
+        agg, watermark = GroupedMean.load(state_path(output_path))
+        return agg, (pd.Timestamp(watermark) if watermark else None)
+    return GroupedMean(keys, columns), None
+
+def _latest_date(latest, dates):
+    if dates.empty:
+        return latest
+    return dates.max() if latest is None else max(latest, dates.max())
+
+def stream_price(price_path, output_path, chunksize=DEFAULT_CHUNKSIZE, incremental=False):
+    agg, watermark = _load_aggregates(output_path, ['year', 'season', 'commodity'], ['price', 'usdprice'], incremental)
+    latest = watermark
+    seen_rows = SeenHashes()
+    n_rows = 0
+
+    # every column as text, like the full read where the HXL tag row makes them all object
+    for chunk in pd.read_csv(price_path, dtype=str, chunksize=chunksize):
+        riceprice_data = _clean_price_rows(chunk)
+        if watermark is not None:
+            riceprice_data = riceprice_data[riceprice_data['date'] > watermark]
+
+        # drop_duplicates across chunks: only hashes of kept rice rows are remembered
+        new_rows = seen_rows.add(pd.util.hash_pandas_object(riceprice_data, index=False).to_numpy())
+        riceprice_data = riceprice_data[new_rows]
+
+        agg.update(riceprice_data)
+        latest = _latest_date(latest, riceprice_data['date'])
+        n_rows += len(riceprice_data)
+
+    if incremental:
+        agg.save(state_path(output_path), latest.isoformat() if latest is not None else None)
+
+    agg_prices = agg.result().rename(columns={
+        'price': 'avg_price_lkr',
+        'usdprice': 'avg_price_usd'
+    })
+    agg_prices['season'] = agg_prices['season'].astype(SEASON_DTYPE)
+    agg_prices = agg_prices.sort_values(['year', 'season', 'commodity'])
+
+    write_table(agg_prices, output_path)
+    print(f"Successfully created {output_path}")
+    print(f"Original rows: {n_rows}, Aggregated rows: {len(agg_prices)}")
+    return agg_prices
+
+def preprocess_price(price_path, output_path, chunksize=None, incremental=False):
+    if chunksize or incremental:
+        return stream_price(price_path, output_path, chunksize or DEFAULT_CHUNKSIZE, incremental)
+
     prices_data = pd.read_csv(price_path)
 
     # Filter rows where 'commodity' contains "rice"
@@ -81,13 +156,9 @@ def preprocess_price(price_path, output_path):
 
     riceprice_data = riceprice_data.drop_duplicates()
 
-    riceprice_data['year'] = riceprice_data['date'].dt.year
-    riceprice_data['month'] = riceprice_data['date'].dt.month
-    riceprice_data['season'] = riceprice_data['month'].apply(
-        lambda m: 'Maha' if m in [9,10, 11, 12, 1, 2, 3] else ('Yala' if m in [4,5, 6, 7, 8] else 'Unknown') 
-    )
+    riceprice_data = add_calendar_columns(riceprice_data)
 
-    agg_prices = riceprice_data.groupby(['year', 'season', 'commodity']).agg({
+    agg_prices = riceprice_data.groupby(['year', 'season', 'commodity'], observed=True).agg({
         'price': 'mean',
         'usdprice': 'mean'
     }).reset_index()
@@ -99,12 +170,67 @@ def preprocess_price(price_path, output_path):
 
     agg_prices = agg_prices.sort_values(['year', 'season', 'commodity'])
 
-    agg_prices.to_csv(output_path, index=False)
+    write_table(agg_prices, output_path)
     print(f"Successfully created {output_path}")
     print(f"Original rows: {len(riceprice_data)}, Aggregated rows: {len(agg_prices)}")
     return agg_prices
 
-def preprocess_rainfall(rainfall_path, output_path):
+RAINFALL_AGG_COLS = ['rfh', 'rfh_avg', 'r1h', 'r1h_avg', 'r3h', 'r3h_avg', 'rfq']
+# seasons before this have no rainfall records and get imputed values
+RAINFALL_START_YEAR = 1980
+
+def _read_final_rainfall(rainfall_path, chunksize):
+    # final-version rows with a date and the key metrics, before the missing-value fill
+    usecols = ['date', 'version', 'PCODE', 'adm_id'] + RAINFALL_AGG_COLS
+    # text ids keep the group keys identical from chunk to chunk
+    dtypes = {'version': str, 'PCODE': str, 'adm_id': str}
+    for chunk in pd.read_csv(rainfall_path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+        chunk['date'] = pd.to_datetime(chunk['date'], format="%Y-%m-%d", errors='coerce')
+        for col in RAINFALL_AGG_COLS:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+        chunk = chunk[chunk['version'] == 'final']
+        yield chunk.dropna(subset=['date', 'rfh', 'rfh_avg'])
+
+def stream_rainfall(rainfall_path, output_path, chunksize=DEFAULT_CHUNKSIZE, incremental=False):
+    agg, watermark = _load_aggregates(output_path, ['year', 'season', 'adm_id'], RAINFALL_AGG_COLS, incremental)
+    latest = watermark
+    n_rows = 0
+    for rainfall_data in _read_final_rainfall(rainfall_path, chunksize):
+        rainfall_data = rainfall_data[rainfall_data['PCODE'].str.startswith('LK', na=False)].copy()
+        if watermark is not None:
+            rainfall_data = rainfall_data[rainfall_data['date'] > watermark]
+        rainfall_data = add_calendar_columns(rainfall_data)
+        agg.update(rainfall_data)
+        latest = _latest_date(latest, rainfall_data['date'])
+        n_rows += len(rainfall_data)
+
+    if incremental:
+        agg.save(state_path(output_path), latest.isoformat() if latest is not None else None)
+
+    # The in-memory path fills gaps with medians over all final rows; those need extra
+    # bounded-memory passes, so only pay for them when a kept row actually has a gap.
+    # The sums keep gaps out, so a changed median re-fills old groups correctly too.
+    missing = agg.missing_counts()
+    fill_values = {}
+    for col in missing[missing > 0].index:
+        fill_values[col] = streaming_median(
+            lambda col=col: (chunk[col].to_numpy(dtype=np.float64) for chunk in _read_final_rainfall(rainfall_path, chunksize))
+        )
+
+    agg_rainfall = agg.result(fill_values)
+    agg_rainfall['season'] = agg_rainfall['season'].astype(SEASON_DTYPE)
+    agg_rainfall = agg_rainfall.drop_duplicates()
+    agg_rainfall = agg_rainfall.sort_values(['year', 'season'])
+
+    write_table(agg_rainfall, output_path)
+    print(f"Successfully created {output_path}")
+    print(f"Original rows: {n_rows}, Aggregated rows: {len(agg_rainfall)}")
+    return agg_rainfall
+
+def preprocess_rainfall(rainfall_path, output_path, chunksize=None, incremental=False):
+    if chunksize or incremental:
+        return stream_rainfall(rainfall_path, output_path, chunksize or DEFAULT_CHUNKSIZE, incremental)
+
     rainfall_data = pd.read_csv(rainfall_path)
 
     # Handle data types
@@ -125,13 +251,9 @@ def preprocess_rainfall(rainfall_path, output_path):
     rainfall_data = rainfall_data[rainfall_data['PCODE'].str.startswith('LK', na=False)]
 
     # DErived Columns
-    rainfall_data['year'] = rainfall_data['date'].dt.year
-    rainfall_data['month'] = rainfall_data['date'].dt.month
-    rainfall_data['season'] = rainfall_data['month'].apply(
-        lambda m: 'Maha' if m in [9,10, 11, 12, 1, 2, 3] else ('Yala' if m in [4,5, 6, 7, 8] else 'Unknown') 
-    )
+    rainfall_data = add_calendar_columns(rainfall_data)
 
-    agg_rainfall = rainfall_data.groupby(['year', 'season', 'adm_id']).agg({
+    agg_rainfall = rainfall_data.groupby(['year', 'season', 'adm_id'], observed=True).agg({
         'rfh': 'mean',
         'rfh_avg': 'mean',
         'r1h': 'mean',
@@ -145,94 +267,37 @@ def preprocess_rainfall(rainfall_path, output_path):
 
     agg_rainfall = agg_rainfall.sort_values(['year', 'season'])
 
-    agg_rainfall.to_csv(output_path, index=False)
+    write_table(agg_rainfall, output_path)
     print(f"Successfully created {output_path}")
     print(f"Original rows: {len(rainfall_data)}, Aggregated rows: {len(agg_rainfall)}")
     return agg_rainfall
 
-def preprocess_paddy_maha_season(maha_season_path, output_path):
-    maha_data = pd.read_excel(maha_season_path, sheet_name='Maha Season', skiprows=3)
-
-    # drop column A(empty column)
-    maha_data.dropna(axis=1, how='all', inplace=True)
-
-    # renamed for clarity
-    maha_data.columns = ['Year', 'Sown_Acres', 'Sown_Ha', 'Harvested_Acres', 'Harvested_Ha', 'Avg_Yield_Bushels_Acre', 'Avg_Yield_Kg_Ha', 'Production_Bushels', 'Production_Mt']
-
-    # dropped second row with units
-    maha_data = maha_data.drop(index=0).reset_index(drop=True)
-
-    # process year columns
-    maha_data['Year'] = maha_data['Year'].str.extract(r'(\d{4})/(\d{2})')[0].astype(int)
-    # maha_data['Year'] = maha_data['Year'].apply(lambda
-    #                                                     x: x + 1900 if x >=50 else x + 2000)
-    # maha_data['Year'] = maha_data['Year'].astype(int)
-
-    maha_data['season'] = 'Maha'
-
-    numeric_cols = ['Sown_Acres', 'Sown_Ha', 'Harvested_Acres', 'Harvested_Ha', 'Avg_Yield_Bushels_Acre', 'Avg_Yield_Kg_Ha', 'Production_Bushels', 'Production_Mt']
-    for col in numeric_cols:
-       maha_data[col] = pd.to_numeric(maha_data[col], errors='coerce')
-
-    # Handle missing values
-    maha_data = maha_data.dropna(subset=['Avg_Yield_Kg_Ha', 'Production_Mt', 'Year'])
-    maha_data[numeric_cols] = maha_data[numeric_cols].fillna(maha_data[numeric_cols].median())
-
-    # Feature engineering
-    # Sown to harvest ratio
-    maha_data['Sown_to_Harvest_Ratio'] = maha_data['Harvested_Ha'] / maha_data['Sown_Ha']
-
-    maha_data = maha_data.drop_duplicates()
-
-    maha_data = maha_data.sort_values(['Year'])
-
-    maha_data.to_csv(output_path, index=False)
-    print(f"Successfully created {output_path}")
-    return maha_data
-
-def preprocess_paddy_yala_season(yala_seasin_path, output_path):
-    yala_data = pd.read_excel(yala_seasin_path, sheet_name='Yala Season', skiprows=3)
-
-    # drop column A(empty column)
-    yala_data.dropna(axis=1, how='all', inplace=True)
-
-    # renaming
-    yala_data.columns = [
-        'Year', 'Sown_Acres', 'Sown_Ha', 'Harvested_Acres', 'Harvested_Ha',
-        'Avg_Yield_Bushels_Acre', 'Avg_Yield_Kg_Ha', 'Production_Bushels', 'Production_Mt'
-    ]
-
-    # dropped second row with units
-    yala_data = yala_data.drop(index=0).reset_index(drop=True)
-
-    # clean year column
-    yala_data['Year'] = pd.to_numeric(yala_data['Year'], errors='coerce').astype('Int64')
-
-    yala_data['season'] = 'Yala'
-
-    numeric_cols = ['Sown_Acres', 'Sown_Ha', 'Harvested_Acres', 'Harvested_Ha', 'Avg_Yield_Bushels_Acre', 'Avg_Yield_Kg_Ha', 'Production_Bushels', 'Production_Mt'] 
-    for col in numeric_cols:
-        yala_data[col] = pd.to_numeric(yala_data[col], errors='coerce')
+def preprocess_paddy_season(workbook_path, output_path, season, cache_dir=WORKBOOK_CACHE_DIR):
+    # one parser for the Maha and Yala workbooks; the parsed sheet comes from the cache
+    # unless the workbook changed
+    paddy_data = read_sheet(workbook_path, season_layout(season), cache_dir=cache_dir)
+    paddy_data['season'] = season
 
     # Handle missing values
-    yala_data = yala_data.dropna(subset=['Avg_Yield_Kg_Ha', 'Production_Mt', 'Year'])
-    yala_data[numeric_cols] = yala_data[numeric_cols].fillna(yala_data[numeric_cols].median())
+    paddy_data = paddy_data.dropna(subset=['Avg_Yield_Kg_Ha', 'Production_Mt', 'Year'])
+    paddy_data['Year'] = paddy_data['Year'].astype('int64')
+    paddy_data[PADDY_COLUMNS] = paddy_data[PADDY_COLUMNS].fillna(paddy_data[PADDY_COLUMNS].median())
 
     # Feature engineering
     # Sown to harvest ratio
-    yala_data['Sown_to_Harvest_Ratio'] = yala_data['Harvested_Ha'] / yala_data['Sown_Ha']
+    paddy_data['Sown_to_Harvest_Ratio'] = paddy_data['Harvested_Ha'] / paddy_data['Sown_Ha']
 
-    yala_data = yala_data.drop_duplicates()
+    paddy_data = paddy_data.drop_duplicates()
 
-    yala_data = yala_data.sort_values(['Year'])
+    paddy_data = paddy_data.sort_values(['Year'])
 
-    yala_data.to_csv(output_path, index=False)
+    write_table(paddy_data, output_path)
     print(f"Successfully created {output_path}")
-    return yala_data
+    return paddy_data
 
 def merge_seasonal_data(maha_path, yala_path, output_path):
-    maha_season_data = pd.read_csv(maha_path)
-    yala_season_data = pd.read_csv(yala_path)
+    maha_season_data = read_table(maha_path)
+    yala_season_data = read_table(yala_path)
 
     # concatenate
     combined_yield_data = pd.concat([maha_season_data, yala_season_data], ignore_index=True)
@@ -244,10 +309,10 @@ def merge_seasonal_data(maha_path, yala_path, output_path):
         combined_yield_data[col] = pd.to_numeric(combined_yield_data[col], errors='coerce')
 
     # sort by year and season
-    combined_yield_data['season'] = pd.Categorical(combined_yield_data['season'], categories=['Maha', 'Yala'], ordered=True)
+    combined_yield_data['season'] = combined_yield_data['season'].astype(SEASON_DTYPE)
     combined_yield_data = combined_yield_data.sort_values(['Year', 'season'])
 
-    combined_yield_data.to_csv(output_path, index=False)
+    write_table(combined_yield_data, output_path)
     print(f"Successfully created {output_path}")
     print(f"Maha rows: {len(maha_season_data)}, Yala rows: {len(yala_season_data)}, Combined rows: {len(combined_yield_data)}")
     return combined_yield_data
@@ -282,7 +347,7 @@ def preprocess_population_data(population_path, output_path):
 
     population_data = population_data.sort_values('Year')
 
-    population_data.to_csv(output_path, index=False)
+    write_table(population_data, output_path)
     print(f"Successfully created {output_path}")
     return population_data
 
@@ -311,81 +376,90 @@ def preprocess_inflation_data(inflation_path, output_path):
 
     inflation_data = inflation_data.sort_values('Year')
 
-    inflation_data.to_csv(output_path, index=False)
+    write_table(inflation_data, output_path)
     print(f"Successfully created {output_path}")
     return inflation_data
 
-def merge_all_data(price_data, rainfall_data, yield_data, population_data, inflation_data, output_path):
-    price_data = pd.read_csv(price_data)
-    rainfall_data = pd.read_csv(rainfall_data)
-    yield_data = pd.read_csv(yield_data)
-    population_data = pd.read_csv(population_data)
-    inflation_data = pd.read_csv(inflation_data)
+def merge_all_data(price_data, rainfall_data, yield_data, population_data, inflation_data, output_path, imputation='seasonal_median'):
+    price_data = read_table(price_data)
+    rainfall_data = read_table(rainfall_data)
+    yield_data = read_table(yield_data)
+    population_data = read_table(population_data)
+    inflation_data = read_table(inflation_data)
 
     # Merge datasets
     # Start with paddy data
-    merged_data = yield_data.copy()
-
-    # Merge with rice prices
+    # rice prices are not merged in (yet):
     # price_data = price_data.rename(columns={'year': 'Year'})
-    # merged_data = merged_data.merge(
-    #     price_data,
-    #     on=['Year', 'season'],
-    #     how='left'
-    # )
 
-    # Merge with rainfall data
-    rainfall_national = rainfall_data.groupby(['year', 'season']).agg({
-        'rfh': 'mean',
-        'rfh_avg': 'mean',
-        'r1h': 'mean',
-        'r1h_avg': 'mean',
-        'r3h': 'mean',
-        'r3h_avg': 'mean',
-        'rfq': 'mean'
-    }).reset_index().rename(columns={'year': 'Year'})
-
-    merged_data = merged_data.merge(
-        rainfall_national,
-        on=['Year', 'season'],
-        how='left'
-    )
-
-    # Merge with population
-    merged_data = merged_data.merge(
-        population_data,
-        on='Year',
-        how='left'
-    )
-
-    # Merge with inflation
-    merged_data = merged_data.merge(
-        inflation_data,
-        on='Year',  
-        how='left'
-    )
+    # Rainfall (district rows averaged to national), population and inflation are aligned
+    # to the paddy rows' (Year, season) in one join pass
+    rainfall_data = rainfall_data.rename(columns={'year': 'Year'})[['Year', 'season'] + RAINFALL_AGG_COLS]
+    merged_data = join_sources(yield_data, [
+        (rainfall_data, ['Year', 'season']),
+        (population_data, ['Year']),
+        (inflation_data, ['Year']),
+    ])
 
     # Handle missing values
-    merged_data['Missing_Rainfall'] = merged_data['Year'].apply(lambda x: 1 if x < 1980 else 0)
+    merged_data['Missing_Rainfall'] = (merged_data['Year'] < RAINFALL_START_YEAR).astype('int64')
 
-    # Impute missing rainfall data with seasonal medians
-    for season in ['Maha', 'Yala']:
-        season_mask = merged_data['season'] == season
-        for col in ['rfh', 'rfh_avg', 'r1h', 'r1h_avg', 'r3h', 'r3h_avg', 'rfq']:
-            median_value = merged_data[season_mask & (merged_data['Year'] >= 1980)][col].median()
-            merged_data.loc[season_mask & (merged_data['Year'] < 1980), col] = median_value
+    # Impute missing rainfall data with seasonal medians (or another strategy)
+    merged_data = impute(merged_data, RAINFALL_AGG_COLS, ['season'],
+                         train=merged_data['Year'] >= RAINFALL_START_YEAR,
+                         target=merged_data['Year'] < RAINFALL_START_YEAR,
+                         strategy=imputation)
 
     numeric_cols = ['Population', 'Population_Growth_Rate', 'Inflation', 'Sown_to_Harvest_Ratio', 'Sown_Ha', 'Harvested_Ha']
     merged_data[numeric_cols] = merged_data[numeric_cols].fillna(merged_data[numeric_cols].median())
 
     merged_data = merged_data.dropna(subset=['Avg_Yield_Kg_Ha'])
     
-    merged_data.to_csv(output_path, index=False)
+    write_table(merged_data, output_path)
     print(f"Successfully created {output_path}")
     print(f"Merged rows: {len(merged_data)}")
     return merged_data
 
 
+# Stage graph: dependencies follow from which stage produces which input file
+STAGES = [
+    # the two growing raw feeds are streamed in chunks so memory stays bounded,
+    # and only rows newer than the last run are folded into the saved running totals
+    Stage('prices', preprocess_price,
+          ["data/raw/prices.csv"],
+          [table_path("data/processed/seasonal_rice_prices.csv")],
+          {'chunksize': DEFAULT_CHUNKSIZE, 'incremental': True}),
+    Stage('rainfall', preprocess_rainfall,
+          ["data/raw/rainfall.csv"],
+          [table_path("data/processed/seasonal_rainfall.csv")],
+          {'chunksize': DEFAULT_CHUNKSIZE, 'incremental': True}),
+    Stage('paddy_maha', preprocess_paddy_season,
+          ["data/raw/Paddy_Maha_Season.xlsx"],
+          [table_path("data/processed/yeild_maha_season.csv")],
+          {'season': 'Maha'}),
+    Stage('paddy_yala', preprocess_paddy_season,
+          ["data/raw/Paddy_Yala_Season.xlsx"],
+          [table_path("data/processed/yeild_yala_season.csv")],
+          {'season': 'Yala'}),
+    Stage('seasonal_yield', merge_seasonal_data,
+          [table_path("data/processed/yeild_maha_season.csv"), table_path("data/processed/yeild_yala_season.csv")],
+          [table_path("data/processed/combined_yield_data.csv")]),
+    Stage('population', preprocess_population_data,
+          ["data/raw/Population.csv"],
+          [table_path("data/processed/population.csv")]),
+    Stage('inflation', preprocess_inflation_data,
+          ["data/raw/Inflation.csv"],
+          [table_path("data/processed/inflation.csv")]),
+    Stage('merge', merge_all_data,
+          [table_path("data/processed/seasonal_rice_prices.csv"),
+           table_path("data/processed/seasonal_rainfall.csv"),
+           table_path("data/processed/combined_yield_data.csv"),
+           table_path("data/processed/population.csv"),
+           table_path("data/processed/inflation.csv")],
+          [table_path("data/processed/merged_data.csv")]),
+]
+
+
 if __name__ == "__main__":
     # preprocess_data(
     #     "data/raw/weather_current.csv",
@@ -394,47 +468,27 @@ if __name__ == "__main__":
     #     "data/processed/merged_data.csv"
     # )
 
-    preprocess_price(
-        "data/raw/prices.csv",
-        "data/processed/seasonal_rice_prices.csv"
-    )
-
-    preprocess_rainfall(
-        "data/raw/rainfall.csv",
-        "data/processed/seasonal_rainfall.csv"
-    )
-
-    preprocess_paddy_maha_season(
-        "data/raw/Paddy_Maha_Season.xlsx",
-        "data/processed/yeild_maha_season.csv"
-    )
-
-    preprocess_paddy_yala_season(
-        "data/raw/Paddy_Yala_Season.xlsx",
-        "data/processed/yeild_yala_season.csv"
-    )
-
-    merge_seasonal_data(
-        "data/processed/yeild_maha_season.csv",
-        "data/processed/yeild_yala_season.csv",
-        "data/processed/combined_yield_data.csv"
-    )
-
-    preprocess_population_data(
-        "data/raw/population.csv",
-        "data/processed/population.csv"
-    )
-    
-    preprocess_inflation_data(
-        "data/raw/Inflation.csv",
-        "data/processed/inflation.csv"
-    )
-
-    merge_all_data(
-        "data/processed/seasonal_rice_prices.csv",
-        "data/processed/seasonal_rainfall.csv",
-        "data/processed/combined_yield_data.csv",
-        "data/processed/population.csv",
-        "data/processed/inflation.csv",
-        "data/processed/merged_data.csv"
-    )
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the preprocessing stages, skipping the ones whose inputs and code are unchanged")
+    parser.add_argument('--force', action='store_true', help="rerun every stage from scratch")
+    parser.add_argument('--workers', type=int, default=None, help="size of the process pool")
+    parser.add_argument('--export-csv', action='store_true', help="also write every table as CSV")
+    add_arguments(parser)
+    args = parser.parse_args()
+    # per-stage wall/CPU time, peak RSS and rows go to --metrics; workers inherit the settings
+    configure_from_args(args)
+
+    if args.export_csv:
+        # inherited by the worker processes
+        os.environ['CROP_EXPORT_CSV'] = '1'
+
+    if args.force:
+        # a full rerun also rebuilds the running totals instead of resuming from them
+        for stage in STAGES:
+            if stage.options.get('incremental'):
+                for path in stage.outputs:
+                    if os.path.exists(state_path(path)):
+                        os.remove(state_path(path))
+
+    summary = run_pipeline(STAGES, max_workers=args.workers, force=args.force)
+    if not args.export_csv and 'ran' in summary.values():
+        print("Note: the CSV snapshots in data/processed were not refreshed, rerun with --export-csv to update them")
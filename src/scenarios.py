@@ -0,0 +1,211 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from batch_predict import predict_matrix
+from feature_schema import SEASON_CODES, load_schema
+from model_registry import MODEL_PATH, load_model
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_BINS = 20
+
+# Planner levers: the app's inputs plus the macro ones. Any other feature keeps its training default.
+LEVERS = ['Year', 'season', 'Sown_Ha', 'Sown_to_Harvest_Ratio', 'rfh_avg', 'Inflation', 'Crisis_Indicator']
+
+
+# A lever spec is either a list of values (a grid axis, or the options of a Monte Carlo draw)
+# or a distribution: {'dist': 'uniform', 'low', 'high'}, {'dist': 'normal', 'mean', 'std'}
+# or {'dist': 'choice', 'values'}.
+def _is_distribution(spec):
+    return isinstance(spec, dict)
+
+
+def _options(spec):
+    if _is_distribution(spec):
+        return list(spec['values']) if spec['dist'] == 'choice' else None
+    return list(spec)
+
+
+def _check_levers(levers, sampled):
+    unknown = [name for name in levers if name not in LEVERS]
+    if unknown:
+        raise ValueError(f"Unknown levers {unknown}, expected some of {LEVERS}")
+    if 'season' not in levers:
+        # Season_Encoded has no training default to fall back on
+        raise ValueError("Scenarios need a 'season' lever, e.g. ['Maha'] or ['Maha', 'Yala']")
+    for name, spec in levers.items():
+        if _is_distribution(spec):
+            if not sampled:
+                raise ValueError(f"Lever '{name}' is a distribution, pass n_samples for a Monte Carlo sweep")
+            if spec['dist'] not in ('uniform', 'normal', 'choice'):
+                raise ValueError(f"Unknown distribution '{spec['dist']}' for lever '{name}'")
+        elif len(spec) == 0:
+            raise ValueError(f"Lever '{name}' has no values")
+
+
+def grid_design(levers, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Cartesian product, generated chunk by chunk from the flat scenario index; yields
+    # {lever: per-row values} and {lever: per-row position on that lever's axis}
+    names = list(levers)
+    axes = [np.asarray(levers[name]) for name in names]
+    shape = tuple(len(axis) for axis in axes)
+    n_total = int(np.prod(shape))
+    for start in range(0, n_total, chunk_rows):
+        positions = np.unravel_index(np.arange(start, min(start + chunk_rows, n_total)), shape)
+        yield ({name: axis[pos] for name, axis, pos in zip(names, axes, positions)},
+               dict(zip(names, positions)))
+
+
+def _bin_edges(spec, n_bins):
+    if spec['dist'] == 'uniform':
+        return np.linspace(spec['low'], spec['high'], n_bins + 1)
+    return np.linspace(spec['mean'] - 3 * spec['std'], spec['mean'] + 3 * spec['std'], n_bins + 1)
+
+
+def monte_carlo_design(levers, n_samples, chunk_rows=DEFAULT_CHUNK_ROWS, n_bins=DEFAULT_BINS, seed=42):
+    # independent draws per lever; continuous draws are also binned for the summaries
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_samples, chunk_rows):
+        n = min(chunk_rows, n_samples - start)
+        values, positions = {}, {}
+        for name, spec in levers.items():
+            options = _options(spec)
+            if options is not None:
+                positions[name] = rng.integers(0, len(options), n)
+                values[name] = np.asarray(options)[positions[name]]
+                continue
+            if spec['dist'] == 'uniform':
+                values[name] = rng.uniform(spec['low'], spec['high'], n)
+            else:
+                values[name] = rng.normal(spec['mean'], spec['std'], n)
+            edges = _bin_edges(spec, n_bins)
+            positions[name] = np.clip(np.searchsorted(edges, values[name], side='right') - 1, 0, n_bins - 1)
+        yield values, positions
+
+
+def _axis_labels(spec, n_bins):
+    options = _options(spec)
+    if options is not None:
+        return options
+    edges = _bin_edges(spec, n_bins)
+    return list((edges[:-1] + edges[1:]) / 2)
+
+
+def _to_columns(values):
+    columns = dict(values)
+    # season names -> codes once per chunk, instead of the per-value mapping in the schema
+    if 'season' in columns:
+        seasons = columns.pop('season')
+        unique, inverse = np.unique(seasons, return_inverse=True)
+        unknown = [s for s in unique if s not in SEASON_CODES]
+        if unknown:
+            raise ValueError(f"Unknown season values {unknown}, expected one of {list(SEASON_CODES)}")
+        columns['Season_Encoded'] = np.array([SEASON_CODES[s] for s in unique], dtype=np.float64)[inverse]
+    return columns
+
+
+class _Accumulator:
+    # running sum/sum of squares/count per cell, so summaries never need all predictions
+    def __init__(self, shape):
+        self.shape = shape
+        size = int(np.prod(shape))
+        self.sums, self.squares, self.counts = np.zeros(size), np.zeros(size), np.zeros(size)
+
+    def update(self, cells, predictions):
+        size = len(self.sums)
+        self.sums += np.bincount(cells, weights=predictions, minlength=size)
+        self.squares += np.bincount(cells, weights=predictions ** 2, minlength=size)
+        self.counts += np.bincount(cells, minlength=size)
+
+    def frame(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sums / self.counts
+            std = np.sqrt(np.maximum(self.squares / self.counts - mean ** 2, 0))
+        return mean, std
+
+
+def run_sweep(model, schema, levers, n_samples=None, pairs=(), chunk_rows=DEFAULT_CHUNK_ROWS, n_bins=DEFAULT_BINS, seed=42):
+    # Scores every scenario of a grid (n_samples=None) or n_samples Monte Carlo draws and
+    # returns partial-dependence style summaries: mean/std of the predicted yield per value
+    # (or bin) of each lever, and a mean-yield matrix for each lever pair in pairs
+    _check_levers(levers, sampled=n_samples is not None)
+    labels = {name: _axis_labels(spec, n_bins) if n_samples is not None else list(spec) for name, spec in levers.items()}
+    design = grid_design(levers, chunk_rows) if n_samples is None else monte_carlo_design(levers, n_samples, chunk_rows, n_bins, seed)
+
+    partial = {name: _Accumulator((len(labels[name]),)) for name in levers}
+    joint = {pair: _Accumulator((len(labels[pair[0]]), len(labels[pair[1]]))) for pair in pairs}
+    total = _Accumulator((1,))
+    n_scored = 0
+    start = time.perf_counter()
+    for values, positions in design:
+        X = schema.build_matrix(_to_columns(values), fill_defaults=True)
+        predictions = predict_matrix(model, X)
+        for name, acc in partial.items():
+            acc.update(positions[name], predictions)
+        for (a, b), acc in joint.items():
+            acc.update(positions[a] * acc.shape[1] + positions[b], predictions)
+        total.update(np.zeros(len(predictions), dtype=np.intp), predictions)
+        n_scored += len(predictions)
+    elapsed = time.perf_counter() - start
+
+    summaries = {}
+    for name, acc in partial.items():
+        mean, std = acc.frame()
+        summaries[name] = pd.DataFrame({name: labels[name], 'mean_yield': mean, 'std_yield': std, 'scenarios': acc.counts.astype(np.int64)})
+    heatmaps = {}
+    for (a, b), acc in joint.items():
+        mean, _ = acc.frame()
+        heatmaps[(a, b)] = pd.DataFrame(mean.reshape(acc.shape), index=pd.Index(labels[a], name=a), columns=pd.Index(labels[b], name=b))
+    mean, std = total.frame()
+    return {'n_scenarios': n_scored, 'mean_yield': float(mean[0]), 'std_yield': float(std[0]),
+            'partial_dependence': summaries, 'heatmaps': heatmaps, 'seconds': elapsed}
+
+
+def plot_heatmap(heatmap, path=None, ax=None):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig = None
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(10, 6))
+    fmt = lambda v: f"{v:.3g}" if isinstance(v, float) else str(v)
+    sns.heatmap(heatmap, ax=ax, cmap='YlGn', cbar_kws={'label': 'Mean predicted yield (Kg/Ha)'},
+                xticklabels=[fmt(v) for v in heatmap.columns], yticklabels=[fmt(v) for v in heatmap.index])
+    ax.set_title(f"Predicted yield by {heatmap.index.name} and {heatmap.columns.name}")
+    if path is not None:
+        fig.savefig(path, bbox_inches='tight')
+        plt.close(fig)
+    return ax
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep planner scenarios through the yield model")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--samples', type=int, default=1_000_000, help="Monte Carlo draws")
+    parser.add_argument('--season', default='Maha')
+    parser.add_argument('--year', type=int, default=2025)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--output-dir', default='results')
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    schema = load_schema(args.model, model)
+    defaults = {spec['name']: spec.get('default') for spec in schema.features}
+    levers = {
+        'Year': [args.year],
+        'season': [args.season],
+        'Sown_Ha': {'dist': 'uniform', 'low': 0.5 * defaults['Sown_Ha'], 'high': 1.5 * defaults['Sown_Ha']},
+        'Sown_to_Harvest_Ratio': {'dist': 'uniform', 'low': 0.8, 'high': 1.0},
+        'rfh_avg': {'dist': 'uniform', 'low': 0.5 * defaults['rfh_avg'], 'high': 1.5 * defaults['rfh_avg']},
+        'Inflation': {'dist': 'normal', 'mean': defaults['Inflation'], 'std': 5.0},
+        'Crisis_Indicator': [0, 1],
+    }
+    result = run_sweep(model, schema, levers, n_samples=args.samples, pairs=[('Sown_Ha', 'rfh_avg')], chunk_rows=args.chunk_rows)
+
+    print(f"Scored {result['n_scenarios']} scenarios in {result['seconds']:.2f}s")
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name in ['Sown_Ha', 'rfh_avg', 'Inflation', 'Crisis_Indicator']:
+        print(result['partial_dependence'][name].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    path = os.path.join(args.output_dir, 'scenario_heatmap.png')
+    plot_heatmap(result['heatmaps'][('Sown_Ha', 'rfh_avg')], path)
+    print(f"Successfully created {path}")
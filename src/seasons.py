@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+SEASONS = ['Maha', 'Yala']
+SEASON_DTYPE = pd.CategoricalDtype(SEASONS, ordered=True)
+
+# Lookup tables indexed by calendar month (index 0 unused).
+# Maha runs September-March, Yala April-August.
+MONTH_TO_SEASON = np.array([-1, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0], dtype=np.int8)
+# Maha 1951/52 is labelled 1951 in the paddy statistics, so its January-March
+# months belong to the agricultural year that started the calendar year before
+MONTH_YEAR_SHIFT = np.array([0, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0], dtype=np.int64)
+
+
+def season_codes(months):
+    return MONTH_TO_SEASON[np.asarray(months, dtype=np.int64)]
+
+
+def season_from_month(months):
+    return pd.Categorical.from_codes(season_codes(months), dtype=SEASON_DTYPE)
+
+
+def agricultural_year(years, months):
+    return np.asarray(years, dtype=np.int64) - MONTH_YEAR_SHIFT[np.asarray(months, dtype=np.int64)]
+
+
+def add_calendar_columns(df, date_col='date'):
+    # year/month/season for rows with a valid date, one table lookup per column
+    dates = df[date_col].dt
+    months = dates.month.to_numpy()
+    df['year'] = agricultural_year(dates.year.to_numpy(), months)
+    df['month'] = months
+    df['season'] = season_from_month(months)
+    return df
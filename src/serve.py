@@ -0,0 +1,221 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from batch_predict import predict_matrix
+from feature_schema import load_schema
+from feature_store import FeatureStore
+from forest_engine import load_forest_engine
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+
+class ServingStats:
+    def __init__(self, window=10_000):
+        self.window = window
+        self.latencies_ms = []
+        self.statuses = []
+        self.batch_sizes = []
+        self.n_requests = 0
+        self.status_counts = {}
+        self.lock = threading.Lock()
+
+    def record_request(self, latency_ms, status=200):
+        # every request counts, failed ones too, so slow errors show up in the latencies
+        with self.lock:
+            self.n_requests += 1
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.latencies_ms.append(latency_ms)
+            self.statuses.append(status)
+            if len(self.latencies_ms) > self.window:
+                del self.latencies_ms[:len(self.latencies_ms) - self.window]
+                del self.statuses[:len(self.statuses) - self.window]
+
+    def record_batch(self, n_rows):
+        with self.lock:
+            self.batch_sizes.append(n_rows)
+            if len(self.batch_sizes) > self.window:
+                del self.batch_sizes[:len(self.batch_sizes) - self.window]
+
+    def summary(self):
+        with self.lock:
+            latencies = np.asarray(self.latencies_ms, dtype=np.float64)
+            statuses = np.asarray(self.statuses, dtype=np.int64)
+            sizes = np.asarray(self.batch_sizes, dtype=np.int64)
+            n_requests = self.n_requests
+            status_counts = dict(self.status_counts)
+
+        histogram = {}
+        if len(sizes):
+            # bucket label is the upper bound: "<=8" counts batches of 5..8 rows
+            bucket_idx = np.searchsorted(BATCH_SIZE_BUCKETS, sizes)
+            for idx, count in zip(*np.unique(bucket_idx, return_counts=True)):
+                label = f"<={BATCH_SIZE_BUCKETS[idx]}" if idx < len(BATCH_SIZE_BUCKETS) else f">{BATCH_SIZE_BUCKETS[-1]}"
+                histogram[label] = int(count)
+
+        by_status = {}
+        for status in np.unique(statuses):
+            status_latencies = latencies[statuses == status]
+            by_status[str(status)] = {
+                'requests': status_counts[int(status)],
+                'latency_ms_p50': float(np.percentile(status_latencies, 50)),
+                'latency_ms_p99': float(np.percentile(status_latencies, 99)),
+            }
+
+        return {
+            'requests': n_requests,
+            'requests_by_status': by_status,
+            'batches': int(len(sizes)),
+            'latency_ms_p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_ms_p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'mean_batch_size': float(sizes.mean()) if len(sizes) else None,
+            'batch_size_histogram': histogram,
+        }
+
+
+class MicroBatcher:
+    def __init__(self, model, max_wait_ms=5.0, max_batch_rows=1024, stats=None):
+        self.model = model
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self.stats = stats or ServingStats()
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, X):
+        future = Future()
+        self.requests.put((X, future))
+        return future
+
+    def _collect(self):
+        pending = [self.requests.get()]
+        n_rows = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        # keep accepting requests until the window closes or the batch is full
+        while n_rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n_rows += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            try:
+                # one predict call for the whole micro-batch
+                predictions = predict_matrix(self.model, np.concatenate([X for X, _ in pending]))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.stats.record_batch(len(predictions))
+            start = 0
+            for X, future in pending:
+                future.set_result(predictions[start:start + len(X)])
+                start += len(X)
+
+
+def make_handler(batcher, schema, timeout=30.0, store=None):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send_json(200, batcher.stats.summary())
+            elif self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+                return
+
+            start = time.perf_counter()
+            status, payload = self._predict()
+            batcher.stats.record_request((time.perf_counter() - start) * 1000.0, status)
+            self._send_json(status, payload)
+
+        def _predict(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                # accept {"rows": [...]}, a list of rows or a single row object
+                rows = payload.get('rows', [payload]) if isinstance(payload, dict) else payload
+                if not rows:
+                    raise ValueError("No input rows")
+                keys = set(rows[0])
+                for i, row in enumerate(rows):
+                    # a key left out of one row would otherwise become a NaN in a column the
+                    # other rows fill, and quietly route that row down the trees' missing branch
+                    if set(row) != keys:
+                        raise ValueError(f"Row {i} has keys {sorted(row)}, but row 0 has {sorted(keys)}; "
+                                         "every row in a request must give the same fields")
+                columns = {key: [row[key] for row in rows] for key in keys}
+                if store is not None and 'Year' in columns and 'season' in columns:
+                    # lags and macro features the client left out come from the feature store
+                    columns = store.fill(columns)
+                # validate here so one bad request can't fail the whole micro-batch
+                X = schema.build_matrix(columns, fill_defaults=False)
+                predictions = batcher.submit(X).result(timeout=timeout)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                return 400, {'error': str(e)}
+            except Exception as e:
+                return 500, {'error': str(e)}
+            return 200, {'predictions': predictions.tolist()}
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictionHandler
+
+
+class PredictionServer(ThreadingHTTPServer):
+    # dashboards open many connections at once; the socketserver default backlog of 5 resets them
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def create_server(model, schema, host='127.0.0.1', port=8000, max_wait_ms=5.0, max_batch_rows=1024, store=None):
+    batcher = MicroBatcher(model, max_wait_ms=max_wait_ms, max_batch_rows=max_batch_rows)
+    server = PredictionServer((host, port), make_handler(batcher, schema, store=store))
+    return server, batcher
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON prediction service for the yield model")
+    parser.add_argument('--model', default='models/random_forest_model.pkl')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch-rows', type=int, default=1024)
+    parser.add_argument('--feature-store', default=None, help="fill missing lag/macro features from this store (see feature_store.py)")
+    args = parser.parse_args()
+
+    model = load_forest_engine(args.model)
+    store = FeatureStore.load(args.feature_store) if args.feature_store else None
+    server, _ = create_server(model, load_schema(args.model, model), args.host, args.port, args.max_wait_ms, args.max_batch_rows, store)
+    print(f"Serving predictions on http://{args.host}:{args.port}/predict (metrics at /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+from batch_predict import predict_matrix
+from feature_schema import FeatureSchema, build_schema, schema_path
+from forest_engine import DEFAULT_QUANTILES, load_forest_engine
+from storage import read_table, table_path
+
+SHARD_DIR = 'models/shards'
+MANIFEST_PATH = os.path.join(SHARD_DIR, 'manifest.json')
+DISTRICT_RAINFALL_COLS = ['rfh', 'rfh_avg', 'r1h', 'r1h_avg', 'r3h', 'r3h_avg', 'rfq']
+# smaller forests than the global model: a shard only sees one season (of one district)
+SHARD_PARAMS = {'n_estimators': 100, 'max_depth': 10, 'max_features': 'sqrt', 'random_state': 42}
+
+
+def district_keys(values):
+    # adm_id comes back as int from CSV and as text from the streamed rainfall stage
+    keys = pd.Series(values).astype(str).str.replace(r'\.0$', '', regex=True)
+    return keys.where(pd.Series(values).notna().to_numpy(), None).to_numpy(dtype=object)
+
+
+def shard_key(season, district=None):
+    return str(season) if district is None else f"{season}-{district}"
+
+
+def district_training_table(features_df, rainfall_df):
+    # The yield statistics are national, so a district row is the national season row
+    # with that district's rainfall in place of the national mean
+    rainfall = rainfall_df.rename(columns={'year': 'Year'})
+    rainfall = rainfall.assign(adm_id=district_keys(rainfall['adm_id']), season=rainfall['season'].astype(str))
+    national = features_df.drop(columns=DISTRICT_RAINFALL_COLS).assign(season=features_df['season'].astype(str))
+    df = national.merge(rainfall[['Year', 'season', 'adm_id'] + DISTRICT_RAINFALL_COLS], on=['Year', 'season'], how='inner')
+
+    df = df.sort_values(['adm_id', 'season', 'Year']).reset_index(drop=True)
+    prev = df.groupby(['adm_id', 'season'])['rfh_avg'].shift(1)
+    df['Prev_Rainfall'] = prev.fillna(df['Prev_Rainfall'])
+    return df
+
+
+def _fit_shard(key, X, y, path, params):
+    # runs in a worker process; only the path goes back, not the forest
+    model = RandomForestRegressor(n_jobs=1, **params).fit(X, y)
+    joblib.dump(model, path)
+    return key, path
+
+
+def _shard_groups(df, by_district):
+    seasons = df['season'].astype(str).to_numpy()
+    if not by_district:
+        return {(season, None): np.flatnonzero(seasons == season) for season in np.unique(seasons)}
+    districts = district_keys(df['adm_id'])
+    return {(season, district): np.flatnonzero((seasons == season) & (districts == district))
+            for season, district in sorted(set(zip(seasons, districts)))}
+
+
+def train_shards(national_df, schema, district_df=None, output_dir=SHARD_DIR, params=SHARD_PARAMS, max_workers=None):
+    # One forest per season, plus one per (season, district) when district rows are given.
+    # The season shards are the fallback for districts the router has no shard for.
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for df, by_district in [(national_df, False), (district_df, True)]:
+        if df is None:
+            continue
+        X = schema.build_matrix(df, fill_defaults=False)
+        y = df[schema.target].to_numpy(dtype=np.float64)
+        for (season, district), rows in _shard_groups(df, by_district).items():
+            jobs.append((season, district, X[rows], y[rows]))
+
+    manifest = {'schema': os.path.basename(schema_path(os.path.join(output_dir, 'manifest.json'))), 'shards': {}}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        for season, district, X, y in jobs:
+            key = shard_key(season, district)
+            path = os.path.join(output_dir, f"{key}.pkl")
+            futures.append(pool.submit(_fit_shard, key, X, y, path, params))
+            manifest['shards'][key] = {'season': season, 'adm_id': district, 'path': os.path.basename(path), 'rows': int(len(y))}
+        for future in futures:
+            future.result()
+
+    schema.save(schema_path(os.path.join(output_dir, 'manifest.json')))
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Successfully created {len(jobs)} shards in {output_dir}")
+    return manifest
+
+
+class ShardRouter:
+    # Sends every row to the forest of its (season, district), falling back to the season
+    # shard, and scores each shard's rows in one batched call. Shards load on first use.
+    def __init__(self, manifest_path=MANIFEST_PATH, mmap_mode=None):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.base_dir = os.path.dirname(manifest_path)
+        self.shards = manifest['shards']
+        self.schema = FeatureSchema.load(os.path.join(self.base_dir, manifest['schema']))
+        self.mmap_mode = mmap_mode
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, key):
+        with self._lock:
+            if key not in self._models:
+                path = os.path.join(self.base_dir, self.shards[key]['path'])
+                self._models[key] = load_forest_engine(path, mmap_mode=self.mmap_mode)
+            return self._models[key]
+
+    def route(self, data):
+        seasons = np.atleast_1d(np.asarray(data['season'])).astype(str)
+        if 'adm_id' in data:
+            districts = district_keys(data['adm_id'])
+        else:
+            districts = np.full(len(seasons), None, dtype=object)
+        keys = np.array([shard_key(s, d) if d is not None else s for s, d in zip(seasons, districts)], dtype=object)
+
+        # districts without a shard of their own use the season model
+        missing = ~np.isin(keys, list(self.shards))
+        keys[missing] = seasons[missing]
+        unknown = sorted(set(keys[~np.isin(keys, list(self.shards))]))
+        if unknown:
+            raise ValueError(f"No shard for {unknown}, expected one of {sorted(self.shards)}")
+        return keys
+
+    def _shard_rows(self, data):
+        keys = self.route(data)
+        shard_names, inverse = np.unique(keys, return_inverse=True)
+        for i, key in enumerate(shard_names):
+            yield key, np.flatnonzero(inverse == i)
+
+    def predict_frame(self, data, fill_defaults=False):
+        X = self.schema.build_matrix(data, fill_defaults=fill_defaults)
+        predictions = np.empty(X.shape[0], dtype=np.float64)
+        for key, rows in self._shard_rows(data):
+            predictions[rows] = predict_matrix(self.model(key), X[rows])
+        return predictions
+
+    def predict_distribution_frame(self, data, quantiles=DEFAULT_QUANTILES, fill_defaults=False):
+        X = self.schema.build_matrix(data, fill_defaults=fill_defaults)
+        out = {}
+        for key, rows in self._shard_rows(data):
+            for name, values in self.model(key).predict_distribution(X[rows], quantiles).items():
+                out.setdefault(name, np.empty(X.shape[0], dtype=np.float64))[rows] = values
+        return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-season and per-(season, district) yield models")
+    parser.add_argument('--by', choices=['season', 'district'], default='district')
+    parser.add_argument('--workers', type=int, default=None, help="size of the process pool")
+    parser.add_argument('--output-dir', default=SHARD_DIR)
+    args = parser.parse_args()
+
+    df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
+    district_df = None
+    if args.by == 'district':
+        district_df = district_training_table(df, read_table(table_path('data/processed/seasonal_rainfall.csv')))
+
+    schema = build_schema(df[df['Year'] <= 2018])
+    train_shards(df[df['Year'] <= 2018], schema,
+                 None if district_df is None else district_df[district_df['Year'] <= 2018],
+                 output_dir=args.output_dir, max_workers=args.workers)
+
+    # district rows when there are any, so the scores cover the district shards
+    test_df = df if district_df is None else district_df
+    test_df = test_df[test_df['Year'] > 2018]
+
+    router = ShardRouter(os.path.join(args.output_dir, 'manifest.json'))
+    y_pred = router.predict_frame(test_df)
+    for season in ['Maha', 'Yala']:
+        mask = (test_df['season'].astype(str) == season).to_numpy()
+        rmse = mean_squared_error(test_df[schema.target][mask], y_pred[mask]) ** 0.5
+        print(f"{season} RMSE: {rmse:.2f} Kg/Ha")
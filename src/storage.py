@@ -0,0 +1,109 @@
+import hashlib
+import os
+import pandas as pd
+
+# Intermediate tables are written in a typed columnar format so the next stage gets back the
+# exact dtypes (Int64 years, categorical seasons, float64 bits) without re-parsing text.
+# CROP_STORAGE_FORMAT picks the format, CROP_EXPORT_CSV=1 also writes the .csv next to it.
+STORAGE_FORMAT = os.environ.get('CROP_STORAGE_FORMAT', 'feather')
+
+EXTENSIONS = {'feather': '.feather', 'parquet': '.parquet', 'csv': '.csv'}
+
+
+def file_digest(path, block_size=1 << 20):
+    # sha256 of a file, read in blocks; shared by the pipeline fingerprints, the parser
+    # caches and the model registry
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def table_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, fmt_ext in EXTENSIONS.items():
+        if ext == fmt_ext:
+            return fmt
+    raise ValueError(f"Unknown table format for '{path}', expected one of {list(EXTENSIONS.values())}")
+
+
+def table_path(path, fmt=None):
+    fmt = fmt or STORAGE_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown storage format '{fmt}', expected one of {list(EXTENSIONS)}")
+    return os.path.splitext(path)[0] + EXTENSIONS[fmt]
+
+
+def csv_path(path):
+    return table_path(path, 'csv')
+
+
+def resolve_table(path):
+    # Columnar files aren't committed, so a fresh checkout falls back to the CSV snapshot.
+    # A columnar file older than its CSV is stale (e.g. the CSV was just pulled) and the
+    # CSV wins; write_table writes the CSV first so its own pair resolves to the columnar file.
+    fallback = csv_path(path)
+    if os.path.exists(path):
+        if fallback == path or not os.path.exists(fallback):
+            return path
+        return path if os.stat(path).st_mtime_ns >= os.stat(fallback).st_mtime_ns else fallback
+    if os.path.exists(fallback):
+        return fallback
+    return None
+
+
+def write_table(df, path, export_csv=None):
+    if export_csv is None:
+        # read at call time so pipeline worker processes see the parent's setting
+        export_csv = os.environ.get('CROP_EXPORT_CSV', '0') == '1'
+    fmt = table_format(path)
+    if export_csv and fmt != 'csv':
+        df.to_csv(csv_path(path), index=False)
+
+    if fmt == 'feather':
+        # uncompressed and one record batch, so reads can memory-map every column as one buffer
+        df.reset_index(drop=True).to_feather(path, compression='uncompressed', chunksize=max(len(df), 1))
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def table_rows(path, block_size=1 << 20):
+    # Row count without loading the table: Feather/Parquet from their metadata, CSV by
+    # counting lines in binary blocks (minus the header). None for other files.
+    fmt = os.path.splitext(path)[1].lower()
+    if fmt == '.feather':
+        import pyarrow.feather as feather
+        # memory-mapped, so no column data is read
+        return feather.read_table(path, memory_map=True).num_rows
+    if fmt == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt != '.csv':
+        return None
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    # a last line without a trailing newline still counts
+    lines += last != b'\n'
+    return max(lines - 1, 0)
+
+
+def read_table(path, columns=None):
+    resolved = resolve_table(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No table at '{path}' (or '{csv_path(path)}')")
+
+    fmt = table_format(resolved)
+    if fmt == 'feather':
+        import pyarrow.feather as feather
+        # memory-mapped; with split_blocks the single-chunk numeric columns without nulls stay
+        # read-only views of the mapped file instead of being copied into consolidated blocks
+        return feather.read_table(resolved, columns=columns, memory_map=True).to_pandas(split_blocks=True)
+    if fmt == 'parquet':
+        return pd.read_parquet(resolved, columns=columns, memory_map=True)
+    return pd.read_csv(resolved, usecols=columns)
@@ -0,0 +1,154 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+class GroupedMean:
+    # Running per-group sum/count/size, so a mean can be built chunk by chunk and
+    # the raw rows of a chunk can be dropped as soon as it has been folded in
+    def __init__(self, keys, columns):
+        self.keys = keys
+        self.columns = columns
+        self.totals = None
+
+    def update(self, df):
+        if df.empty:
+            return
+        # plain key values, so totals loaded from a saved state line up with new chunks
+        keys = [df[key].astype(object) if isinstance(df[key].dtype, pd.CategoricalDtype) else df[key] for key in self.keys]
+        grouped = df.groupby(keys, sort=False)
+        part = pd.concat({
+            'sum': grouped[self.columns].sum(),
+            'count': grouped[self.columns].count(),
+            'size': grouped.size().to_frame('rows'),
+        }, axis=1)
+        self.totals = part if self.totals is None else self.totals.add(part, fill_value=0)
+
+    def save(self, path, watermark=None):
+        # JSON keeps every float64 sum exactly (repr round-trips) and is small: one row per group
+        payload = {'keys': self.keys, 'columns': self.columns, 'watermark': watermark, 'totals': None}
+        if self.totals is not None:
+            totals = self.totals.copy()
+            totals.columns = [f"{kind}:{col}" for kind, col in totals.columns]
+            totals = totals.reset_index()
+            payload['totals'] = {
+                'columns': list(totals.columns),
+                'data': [[v.item() if hasattr(v, 'item') else v for v in row] for row in totals.itertuples(index=False)],
+            }
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            payload = json.load(f)
+        agg = cls(payload['keys'], payload['columns'])
+        if payload['totals'] is not None:
+            totals = pd.DataFrame(payload['totals']['data'], columns=payload['totals']['columns']).set_index(agg.keys)
+            totals.columns = pd.MultiIndex.from_tuples([tuple(col.split(':', 1)) for col in totals.columns])
+            agg.totals = totals
+        return agg, payload['watermark']
+
+    def missing_counts(self):
+        if self.totals is None:
+            return pd.Series(0, index=self.columns)
+        return (self.totals['size']['rows'].to_numpy()[:, None] - self.totals['count']).sum()
+
+    def result(self, fill_values=None):
+        if self.totals is None:
+            return pd.DataFrame(columns=self.keys + self.columns)
+        sums, counts = self.totals['sum'], self.totals['count']
+        if fill_values is None:
+            means = sums / counts
+        else:
+            # same as filling the missing values before taking the mean
+            sizes = self.totals['size']['rows']
+            means = pd.DataFrame({
+                col: (sums[col] + (sizes - counts[col]) * fill_values[col]) / sizes
+                if col in fill_values else sums[col] / counts[col]
+                for col in self.columns
+            })
+        return means.reset_index()
+
+
+class SeenHashes:
+    # Row hashes kept as one sorted uint64 array (8 bytes a row, no Python objects), so
+    # drop_duplicates can run across chunks: membership is a searchsorted per chunk and
+    # new hashes are merged in with one sort
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, hashes):
+        # marks the rows not seen before (in earlier chunks or earlier in this one) and remembers them
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        first = ~pd.Series(hashes).duplicated().to_numpy()
+        if len(self.hashes):
+            pos = np.searchsorted(self.hashes, hashes)
+            known = self.hashes[np.minimum(pos, len(self.hashes) - 1)] == hashes
+            first &= ~known
+        self.hashes = np.union1d(self.hashes, hashes[first])
+        return first
+
+
+def state_path(output_path):
+    return os.path.splitext(output_path)[0] + '.state.json'
+
+
+def _bin_index(values, lo, hi, n_bins):
+    scaled = (values - lo) / (hi - lo) * n_bins
+    return np.clip(scaled.astype(np.int64), 0, n_bins - 1)
+
+
+def _streaming_select(read_values, rank, n_bins, max_collect):
+    # k-th smallest value with bounded memory: each round histograms the candidates and keeps
+    # only the bin holding the rank, until few enough are left to collect and sort
+    levels = []
+
+    def candidates():
+        for values in read_values():
+            for lo, hi, b in levels:
+                values = values[_bin_index(values, lo, hi, n_bins) == b] if len(values) else values
+            yield values
+
+    while True:
+        n, lo, hi = 0, np.inf, -np.inf
+        for values in candidates():
+            if len(values):
+                n += len(values)
+                lo, hi = min(lo, values.min()), max(hi, values.max())
+        if lo == hi:
+            return lo
+        if n <= max_collect:
+            return np.sort(np.concatenate(list(candidates())))[rank]
+
+        counts = np.zeros(n_bins, dtype=np.int64)
+        for values in candidates():
+            counts += np.bincount(_bin_index(values, lo, hi, n_bins), minlength=n_bins)
+        cum = np.cumsum(counts)
+        b = int(np.searchsorted(cum, rank, side='right'))
+        rank -= int(cum[b - 1]) if b > 0 else 0
+        # values outside [lo, hi] were already dropped by the earlier levels
+        levels.append((lo, hi, b))
+
+
+def streaming_median(read_values, n_bins=4096, max_collect=1_000_000):
+    # read_values() must return a fresh iterator of 1-d float arrays on every call
+    n = 0
+    for values in read_values():
+        n += int((~np.isnan(values)).sum())
+    if n == 0:
+        return np.nan
+
+    def non_null():
+        for values in read_values():
+            yield values[~np.isnan(values)]
+
+    lower = _streaming_select(non_null, (n - 1) // 2, n_bins, max_collect)
+    upper = lower if n % 2 else _streaming_select(non_null, n // 2, n_bins, max_collect)
+    return (lower + upper) / 2
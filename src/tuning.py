@@ -0,0 +1,119 @@
+import hashlib
+import itertools
+import json
+import math
+import os
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+
+CACHE_PATH = 'models/.tuning_cache.json'
+
+
+def data_hash(X, y, splits):
+    # the folds are part of the data: a different split scores different cells
+    digest = hashlib.sha256()
+    digest.update(sklearn.__version__.encode('utf-8'))
+    for array in [X, y] + [idx for split in splits for idx in split]:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class ScoreCache:
+    # Fold scores keyed by (data hash, params, fold), kept in a JSON file so re-runs and
+    # widened grids only fit the cells that were never scored before
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.scores = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.scores = json.load(f)
+
+    @staticmethod
+    def key(data_key, params, fold):
+        return f"{data_key}|{json.dumps(params, sort_keys=True)}|{fold}"
+
+    def get(self, data_key, params, fold):
+        return self.scores.get(self.key(data_key, params, fold))
+
+    def put(self, data_key, params, fold, score):
+        self.scores[self.key(data_key, params, fold)] = score
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.scores, f)
+
+
+def _candidates(param_grid):
+    names = sorted(name for name in param_grid if name != 'n_estimators')
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def tune_forest(X, y, param_grid, cv, mode='halving', eta=3, cache_path=CACHE_PATH, random_state=42, n_jobs=-1):
+    # Searches param_grid like GridSearchCV(scoring='neg_mean_squared_error') and returns
+    # (best_params, results). n_estimators is the budget: every candidate is scored with the
+    # fewest trees first and, in 'halving' mode, only the best 1/eta go on to the next size.
+    # Forests are warm-started, so growing 100 -> 150 trees only fits 50 new ones; with a fixed
+    # random_state that gives the same trees as fitting 150 from scratch.
+    if mode not in ('halving', 'grid'):
+        raise ValueError(f"Unknown search mode '{mode}', expected 'halving' or 'grid'")
+
+    X, y = np.asarray(X), np.asarray(y)
+    splits = list(cv.split(X, y))
+    data_key = data_hash(X, y, splits)
+    cache = ScoreCache(cache_path)
+    rungs = sorted(param_grid['n_estimators'])
+
+    candidates = _candidates(param_grid)
+    alive = list(range(len(candidates)))
+    forests = {}  # (candidate index, fold) -> forest grown at the previous rung
+    results = []
+    n_fitted = 0
+
+    for rung, n_estimators in enumerate(rungs):
+        scores = {}
+        for i in alive:
+            params = dict(candidates[i], n_estimators=n_estimators)
+            fold_scores = []
+            for fold, (train_idx, test_idx) in enumerate(splits):
+                score = cache.get(data_key, dict(params, random_state=random_state), fold)
+                if score is None:
+                    forest = forests.get((i, fold))
+                    if forest is None:
+                        forest = RandomForestRegressor(random_state=random_state, n_jobs=n_jobs, warm_start=True, **candidates[i])
+                    forest.set_params(n_estimators=n_estimators)
+                    forest.fit(X[train_idx], y[train_idx])
+                    forests[(i, fold)] = forest
+                    n_fitted += 1
+                    score = -mean_squared_error(y[test_idx], forest.predict(X[test_idx]))
+                    cache.put(data_key, dict(params, random_state=random_state), fold, score)
+                else:
+                    # a cached cell has no forest to grow, the next rung fits it from scratch
+                    forests.pop((i, fold), None)
+                fold_scores.append(score)
+
+            scores[i] = float(np.mean(fold_scores))
+            results.append(dict(params, rung=rung, mean_test_score=scores[i], std_test_score=float(np.std(fold_scores))))
+
+        # save per rung so an interrupted search keeps what it has scored
+        cache.save()
+
+        if mode == 'halving' and rung < len(rungs) - 1:
+            alive = sorted(alive, key=lambda i: -scores[i])[:max(1, math.ceil(len(alive) / eta))]
+        for i, fold in list(forests):
+            if i not in alive:
+                del forests[(i, fold)]
+        print(f"n_estimators={n_estimators}: scored {len(scores)} candidates, {len(alive)} kept")
+
+    # halving only trusts the full-budget rung, the grid compares every cell like GridSearchCV
+    final = [r for r in results if mode == 'grid' or r['rung'] == len(rungs) - 1]
+    best = max(final, key=lambda r: r['mean_test_score'])
+    best_params = {name: best[name] for name in param_grid}
+    print(f"Fitted {n_fitted} of {len(results) * len(splits)} cells, the rest came from the cache")
+    return best_params, results
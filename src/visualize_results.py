@@ -1,44 +1,36 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
+import argparse
+from backtesting import (HOLDOUT_CUTOFF, HOLDOUT_PATH, RESULTS_PATH, holdout, plot_actual_vs_predicted,
+                         plot_error_distribution)
+from batch_predict import predict_batch
+from feature_schema import load_schema
+from model_registry import MODEL_PATH, load_model
+from storage import file_digest, read_table, resolve_table, table_path
 
-df = pd.read_csv('data/processed/feature_engineered_dataset.csv')
+parser = argparse.ArgumentParser(description="Plot test-set predictions from the saved prediction tables")
+parser.add_argument('--backtest-cutoff', type=int, default=None,
+                    help="plot this fold of the walk-forward backtest instead of the deployed model")
+args = parser.parse_args()
 
-df['Season_Encoded'] = df['season'].map({'Maha': 1, 'Yala': 0})
-if 'Season_Encoded' not in df.columns:
-    raise ValueError("Season_Encoded column not created. Check 'Season' column values.")
-
-test_df = df[df['Year'] > 2018].copy()
-
-model = joblib.load('models/random_forest_model.pkl')
-features = [
-    'Sown_Ha', 'Sown_to_Harvest_Ratio', 'rfh_avg', 'r1h_avg', 'r3h_avg', 'rfq', 'Inflation',
-     'Prev_Rainfall', 'Season_Encoded', 'Crisis_Indicator',
-]
-test_df['Predicted_Yield'] = model.predict(test_df[features])
+if args.backtest_cutoff is None:
+    # The deployed model's test-set predictions, saved by modeling.py. The table isn't
+    # committed, so on a fresh clone (or after the model changed) the committed model
+    # scores the test seasons again in one batched predict.
+    test_df = read_table(HOLDOUT_PATH) if resolve_table(HOLDOUT_PATH) is not None else None
+    if test_df is None or (test_df['model_sha256'] != file_digest(MODEL_PATH)).any():
+        print(f"{HOLDOUT_PATH} missing or written for a different model, predicting with {MODEL_PATH}")
+        model = load_model(MODEL_PATH)
+        schema = load_schema(MODEL_PATH, model)
+        df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
+        test_df = df[df['Year'] > HOLDOUT_CUTOFF].copy()
+        test_df['Predicted_Yield'] = predict_batch(model, test_df, schema)
+    title = 'Actual vs. Predicted Rice Yield (Test Set)'
+else:
+    if resolve_table(RESULTS_PATH) is None:
+        raise SystemExit(f"{RESULTS_PATH} not found, run python src/backtesting.py first")
+    test_df = holdout(read_table(RESULTS_PATH), args.backtest_cutoff)
+    title = f'Actual vs. Predicted Rice Yield (Backtest Refit at {args.backtest_cutoff})'
 
 # Plot actual vs. predicted yields
-plt.figure(figsize=(10, 6))
-for season in ['Maha', 'Yala']:
-    season_data = test_df[test_df['season'] == season]
-    plt.plot(season_data['Year'], season_data['Avg_Yield_Kg_Ha'], label=f'{season} Actual', marker='o')
-    plt.plot(season_data['Year'], season_data['Predicted_Yield'], label=f'{season} Predicted', marker='x', linestyle='--')
-plt.title('Actual vs. Predicted Rice Yield (Test Set)')
-plt.xlabel('Year')
-plt.ylabel('Average Yield (Kg/Ha)')
-plt.legend()
-plt.savefig('results/actual_vs_predicted.png')
-plt.close()
+plot_actual_vs_predicted(test_df, 'results/actual_vs_predicted.png', title=title)
 
-plt.figure(figsize=(10, 6))
-for season in ['Maha', 'Yala']:
-    season_data = test_df[test_df['season'] == season]
-    errors = season_data['Avg_Yield_Kg_Ha'] - season_data['Predicted_Yield']
-    sns.kdeplot(errors, label=season, fill=True)
-plt.title('Prediction Error Distribution by Season')
-plt.xlabel('Error (Kg/Ha)')
-plt.ylabel('Density')
-plt.legend()
-plt.savefig('results/prediction_errors.png')
-plt.close()
\ No newline at end of file
+plot_error_distribution(test_df, 'results/prediction_errors.png')
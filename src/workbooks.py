@@ -0,0 +1,82 @@
+import hashlib
+import importlib.util
+import os
+import re
+import pandas as pd
+from storage import file_digest
+
+CACHE_DIR = 'data/raw/.workbook_cache'
+# bump when the parsing below changes, so cached sheets from an older parser are ignored
+PARSER_VERSION = 1
+
+PADDY_COLUMNS = ['Sown_Acres', 'Sown_Ha', 'Harvested_Acres', 'Harvested_Ha', 'Avg_Yield_Bushels_Acre',
+                 'Avg_Yield_Kg_Ha', 'Production_Bushels', 'Production_Mt']
+
+
+# A layout describes one kind of sheet: the header rows to skip, the unit rows under the
+# header, and the names given to the non-empty columns. Key columns are parsed as years
+# ('Year') or kept as text; every other column is numeric.
+def season_layout(season):
+    return {'sheet_name': f'{season} Season', 'skiprows': 3, 'unit_rows': 1,
+            'columns': ['Year'] + PADDY_COLUMNS, 'text_columns': []}
+
+
+def excel_engine():
+    # calamine (Rust) reads xlsx many times faster than openpyxl; openpyxl is the fallback
+    if importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return 'openpyxl'
+
+
+def parse_years(labels):
+    # '1951/52' (Maha, labelled by the year it starts in), 1952.0 or '1952' -> 1952
+    years = pd.Series(labels, dtype=object).astype(str).str.extract(r'^\s*(\d{4})', expand=False)
+    return pd.to_numeric(years, errors='coerce').astype('Int64')
+
+
+def _cache_path(cache_dir, digest, layout):
+    sheet = re.sub(r'\W+', '_', layout['sheet_name']).strip('_').lower()
+    return os.path.join(cache_dir, f"{digest}-{sheet}.feather")
+
+
+def _layout_digest(path, layout):
+    # the workbook's content plus how it is parsed
+    key = f"{file_digest(path)}:{PARSER_VERSION}:{sorted(layout.items())}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def parse_sheet(path, layout, engine=None):
+    raw = pd.read_excel(path, sheet_name=layout['sheet_name'], skiprows=layout['skiprows'],
+                        header=0, dtype=object, engine=engine or excel_engine())
+    # drop empty columns (column A) and the unit rows under the header
+    raw = raw.dropna(axis=1, how='all').iloc[layout['unit_rows']:].reset_index(drop=True)
+    if raw.shape[1] != len(layout['columns']):
+        raise ValueError(f"Sheet '{layout['sheet_name']}' of {path} has {raw.shape[1]} columns, "
+                         f"expected {len(layout['columns'])}: {layout['columns']}")
+    raw.columns = layout['columns']
+
+    sheet = pd.DataFrame(index=raw.index)
+    for col in layout['columns']:
+        if col == 'Year':
+            sheet[col] = parse_years(raw[col])
+        elif col in layout['text_columns']:
+            sheet[col] = raw[col].astype('string').str.strip()
+        else:
+            sheet[col] = pd.to_numeric(raw[col], errors='coerce')
+    return sheet
+
+
+def read_sheet(path, layout, cache_dir=CACHE_DIR, engine=None):
+    # Parsed sheets are cached as typed Feather files keyed by the workbook's hash, so an
+    # unchanged workbook is never parsed again
+    if cache_dir is None:
+        return parse_sheet(path, layout, engine)
+    cache_path = _cache_path(cache_dir, _layout_digest(path, layout), layout)
+    if os.path.exists(cache_path):
+        return pd.read_feather(cache_path)
+    sheet = parse_sheet(path, layout, engine)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    sheet.to_feather(tmp, compression='uncompressed')
+    os.replace(tmp, cache_path)
+    return sheet
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from backtesting import error_curves, holdout, run_backtest
+from feature_schema import build_schema
+from storage import read_table
+
+PARAMS = {'n_estimators': 10, 'max_depth': 6, 'max_features': 'sqrt', 'min_samples_leaf': 1}
+
+
+def test_folds_match_a_serial_refit():
+    df = read_table('data/processed/feature_engineered_dataset.csv')
+    schema = build_schema(df[df['Year'] <= 2015])
+    results = run_backtest(df, schema, PARAMS, first_cutoff=2015, last_cutoff=2019, max_workers=2)
+
+    assert sorted(results['cutoff'].unique()) == [2015, 2016, 2017, 2018, 2019]
+    for cutoff, fold in results.groupby('cutoff'):
+        test = df[df['Year'] > cutoff]
+        assert (fold['horizon'] == fold['Year'] - cutoff).all()
+        assert fold['train_rows'].iloc[0] == (df['Year'] <= cutoff).sum()
+        assert len(fold) == len(test)
+
+    # the 2018 fold is modeling.py's train/test split
+    train, test = df[df['Year'] <= 2018], df[df['Year'] > 2018].sort_values(['Year', 'season'])
+    model = RandomForestRegressor(**PARAMS, random_state=42).fit(schema.build_matrix(train, fill_defaults=False), train[schema.target])
+    fold = holdout(results)
+    np.testing.assert_allclose(fold['Predicted_Yield'], model.predict(schema.build_matrix(test, fill_defaults=False)))
+    np.testing.assert_array_equal(fold['Avg_Yield_Kg_Ha'], test[schema.target])
+
+
+def test_error_curves():
+    results = pd.DataFrame({'cutoff': [2000, 2000, 2000, 2001], 'Year': [2001, 2001, 2002, 2002],
+                            'season': ['Maha', 'Yala', 'Maha', 'Maha'], 'horizon': [1, 1, 2, 1],
+                            'error': [3.0, -4.0, 1.0, 2.0]})
+    curves = error_curves(results, 'horizon').set_index(['horizon', 'season'])
+    assert curves.loc[(1, 'All'), 'rmse'] == np.sqrt((9 + 16 + 4) / 3)
+    assert curves.loc[(1, 'Maha'), 'mae'] == 2.5
+    assert curves.loc[(2, 'Maha'), 'n'] == 1
+    assert curves.loc[(1, 'Yala'), 'bias'] == -4.0
+    by_year = error_curves(results, 'Year').set_index(['Year', 'season'])
+    assert by_year.loc[(2002, 'Maha'), 'n'] == 2
+    assert by_year.loc[(2002, 'All'), 'rmse'] == np.sqrt((1 + 4) / 2)
@@ -0,0 +1,83 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from batch_predict import file_format, predict_matrix, read_input_chunks, score_file
+from feature_schema import build_schema
+from forest_engine import ENGINE_MAX_ROWS, FlatForest
+from storage import read_table, table_path
+
+
+def fitted():
+    df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
+    schema = build_schema(df)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(schema.build_matrix(df, fill_defaults=False), df[schema.target])
+    return df, schema, model
+
+
+def test_chunked_csv_scoring_matches_one_predict(tmp_path):
+    df, schema, model = fitted()
+    df.to_csv(tmp_path / 'inputs.csv', index=False)
+
+    n_rows = score_file(model, schema, str(tmp_path / 'inputs.csv'), str(tmp_path / 'out.csv'), chunk_size=17)
+    scored = pd.read_csv(tmp_path / 'out.csv')
+
+    assert n_rows == len(df) == len(scored)
+    # the input columns come back unchanged, followed by the prediction
+    assert list(scored.columns) == list(df.columns) + ['Predicted_Yield']
+    expected = model.predict(schema.build_matrix(pd.read_csv(tmp_path / 'inputs.csv'), fill_defaults=False))
+    np.testing.assert_allclose(scored['Predicted_Yield'], expected)
+
+
+def test_unsupported_formats_are_rejected(tmp_path):
+    assert file_format('rows.PARQUET') == 'parquet'
+    with pytest.raises(ValueError, match="Unsupported input format '.xlsx'"):
+        file_format('rows.xlsx')
+    with pytest.raises(ValueError, match='Unsupported input format'):
+        next(read_input_chunks(str(tmp_path / 'rows.json')))
+    df, schema, model = fitted()
+    df.to_csv(tmp_path / 'inputs.csv', index=False)
+    with pytest.raises(ValueError, match='Unsupported input format'):
+        score_file(model, schema, str(tmp_path / 'inputs.csv'), str(tmp_path / 'out.txt'))
+
+
+def test_pass_through_columns_keep_one_type_across_chunks(tmp_path):
+    pytest.importorskip('pyarrow')
+    df, schema, model = fitted()
+    rows = pd.concat([df] * 10, ignore_index=True)
+    # empty for every chunk but the last, then text
+    rows['note'] = None
+    rows.loc[len(rows) - 1, 'note'] = 'x'
+    rows.to_csv(tmp_path / 'inputs.csv', index=False)
+
+    for name in ['out.parquet', 'out.csv']:
+        assert score_file(model, schema, str(tmp_path / 'inputs.csv'), str(tmp_path / name), chunk_size=100) == len(rows)
+    scored = pd.read_parquet(tmp_path / 'out.parquet')
+    assert scored['note'].isna().sum() == len(rows) - 1 and scored['note'].iloc[-1] == 'x'
+    np.testing.assert_allclose(scored['Predicted_Yield'], pd.read_csv(tmp_path / 'out.csv')['Predicted_Yield'])
+    # columns the schema reads are still parsed as numbers
+    assert pd.api.types.is_numeric_dtype(scored['Sown_Ha'])
+
+
+class CountingForest:
+    def __init__(self, model):
+        self.model, self.rows = model, []
+
+    def predict(self, X):
+        self.rows.append(len(X))
+        return self.model.predict(X)
+
+
+def test_large_batches_leave_the_engine_for_sklearn():
+    df, schema, model = fitted()
+    engine = FlatForest.from_sklearn(model)
+    engine.sklearn_model = CountingForest(model)
+    X = schema.build_matrix(pd.concat([df] * (ENGINE_MAX_ROWS // len(df) + 1)), fill_defaults=False)
+
+    np.testing.assert_allclose(predict_matrix(engine, X[:ENGINE_MAX_ROWS]), model.predict(X[:ENGINE_MAX_ROWS]), atol=1e-9)
+    assert engine.sklearn_model.rows == []
+    np.testing.assert_allclose(predict_matrix(engine, X), model.predict(X), atol=1e-9)
+    assert engine.sklearn_model.rows == [len(X)]
+    # saved engines don't carry the sklearn forest
+    assert pickle.loads(pickle.dumps(engine)).sklearn_model is None
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from compression import compress_to_budget, distill
+from forest_engine import FlatForest
+
+
+def make_forest(n_rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 4))
+    y = 3000 + 400 * X[:, 0] + 100 * np.sin(X[:, 1])
+    return FlatForest.from_sklearn(RandomForestRegressor(n_estimators=40, random_state=0).fit(X, y)), X
+
+
+def test_budget_pruning_respects_the_drift_limit():
+    forest, X = make_forest()
+    compressed = compress_to_budget(forest, X, max_drift=20.0)
+
+    assert compressed.nbytes < forest.nbytes
+    assert np.sqrt(np.mean((compressed.predict(X) - forest.predict(X)) ** 2)) <= 20.0
+    with pytest.raises(ValueError, match="No pruned forest"):
+        compress_to_budget(forest, X, max_drift=20.0, max_bytes=10)
+
+
+def test_distilled_forest_tracks_the_teacher():
+    forest, X = make_forest()
+    student = distill(forest, X, 'forest')
+
+    assert student.n_estimators < forest.n_estimators
+    assert np.sqrt(np.mean((student.predict(X) - forest.predict(X)) ** 2)) < 100
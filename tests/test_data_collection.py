@@ -0,0 +1,187 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+import collector as collector_module
+from collector import Collector, CollectorError, RateLimiter
+from data_collection import fetch_openweather_data, scrape_cbsl_prices
+
+
+class StandIn(BaseHTTPRequestHandler):
+    # serves a price page, its PDFs, a weather API and a flaky endpoint
+    protocol_version = 'HTTP/1.1'
+    hits = {}
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        StandIn.hits[path] = StandIn.hits.get(path, 0) + 1
+        if path == '/prices':
+            body = b'<a href="/files/a.pdf">a</a> <a href="b.pdf">b</a> <a href="/about">about</a>'
+            if self.headers.get('If-None-Match') == '"v1"':
+                return self._send(304, b'', {'ETag': '"v1"'})
+            return self._send(200, body, {'ETag': '"v1"', 'Content-Type': 'text/html'})
+        if path.endswith('.pdf'):
+            return self._send(200, f"PDF {path}".encode())
+        if path == '/weather':
+            city = self.path.split('q=')[1].split('%2C')[0]
+            payload = {'dt': 1735689600, 'main': {'temp': 30.5, 'humidity': 80}, 'rain': {'1h': len(city)}}
+            return self._send(200, json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+        if path == '/flaky':
+            if StandIn.hits[path] < 3:
+                return self._send(503, b'busy', {'Retry-After': '0'})
+            return self._send(200, b'ok')
+        self._send(404, b'missing')
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StandIn.hits = {}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def collector(tmp_path, mode='live', **kwargs):
+    return Collector(mode=mode, rate_per_host=1000, backoff=0.01, cache_dir=str(tmp_path / 'cache'),
+                     fixtures_dir=str(tmp_path / 'fixtures'), **kwargs)
+
+
+class OnePageReader:
+    # stands in for pdfplumber: one page, one table priced by the document's length
+    def page_count(self, content):
+        return 1
+
+    def tables(self, content, pages):
+        return [(0, [[['Item', 'Date', 'Price'], ['Rice', '2025-01-01', f"LKR {len(content.read())}"]]])]
+
+
+def test_record_then_replay_without_the_server(tmp_path, server):
+    parsed = dict(reader=OnePageReader(), cache_dir=str(tmp_path / 'tables'), max_workers=1)
+
+    async def record():
+        async with collector(tmp_path, 'record') as c:
+            prices = await scrape_cbsl_prices(c, f"{server}/prices", str(tmp_path / 'live.csv'), **parsed)
+            weather = await fetch_openweather_data(c, 'key', ['Kandy', 'Matale'], str(tmp_path / 'weather.csv'), base_url=f"{server}/weather")
+            return prices, weather
+
+    prices, weather = run(record())
+    assert len(prices) == 2 and StandIn.hits['/files/a.pdf'] == 1 and StandIn.hits['/b.pdf'] == 1
+    assert weather['rainfall'].tolist() == [5, 6]
+
+    async def replay():
+        async with collector(tmp_path, 'replay') as c:
+            prices = await scrape_cbsl_prices(c, f"{server}/prices", str(tmp_path / 'replayed.csv'), **parsed)
+            weather = await fetch_openweather_data(c, 'other-key', ['Kandy', 'Matale'], str(tmp_path / 'weather.csv'), base_url=f"{server}/weather")
+            return prices, weather
+
+    hits = dict(StandIn.hits)
+    replayed_prices, replayed_weather = run(replay())
+    pd.testing.assert_frame_equal(replayed_prices, prices)
+    pd.testing.assert_frame_equal(replayed_weather, weather)
+    assert StandIn.hits == hits
+    # the API key isn't written to the recordings
+    assert not any('key' in path.read_text() for path in (tmp_path / 'fixtures').glob('*.json'))
+
+    async def missing():
+        async with collector(tmp_path, 'replay') as c:
+            await c.fetch(f"{server}/never-recorded")
+
+    with pytest.raises(CollectorError, match="No recorded fixture"):
+        run(missing())
+
+
+def test_cache_revalidates_with_etag(tmp_path, server):
+    async def fetch_twice():
+        async with collector(tmp_path) as c:
+            first = await c.fetch(f"{server}/prices")
+        async with collector(tmp_path) as c:
+            second = await c.fetch(f"{server}/prices")
+        return first, second
+
+    first, second = run(fetch_twice())
+    assert not first.from_cache and second.from_cache
+    assert second.body == first.body and second.status == 200
+
+
+def test_retries_server_errors(tmp_path, server):
+    async def fetch():
+        async with collector(tmp_path) as c:
+            response = await c.fetch(f"{server}/flaky")
+            return response, c.stats
+
+    response, stats = run(fetch())
+    assert response.body == b'ok' and stats['retries'] == 2
+
+    async def give_up():
+        async with collector(tmp_path, retries=1) as c:
+            StandIn.hits['/flaky'] = -10
+            await c.fetch(f"{server}/flaky")
+
+    with pytest.raises(CollectorError, match="Giving up"):
+        run(give_up())
+
+
+class FakeClock:
+    # time only moves when the rate limiter sleeps, so the test doesn't depend on machine load
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def test_rate_limiter_spaces_requests():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=20, burst=2, clock=clock.monotonic, sleep=clock.sleep)
+
+    async def acquire_all(n):
+        for _ in range(n):
+            await limiter.acquire()
+
+    run(acquire_all(6))
+    # a burst of 2 goes straight through, the other 4 wait 50 ms each
+    assert len(clock.sleeps) == 4
+    assert clock.now == pytest.approx(0.2)
+
+
+def test_rate_limit_and_connection_reuse(tmp_path, server, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(collector_module, 'RateLimiter', functools.partial(RateLimiter, clock=clock.monotonic, sleep=clock.sleep))
+
+    async def fetch_many():
+        async with Collector(rate_per_host=20, burst=1, max_per_host=2, cache_dir=None) as c:
+            await c.fetch_all([f"{server}/files/{i}.pdf" for i in range(6)])
+            return sum(len(conns) for conns in c.pool._idle.values())
+
+    idle = run(fetch_many())
+    # 6 requests at 20/s with no burst need 5 gaps of 50 ms
+    assert clock.now == pytest.approx(0.25)
+    assert 1 <= idle <= 2
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+from ensemble import csv_member_blocks, ensemble_features, member_features, netcdf_member_blocks, score_members
+from feature_schema import FEATURE_NAMES, build_schema
+from sklearn.ensemble import RandomForestRegressor
+
+
+def make_ensemble(n_members=23, n_districts=5, seed=0):
+    rng = np.random.default_rng(seed)
+    # three dekads a month, from a year before the 2025 Maha season to its end
+    times = pd.DatetimeIndex([pd.Timestamp(y, m, d) for y in (2024, 2025, 2026) for m in range(1, 13) for d in (1, 11, 21)])
+    times = times[(times >= '2024-09-01') & (times <= '2026-03-31')]
+    rfh = rng.gamma(2, 30, size=(n_members, n_districts, len(times)))
+    clim = rng.uniform(40, 80, size=(n_districts, len(times)))
+    return xr.Dataset(
+        {'rfh': (('member', 'adm_id', 'time'), rfh), 'rfh_avg': (('adm_id', 'time'), clim)},
+        coords={'member': np.arange(n_members), 'adm_id': 25830 + np.arange(n_districts), 'time': times},
+    )
+
+
+def test_streamed_blocks_match_the_full_cube(tmp_path):
+    ds = make_ensemble()
+    ds.to_netcdf(tmp_path / 'ensemble.nc', engine='scipy')
+    ds.to_dataframe().reset_index().rename(columns={'time': 'date'}).to_csv(tmp_path / 'ensemble.csv', index=False)
+
+    expected = pd.DataFrame({'member': ds['member'].values, **member_features(
+        ds['rfh'].values, ds['time'].values, 2025, 'Maha', {'rfh_avg': ds['rfh_avg'].values})})
+
+    from_netcdf = ensemble_features(netcdf_member_blocks(str(tmp_path / 'ensemble.nc'), member_block=4), 2025, 'Maha')
+    from_csv = ensemble_features(csv_member_blocks(str(tmp_path / 'ensemble.csv'), chunksize=500), 2025, 'Maha')
+
+    pd.testing.assert_frame_equal(from_netcdf, expected, check_dtype=False)
+    pd.testing.assert_frame_equal(from_csv, expected, check_dtype=False)
+    # 3-month sums over the season average about nine dekads of rain
+    assert (from_netcdf['r3h'] / from_netcdf['rfh']).between(7, 11).all()
+
+
+def test_members_are_scored_in_one_batch():
+    ds = make_ensemble()
+    features = ensemble_features(netcdf_blocks_in_memory(ds), 2025, 'Maha')
+
+    rng = np.random.default_rng(1)
+    train = pd.DataFrame({name: rng.uniform(0, 100, 100) for name in FEATURE_NAMES})
+    train['season'] = 'Maha'
+    train['Season_Encoded'] = 1
+    train['Year'] = 2000
+    train['Avg_Yield_Kg_Ha'] = 3000 + 10 * train['rfq']
+    schema = build_schema(train)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(schema.build_matrix(train, fill_defaults=False), train['Avg_Yield_Kg_Ha'])
+
+    scored, summary = score_members(model, schema, features, {'Year': 2025, 'season': 'Maha', 'Sown_Ha': 500.0})
+    assert len(scored) == summary['members'] == 23
+    assert summary['p5'] <= summary['p50'] <= summary['p95']
+
+
+def netcdf_blocks_in_memory(ds):
+    yield ds['member'].values, ds['rfh'].values, pd.DatetimeIndex(ds['time'].values), ds['rfh_avg'].values
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from feature_engineering import LAG_FEATURES, build_features, candidate_specs, compute_features, feature_row, update_features
+from storage import read_table, table_path
+
+
+def test_update_features_matches_full_rebuild():
+    merged = read_table(table_path('data/processed/merged_data.csv'))
+    features = build_features(merged[merged['Year'] <= 2015])
+
+    updated = update_features(features, merged)
+
+    pd.testing.assert_frame_equal(updated.reset_index(drop=True), build_features(merged).reset_index(drop=True))
+
+
+def test_update_features_matches_full_rebuild_for_candidate_specs():
+    merged = read_table(table_path('data/processed/merged_data.csv'))
+    specs = candidate_specs(['Avg_Yield_Kg_Ha', 'rfh_avg'])
+    features = build_features(merged[merged['Year'] <= 2015], specs)
+    revised = merged.copy()
+    revised.loc[revised['Year'] == 2012, 'rfh_avg'] *= 1.1
+
+    updated = update_features(features, revised, specs)
+
+    pd.testing.assert_frame_equal(updated.reset_index(drop=True), build_features(revised, specs).reset_index(drop=True))
+
+
+def test_update_features_picks_up_revised_seasons():
+    merged = read_table(table_path('data/processed/merged_data.csv'))
+    features = build_features(merged)
+    revised = merged.copy()
+    revised.loc[revised['Year'] == 2010, 'Avg_Yield_Kg_Ha'] += 100
+
+    updated = update_features(features, revised)
+
+    pd.testing.assert_frame_equal(updated.reset_index(drop=True), build_features(revised).reset_index(drop=True))
+
+
+def test_build_features_matches_groupby_shift():
+    merged = read_table(table_path('data/processed/merged_data.csv'))
+    features = build_features(merged)
+
+    expected = merged.sort_values(['Year', 'season'])
+    for lag_col, source in LAG_FEATURES.items():
+        lag = expected.groupby('season', observed=True)[source].shift(1)
+        pd.testing.assert_series_equal(features[lag_col], lag.fillna(lag.median()), check_names=False)
+
+
+def test_feature_library_matches_pandas():
+    merged = read_table(table_path('data/processed/merged_data.csv'))
+    sources = ['Avg_Yield_Kg_Ha', 'rfh_avg', 'Inflation']
+    specs = candidate_specs(sources)
+    computed = compute_features(merged, specs)
+
+    by_season = merged.sort_values(['season', 'Year']).groupby('season', observed=True)
+    for source in sources:
+        previous = by_season[source].shift(1)
+        grouped = previous.groupby(merged.loc[previous.index, 'season'], observed=True)
+        expected = {
+            f"{source}_lag2": by_season[source].shift(2),
+            f"{source}_mean3": grouped.transform(lambda s: s.rolling(3).mean()),
+            f"{source}_std5": grouped.transform(lambda s: s.rolling(5).std()),
+            f"{source}_ewm3": grouped.transform(lambda s: s.ewm(span=3).mean()),
+            f"{source}_growth": previous / by_season[source].shift(2) - 1,
+        }
+        for name, values in expected.items():
+            np.testing.assert_allclose(computed[name].to_numpy(), values.reindex(merged.index).to_numpy(), rtol=1e-9, atol=1e-9, err_msg=name)
+
+    # cross-season: a Yala row takes the Maha before it (the previous year's), a Maha row the Yala of its year
+    rows = merged.set_index(['Year', 'season'])
+    cross = computed.set_axis(rows.index)['Avg_Yield_Kg_Ha_cross']
+    assert cross[(2010, 'Yala')] == rows.loc[(2009, 'Maha'), 'Avg_Yield_Kg_Ha']
+    assert cross[(2010, 'Maha')] == rows.loc[(2010, 'Yala'), 'Avg_Yield_Kg_Ha']
+
+
+def test_feature_row_matches_the_batch_computation():
+    merged = read_table(table_path('data/processed/merged_data.csv')).sort_values(['Year', 'season']).reset_index(drop=True)
+    specs = candidate_specs(['Avg_Yield_Kg_Ha', 'rfh_avg'])
+    history, row = merged.iloc[:-1], merged.iloc[-1].to_dict()
+
+    single = feature_row(history, row, specs)
+    batch = compute_features(merged, specs).iloc[-1]
+    np.testing.assert_allclose([single[name] for name in batch.index], batch.to_numpy(), equal_nan=True)
+
+
+def test_features_follow_each_district_history():
+    merged = read_table(table_path('data/processed/merged_data.csv'))
+    specs = candidate_specs(['Avg_Yield_Kg_Ha'], lags=(1,), windows=(3,))
+    # two districts with different yields, rows interleaved
+    districts = pd.concat([merged.assign(adm_id=1), merged.assign(adm_id=2, Avg_Yield_Kg_Ha=merged['Avg_Yield_Kg_Ha'] * 2)])
+    computed = compute_features(districts, specs)
+
+    single = compute_features(merged, specs)
+    n = len(merged)
+    np.testing.assert_allclose(computed.iloc[:n].to_numpy(), single.to_numpy(), equal_nan=True)
+    np.testing.assert_allclose(computed.iloc[n:].drop(columns='Avg_Yield_Kg_Ha_growth').to_numpy(),
+                               2 * single.drop(columns='Avg_Yield_Kg_Ha_growth').to_numpy(), equal_nan=True)
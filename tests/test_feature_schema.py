@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from feature_schema import FEATURE_NAMES, FeatureSchema, build_schema
+
+
+def make_frame():
+    return pd.DataFrame({
+        'Year': [2000, 2001, 2021],
+        'season': ['Maha', 'Yala', 'Maha'],
+        'Sown_Ha': [500.0, 300.0, 450.0],
+        'Harvested_Ha': [450.0, 270.0, 400.0],
+        'rfh_avg': [60.0, 50.0, 70.0],
+        'r1h_avg': [180.0, 150.0, 200.0],
+        'r3h_avg': [550.0, 500.0, 600.0],
+        'rfq': [95.0, 90.0, 110.0],
+        'Inflation': [6.0, 14.0, 7.0],
+        'Prev_Rainfall': [58.0, 49.0, 65.0],
+    })
+
+
+def test_build_matrix_derives_features_in_schema_order():
+    schema = build_schema(make_frame())
+    X = schema.build_matrix(make_frame(), fill_defaults=False)
+
+    assert X.shape == (3, len(FEATURE_NAMES)) and X.dtype == np.float64
+    columns = dict(zip(FEATURE_NAMES, X.T))
+    np.testing.assert_allclose(columns['Sown_to_Harvest_Ratio'], [0.9, 0.9, 400 / 450])
+    np.testing.assert_array_equal(columns['Season_Encoded'], [1, 0, 1])
+    np.testing.assert_array_equal(columns['Crisis_Indicator'], [0, 1, 1])
+
+
+def test_missing_columns_use_defaults_only_when_asked(tmp_path):
+    schema = build_schema(make_frame())
+    row = {'Year': 2025, 'season': 'Yala', 'Sown_Ha': 400.0, 'Sown_to_Harvest_Ratio': 0.95, 'rfh_avg': 80.0}
+
+    with pytest.raises(ValueError, match='r1h_avg'):
+        schema.build_matrix(row, fill_defaults=False)
+
+    schema.save(tmp_path / 'model.schema.json')
+    X = FeatureSchema.load(tmp_path / 'model.schema.json').build_matrix(row)
+    assert X[0, FEATURE_NAMES.index('r1h_avg')] == 180.0
+    assert X[0, FEATURE_NAMES.index('rfh_avg')] == 80.0
+
+
+def test_check_model_rejects_schema_drift():
+    schema = build_schema(make_frame())
+
+    class Model:
+        feature_names_in_ = np.array(FEATURE_NAMES[::-1], dtype=object)
+        n_features_in_ = len(FEATURE_NAMES)
+
+    with pytest.raises(ValueError, match='trained on'):
+        schema.check_model(Model())
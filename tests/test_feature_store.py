@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from feature_engineering import build_features
+from feature_store import FeatureStore, build_feature_store
+
+
+def tables():
+    merged = pd.DataFrame({
+        'Year': [2018, 2018, 2019, 2019, 2021, 2021],
+        'season': ['Maha', 'Yala', 'Maha', 'Yala', 'Maha', 'Yala'],
+        'Avg_Yield_Kg_Ha': [4000.0, 4100.0, 4200.0, 4300.0, 3000.0, 3100.0],
+        'Sown_Ha': 500.0, 'Sown_to_Harvest_Ratio': 0.9,
+        'rfh_avg': [60.0, 40.0, 62.0, 42.0, 64.0, 44.0],
+        'r1h_avg': 180.0, 'r3h_avg': 550.0, 'rfq': [90.0, 95.0, 100.0, 105.0, 110.0, 115.0],
+    })
+    population = pd.DataFrame({'Year': [2018, 2019, 2020], 'Population': [21.0e6, 21.5e6, 21.8e6], 'Population_Growth_Rate': 0.01})
+    inflation = pd.DataFrame({'Year': [2018, 2019, 2020, 2021], 'Inflation': [2.1, 3.5, 6.2, 7.0]})
+    rainfall = pd.DataFrame({'year': [2019, 2019, 2021], 'season': ['Maha', 'Yala', 'Maha'], 'adm_id': [25830, 25830, 25830],
+                             'rfh_avg': [70.0, 50.0, 72.0], 'r1h_avg': 200.0, 'r3h_avg': 600.0, 'rfq': 80.0})
+    return build_features(merged), population, inflation, rainfall
+
+
+def test_lookups_match_the_training_lags():
+    features, population, inflation, rainfall = tables()
+    store = build_feature_store(features, population, inflation, rainfall)
+    looked_up = store.lookup(features['Year'], features['season'])
+
+    # the first season of each kind has no previous one (training fills it with the median)
+    has_prev = features['Year'].to_numpy() > 2018
+    np.testing.assert_array_equal(looked_up['Prev_Yield'][has_prev], features['Prev_Yield'].to_numpy()[has_prev])
+    np.testing.assert_array_equal(looked_up['Prev_Rainfall'][has_prev], features['Prev_Rainfall'].to_numpy()[has_prev])
+    assert np.isnan(looked_up['Prev_Yield'][~has_prev]).all()
+    np.testing.assert_array_equal(looked_up['rfq'], features['rfq'].to_numpy())
+
+
+def test_point_in_time_for_gaps_and_future_years():
+    store = build_feature_store(*tables())
+    looked_up = store.lookup([2020, 2022, 2030, 2017], ['Maha', 'Yala', 'Yala', 'Maha'])
+    # 2020 has no seasons: its lag is 2019 Maha, its macro figures are 2020's own
+    np.testing.assert_array_equal(looked_up['Prev_Yield'][:3], [4200.0, 3100.0, 3100.0])
+    np.testing.assert_array_equal(looked_up['Inflation'], [6.2, 7.0, 7.0, np.nan])
+    np.testing.assert_array_equal(looked_up['Population'], [21.8e6, 21.8e6, 21.8e6, np.nan])
+
+    # districts use their own latest rainfall, and the national rows for what they lack (yields)
+    district = store.lookup([2020, 2022, 2022], ['Maha', 'Maha', 'Yala'], [25830, 25830, 25830])
+    np.testing.assert_array_equal(district['Prev_Rainfall'], [70.0, 72.0, 50.0])
+    np.testing.assert_array_equal(district['Prev_Yield'], [4200.0, 3000.0, 3100.0])
+
+
+def test_fill_keeps_given_values_and_round_trips_mmap(tmp_path):
+    store = build_feature_store(*tables())
+    store.save(str(tmp_path))
+    loaded = FeatureStore.load(str(tmp_path))
+    assert isinstance(loaded.tables['seasons'][0], np.memmap)
+
+    row = loaded.fill({'Year': 2022, 'season': 'Maha', 'rfh_avg': 99.0, 'Inflation': np.nan})
+    assert row['rfh_avg'] == 99.0 and row['Inflation'] == 7.0 and row['Prev_Rainfall'] == 64.0
+
+    rows = loaded.fill({'Year': [2019, 2022], 'season': ['Yala', 'Yala'], 'Inflation': [1.0, np.nan]})
+    np.testing.assert_array_equal(rows['Inflation'], [1.0, 7.0])
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from forest_engine import FlatForest
+
+
+def make_data(n_rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, 5)), columns=[f"f{i}" for i in range(5)])
+    y = X['f0'] * 3 + np.sin(X['f1']) + rng.normal(scale=0.1, size=n_rows)
+    return X, y
+
+
+def test_predict_matches_sklearn():
+    X, y = make_data()
+    model = RandomForestRegressor(n_estimators=25, max_depth=None, random_state=42).fit(X, y)
+    engine = FlatForest.from_sklearn(model)
+
+    X_new, _ = make_data(n_rows=500, seed=1)
+    np.testing.assert_allclose(engine.predict(X_new), model.predict(X_new), rtol=0, atol=1e-9)
+    # chunking and column order must not change the result
+    np.testing.assert_allclose(engine.predict(X_new[X_new.columns[::-1]], chunk_rows=7), model.predict(X_new), atol=1e-9)
+
+
+def test_single_row_and_tree_outputs():
+    X, y = make_data()
+    model = RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    engine = FlatForest.from_sklearn(model)
+
+    per_tree = engine.tree_predictions(X.iloc[:1])
+    expected = np.array([tree.predict(X.iloc[:1].to_numpy()) for tree in model.estimators_])
+    np.testing.assert_allclose(per_tree, expected, atol=1e-9)
+    assert engine.predict(X.iloc[:1]).shape == (1,)
+
+
+def test_missing_values_follow_sklearn_routing():
+    X, y = make_data()
+    X.iloc[::7, 1] = np.nan
+    model = RandomForestRegressor(n_estimators=15, random_state=0).fit(X, y)
+    engine = FlatForest.from_sklearn(model)
+
+    X_new, _ = make_data(n_rows=200, seed=3)
+    X_new.iloc[::3, 1] = np.nan
+    X_new.iloc[::5, 2] = np.nan
+    np.testing.assert_allclose(engine.predict(X_new), model.predict(X_new), atol=1e-9)
+
+
+def test_float32_quantization_keeps_every_split():
+    X, y = make_data()
+    model = RandomForestRegressor(n_estimators=20, random_state=0).fit(X, y)
+    engine = FlatForest.from_sklearn(model)
+    quantized = engine.quantize()
+
+    X_new, _ = make_data(n_rows=500, seed=4)
+    assert quantized.nbytes < engine.nbytes
+    np.testing.assert_array_equal(quantized._leaves(quantized._to_matrix(X_new)), engine._leaves(engine._to_matrix(X_new)))
+
+
+def test_prune_matches_shallower_sklearn_trees():
+    X, y = make_data()
+    model = RandomForestRegressor(n_estimators=12, random_state=0).fit(X, y)
+    engine = FlatForest.from_sklearn(model)
+
+    np.testing.assert_allclose(engine.prune().predict(X), engine.predict(X), atol=1e-9)
+
+    # depth 3 collapses every deeper subtree into its root's mean, like a depth-3 tree
+    pruned = engine.prune(n_trees=5, max_depth=3)
+    assert pruned.n_estimators == 5 and pruned.max_depth == 3
+    X_new = X.to_numpy()
+    expected = []
+    for estimator in model.estimators_[:5]:
+        tree = estimator.tree_
+        node_ids = estimator.decision_path(X_new.astype(np.float32)).toarray()
+        # deepest visited node within the first 4 levels of the path
+        depth_order = [np.flatnonzero(row)[:4][-1] for row in node_ids]
+        expected.append(tree.value[depth_order, 0, 0])
+    np.testing.assert_allclose(pruned.predict(X), np.mean(expected, axis=0), atol=1e-9)
+
+
+def test_distribution_matches_per_tree_loop():
+    X, y = make_data()
+    model = RandomForestRegressor(n_estimators=30, random_state=0).fit(X, y)
+    engine = FlatForest.from_sklearn(model)
+
+    X_new, _ = make_data(n_rows=100, seed=5)
+    per_tree = np.array([tree.predict(X_new.to_numpy()) for tree in model.estimators_])
+    dist = engine.predict_distribution(X_new, quantiles=(0.05, 0.5, 0.95), chunk_rows=33)
+
+    np.testing.assert_allclose(dist['mean'], model.predict(X_new), atol=1e-9)
+    np.testing.assert_allclose(dist['std'], per_tree.std(axis=0), atol=1e-9)
+    np.testing.assert_allclose(dist['p5'], np.quantile(per_tree, 0.05, axis=0), atol=1e-9)
+    np.testing.assert_allclose(dist['p95'], np.quantile(per_tree, 0.95, axis=0), atol=1e-9)
+    assert (dist['p5'] <= dist['p50']).all() and (dist['p50'] <= dist['p95']).all()
@@ -0,0 +1,62 @@
+import pstats
+import pandas as pd
+import instrumentation
+from instrumentation import configure, measure, prometheus_text, read_records
+from pipeline import Stage, run_pipeline
+
+
+def double_rows(input_path, output_path):
+    df = pd.read_csv(input_path)
+    df = pd.concat([df, df], ignore_index=True)
+    df.to_csv(output_path, index=False)
+    return df
+
+
+def test_measure_appends_a_record_and_profiles_on_request(tmp_path, monkeypatch):
+    metrics = tmp_path / 'metrics.jsonl'
+    monkeypatch.setattr(instrumentation, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    # configure() writes os.environ; registering the variables first restores them afterwards
+    for name in ['CROP_METRICS', 'CROP_PROFILE', 'CROP_PROFILER', 'CROP_TRACE_MEMORY']:
+        monkeypatch.setenv(name, '')
+    configure(str(metrics), profile=['slow_step'], trace_memory=True)
+
+    with measure('slow_step', rows_in=3, season='Maha') as record:
+        record['rows_out'] = len([0] * 100000)
+    with measure('fast_step'):
+        pass
+
+    slow, fast = read_records(str(metrics))
+    assert slow['step'] == 'slow_step' and slow['season'] == 'Maha'
+    assert (slow['rows_in'], slow['rows_out']) == (3, 100000)
+    assert slow['wall_seconds'] >= 0 and slow['cpu_seconds'] >= 0
+    assert slow['tracemalloc_peak_bytes'] >= 100000 * 8
+    # the process-wide peak is labelled as such, the step's own share is the growth
+    assert slow['process_peak_rss_bytes'] > 0 and 0 <= slow['rss_growth_bytes'] <= slow['process_peak_rss_bytes']
+    # only the requested step is profiled
+    assert pstats.Stats(slow['profile']).total_calls > 0
+    assert 'profile' not in fast
+
+
+def test_pipeline_stages_are_recorded_from_the_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv('CROP_METRICS', str(tmp_path / 'metrics.jsonl'))
+    monkeypatch.setenv('CROP_PROFILE', '')
+    pd.DataFrame({'Year': [2001, 2002, 2003]}).to_csv(tmp_path / 'in.csv', index=False)
+    stage = Stage('double', double_rows, [str(tmp_path / 'in.csv')], [str(tmp_path / 'out.csv')])
+    assert run_pipeline([stage], state_path=str(tmp_path / 'state.json'), max_workers=1) == {'double': 'ran'}
+
+    [record] = read_records(str(tmp_path / 'metrics.jsonl'))
+    assert record['step'] == 'double' and (record['rows_in'], record['rows_out']) == (3, 6)
+
+
+def test_prometheus_text_exposes_the_latest_run_of_each_step():
+    records = [
+        {'step': 'merge', 'wall_seconds': 2.0, 'cpu_seconds': 1.5, 'rows_in': None, 'rows_out': 100},
+        {'step': 'merge', 'wall_seconds': 1.0, 'cpu_seconds': 0.5, 'rows_in': None, 'rows_out': 120},
+        {'step': 'prices', 'wall_seconds': 0.25, 'cpu_seconds': 0.25, 'rows_in': None, 'rows_out': 40},
+    ]
+    text = prometheus_text(records)
+    assert 'crop_step_runs_total{step="merge"} 2' in text
+    assert 'crop_step_wall_seconds{step="merge"} 1.0' in text
+    assert 'crop_step_rows_out{step="prices"} 40' in text
+    assert '# TYPE crop_step_wall_seconds gauge' in text
+    assert 'crop_step_rows_in' not in text
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from merge_engine import impute, join_sources
+from preprocessing import merge_all_data
+from storage import table_path
+
+
+def test_merge_all_data_matches_snapshot(tmp_path):
+    inputs = [table_path(f"data/processed/{name}.csv") for name in
+              ['seasonal_rice_prices', 'seasonal_rainfall', 'combined_yield_data', 'population', 'inflation']]
+    merged = merge_all_data(*inputs, str(tmp_path / 'merged.feather'))
+    snapshot = pd.read_csv('data/processed/merged_data.csv')
+    pd.testing.assert_frame_equal(merged.reset_index(drop=True).astype({'season': str}), snapshot, check_dtype=False)
+
+
+def test_join_sources_aligns_on_key_subsets():
+    base = pd.DataFrame({'Year': pd.array([2001, 2001, 2002], dtype='Int64'),
+                         'season': pd.Categorical(['Maha', 'Yala', 'Maha']), 'adm_id': [7, 7, 8]})
+    districts = pd.DataFrame({'Year': [2001, 2001, 2001, 2002], 'season': ['Maha', 'Maha', 'Yala', 'Yala'],
+                              'adm_id': [7, 8, 7, 8], 'rfh': [10.0, 20.0, 30.0, 40.0]})
+    national = districts.drop(columns='adm_id')
+    macro = pd.DataFrame({'Year': [2002, 2001], 'Inflation': [5.0, 4.0]})
+
+    joined = join_sources(base, [(districts, ['Year', 'season', 'adm_id']), (national.rename(columns={'rfh': 'rfh_national'}), ['Year', 'season']),
+                                 (macro, ['Year'])])
+    np.testing.assert_array_equal(joined['rfh'], [10.0, 30.0, np.nan])
+    # repeated keys are averaged
+    np.testing.assert_array_equal(joined['rfh_national'], [15.0, 30.0, np.nan])
+    np.testing.assert_array_equal(joined['Inflation'], [4.0, 4.0, 5.0])
+
+
+def frame():
+    years = np.tile(np.arange(1970, 1990), 2)
+    seasons = np.repeat(['Maha', 'Yala'], 20)
+    rfh = np.where(seasons == 'Maha', 2.0, -1.0) * (years - 1970) + np.where(seasons == 'Maha', 50.0, 30.0)
+    return pd.DataFrame({'Year': years, 'season': seasons, 'rfh': rfh, 'rfq': rfh / 2})
+
+
+def test_seasonal_median_matches_the_per_season_loop():
+    df = frame()
+    filled = impute(df, ['rfh', 'rfq'], ['season'], df['Year'] >= 1980, df['Year'] < 1980)
+
+    expected = df.copy()
+    for season in ['Maha', 'Yala']:
+        mask = expected['season'] == season
+        for col in ['rfh', 'rfq']:
+            expected.loc[mask & (expected['Year'] < 1980), col] = expected[mask & (expected['Year'] >= 1980)][col].median()
+    pd.testing.assert_frame_equal(filled, expected)
+
+
+def test_trend_and_knn_strategies():
+    df = frame()
+    gapped = df.copy()
+    gapped.loc[gapped['Year'] < 1980, ['rfh', 'rfq']] = np.nan
+    train, target = df['Year'] >= 1980, df['Year'] < 1980
+
+    # a straight line per season is recovered exactly
+    trend = impute(gapped, ['rfh', 'rfq'], ['season'], train, target, strategy='trend')
+    np.testing.assert_allclose(trend[['rfh', 'rfq']], df[['rfh', 'rfq']])
+
+    # knn: the mean of the k closest training years of the same season
+    knn = impute(gapped, ['rfh'], ['season'], train, target, strategy='knn', k=3)
+    maha_1979 = df[(df['season'] == 'Maha') & df['Year'].isin([1980, 1981, 1982])]['rfh'].mean()
+    assert knn.loc[(knn['season'] == 'Maha') & (knn['Year'] == 1979), 'rfh'].item() == maha_1979
+
+    with pytest.raises(ValueError, match="Unknown imputation strategy"):
+        impute(gapped, ['rfh'], ['season'], train, target, strategy='mice')
@@ -0,0 +1,71 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+import model_registry
+from model_registry import clear_registry, load_model, model_version
+from storage import file_digest
+
+
+@pytest.fixture
+def counted_loads(monkeypatch):
+    clear_registry()
+    loads = []
+    real_load = joblib.load
+
+    def load(path, mmap_mode=None):
+        loads.append(path)
+        return real_load(path, mmap_mode=mmap_mode)
+
+    monkeypatch.setattr(model_registry.joblib, 'load', load)
+    yield loads
+    clear_registry()
+
+
+def dump(value, path, mtime_ns=None):
+    joblib.dump(value, path)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_repeated_loads_are_served_from_the_cache(tmp_path, counted_loads):
+    path = str(tmp_path / 'model.pkl')
+    dump({'weights': np.arange(3)}, path)
+    first = load_model(path)
+    assert load_model(path) is first
+    assert counted_loads == [path]
+    assert model_version(path) == file_digest(path)
+
+
+def test_touched_file_with_the_same_content_is_not_unpickled_again(tmp_path, counted_loads):
+    path = str(tmp_path / 'model.pkl')
+    dump({'weights': np.arange(3)}, path, mtime_ns=1_000_000_000)
+    first = load_model(path)
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert load_model(path) is first
+    assert len(counted_loads) == 1
+
+
+def test_changed_content_is_reloaded(tmp_path, counted_loads):
+    path = str(tmp_path / 'model.pkl')
+    dump({'weights': np.arange(3)}, path, mtime_ns=1_000_000_000)
+    old_version = (load_model(path), model_version(path))
+    # same size and a new mtime, but a different sha256
+    dump({'weights': np.arange(3) + 1}, path, mtime_ns=2_000_000_000)
+    reloaded = load_model(path)
+    np.testing.assert_array_equal(reloaded['weights'], [1, 2, 3])
+    assert model_version(path) == file_digest(path) != old_version[1]
+    assert len(counted_loads) == 2
+
+
+def test_mmap_maps_plain_arrays_but_not_sklearn_trees(tmp_path, counted_loads):
+    path = str(tmp_path / 'model.pkl')
+    tree = DecisionTreeRegressor(max_depth=3).fit(np.arange(20.0).reshape(-1, 1), np.arange(20.0))
+    dump({'weights': np.arange(1000.0), 'tree': tree}, path)
+    loaded = load_model(path, mmap_mode='r')
+    assert isinstance(loaded['weights'], np.memmap)
+    # Tree.__setstate__ copies the node arrays, so they are not shared between processes
+    assert not isinstance(loaded['tree'].tree_.value, np.memmap)
+    # cached separately from the plain load
+    assert load_model(path) is not loaded
@@ -0,0 +1,62 @@
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pytest
+import model_zoo
+from feature_schema import FEATURE_NAMES, build_schema
+from model_zoo import evaluate_model, prepare_data, train_zoo
+
+
+def make_frame(n_rows=80, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({name: rng.normal(size=n_rows) for name in FEATURE_NAMES})
+    df['season'] = np.where(np.arange(n_rows) % 2, 'Maha', 'Yala')
+    df['Season_Encoded'] = (df['season'] == 'Maha').astype(int)
+    df['Year'] = 1980 + np.arange(n_rows) // 2
+    df['Avg_Yield_Kg_Ha'] = 3000 + 200 * df['Sown_Ha'] + rng.normal(scale=10, size=n_rows)
+    return df
+
+
+def make_data():
+    df = make_frame()
+    train_df, test_df = df[df['Year'] < 2010], df[df['Year'] >= 2010]
+    return prepare_data(train_df, test_df, build_schema(train_df), n_splits=3)
+
+
+def test_candidates_share_float32_folds_and_report_costs():
+    data = make_data()
+
+    assert data['X_train'].dtype == np.float32 and data['X_train'].flags['C_CONTIGUOUS']
+    assert len(data['folds']) == 3
+
+    row = evaluate_model('ridge', data)
+    assert row['model'] == 'ridge'
+    assert row['test_rmse'] < 50
+    for col in ['Maha_rmse', 'Yala_mae', 'fit_seconds', 'row_predict_ms', 'model_bytes']:
+        assert row[col] > 0
+
+
+def test_train_zoo_ranks_the_candidates_of_every_worker():
+    data = make_data()
+    leaderboard = train_zoo(data, ['ridge', 'linear_regression'], max_workers=2)
+
+    assert sorted(leaderboard['model']) == ['linear_regression', 'ridge']
+    assert leaderboard['cv_rmse'].is_monotonic_increasing
+    for _, row in leaderboard.iterrows():
+        expected = evaluate_model(row['model'], data)
+        assert row['cv_rmse'] == pytest.approx(expected['cv_rmse'])
+        assert row['test_rmse'] == pytest.approx(expected['test_rmse'])
+
+
+def missing_library():
+    import not_an_installed_library  # noqa: F401
+
+
+def test_train_zoo_skips_a_family_whose_import_fails(monkeypatch):
+    # the workers look the factory up in their copy of MODEL_ZOO
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip('the patched zoo only reaches forked workers')
+    monkeypatch.setitem(model_zoo.MODEL_ZOO, 'missing_library', missing_library)
+
+    leaderboard = train_zoo(make_data(), ['missing_library', 'ridge'], max_workers=2)
+    assert leaderboard['model'].tolist() == ['ridge']
@@ -0,0 +1,58 @@
+import pandas as pd
+from pdf_extraction import PRICE_COLUMNS, extract_prices
+from preprocessing import preprocess_price
+
+
+class PagedReader:
+    # stands in for pdfplumber: a "document" is lines of "page|crop|date|price"
+    def page_count(self, content):
+        return len(content.read().decode().splitlines())
+
+    def tables(self, content, pages):
+        lines = content.read().decode().splitlines()
+        return [(page, [[['Item', 'Date', 'Price'], lines[page].split('|')[1:]]]) for page in pages]
+
+
+class BrokenReader:
+    def page_count(self, content):
+        raise ValueError("not a PDF")
+
+
+def report(prices):
+    return '\n'.join(f"{page}|{crop}|{date}|{price}" for page, (crop, date, price) in enumerate(prices)).encode()
+
+
+def test_pages_fan_out_in_order_and_are_cached(tmp_path):
+    documents = {
+        'jan.pdf': report([('Rice (Samba)', '2024-01-05', 'LKR 230.00'), ('Rice (Nadu)', '2024-01-12', 'LKR 1,210.50'),
+                           ('Dhal', '2024-01-19', 'LKR 310'), ('Rice (Samba)', 'n/a', 'LKR 240')]),
+        'feb.pdf': report([('Rice (Samba)', '2024-02-02', 'LKR 250'), ('Rice (Nadu)', '2024-02-09', '-')]),
+    }
+    cache_dir = str(tmp_path / 'tables')
+    prices = extract_prices(documents, cache_dir, PagedReader(), max_workers=2, pages_per_task=1)
+
+    assert list(prices.columns) == PRICE_COLUMNS
+    assert prices['commodity'].tolist() == ['Rice (Samba)', 'Rice (Nadu)', 'Dhal', 'Rice (Samba)']
+    assert prices['price'].tolist() == [230.0, 1210.5, 310.0, 250.0]
+    assert (prices['currency'] == 'LKR').all()
+    assert len(list((tmp_path / 'tables').glob('*.json'))) == 2
+
+    # cached per document hash: nothing is opened again, and a renamed copy is a hit
+    renamed = {'january.pdf': documents['jan.pdf'], 'feb.pdf': documents['feb.pdf']}
+    pd.testing.assert_frame_equal(extract_prices(renamed, cache_dir, BrokenReader(), max_workers=1), prices)
+
+
+def test_broken_documents_are_skipped(tmp_path):
+    prices = extract_prices({'bad.pdf': b'garbage'}, str(tmp_path), BrokenReader(), max_workers=1)
+    assert prices.empty and list(prices.columns) == PRICE_COLUMNS
+    assert not list(tmp_path.glob('*.json'))
+
+
+def test_rows_feed_preprocess_price(tmp_path):
+    documents = {'a.pdf': report([('Rice (Samba)', '2024-01-05', 'LKR 200'), ('Rice (Samba)', '2024-01-20', 'LKR 220')])}
+    path = tmp_path / 'cbsl_prices.csv'
+    extract_prices(documents, None, PagedReader(), max_workers=1).to_csv(path, index=False)
+
+    aggregated = preprocess_price(str(path), str(tmp_path / 'price.csv'))
+    assert aggregated['commodity'].tolist() == ['Rice (Samba)']
+    assert aggregated['avg_price_lkr'].tolist() == [210.0]
@@ -0,0 +1,85 @@
+import importlib
+import os
+import sys
+import textwrap
+import pytest
+from pipeline import Stage, run_pipeline, stage_dependencies, stage_fingerprint
+
+
+def write_module(directory, name, source):
+    path = directory / f'{name}.py'
+    path.write_text(textwrap.dedent(source))
+    return path
+
+
+@pytest.fixture
+def code_dir(tmp_path, monkeypatch):
+    # a stage module and the helper it imports, the way preprocessing.py imports streaming.py
+    code = tmp_path / 'code'
+    code.mkdir()
+    write_module(code, 'stage_helpers', """
+        def scale(value):
+            return value * 2
+    """)
+    write_module(code, 'stage_module', """
+        from stage_helpers import scale
+
+        def copy_scaled(input_path, output_path):
+            with open(input_path) as f:
+                value = int(f.read())
+            with open(output_path, 'w') as f:
+                f.write(str(scale(value)))
+    """)
+    monkeypatch.syspath_prepend(str(code))
+    yield code
+    for name in ['stage_module', 'stage_helpers']:
+        sys.modules.pop(name, None)
+
+
+def make_stages(tmp_path):
+    stage_module = importlib.import_module('stage_module')
+    (tmp_path / 'a.txt').write_text('3')
+    return [
+        Stage('second', stage_module.copy_scaled, [str(tmp_path / 'b.txt')], [str(tmp_path / 'c.txt')]),
+        Stage('first', stage_module.copy_scaled, [str(tmp_path / 'a.txt')], [str(tmp_path / 'b.txt')]),
+    ]
+
+
+def test_stages_run_in_dependency_order_and_skip_when_unchanged(tmp_path, code_dir):
+    stages = make_stages(tmp_path)
+    state = str(tmp_path / 'state.json')
+    assert stage_dependencies(stages) == {'second': {'first'}, 'first': set()}
+
+    assert run_pipeline(stages, state_path=state, max_workers=1) == {'first': 'ran', 'second': 'ran'}
+    assert (tmp_path / 'c.txt').read_text() == '12'
+    assert run_pipeline(stages, state_path=state, max_workers=1) == {'first': 'skipped', 'second': 'skipped'}
+
+    # a deleted output reruns only the stage that produces it
+    os.remove(tmp_path / 'c.txt')
+    assert run_pipeline(stages, state_path=state, max_workers=1) == {'first': 'skipped', 'second': 'ran'}
+
+
+def test_editing_a_helper_module_reruns_the_stage(tmp_path, code_dir):
+    stages = make_stages(tmp_path)
+    before = stage_fingerprint(stages[1])
+    state = str(tmp_path / 'state.json')
+    run_pipeline(stages, state_path=state, max_workers=1)
+
+    write_module(code_dir, 'stage_helpers', """
+        def scale(value):
+            return value * 3
+    """)
+    assert stage_fingerprint(stages[1]) != before
+    assert run_pipeline(stages, state_path=state, max_workers=1) == {'first': 'ran', 'second': 'ran'}
+
+
+def test_cycles_and_missing_inputs_are_reported(tmp_path, code_dir):
+    copy_scaled = importlib.import_module('stage_module').copy_scaled
+    cycle = [Stage('x', copy_scaled, [str(tmp_path / 'y.txt')], [str(tmp_path / 'x.txt')]),
+             Stage('y', copy_scaled, [str(tmp_path / 'x.txt')], [str(tmp_path / 'y.txt')])]
+    with pytest.raises(ValueError, match='dependency cycle'):
+        run_pipeline(cycle, state_path=str(tmp_path / 'state.json'), max_workers=1)
+
+    missing = [Stage('z', copy_scaled, [str(tmp_path / 'nowhere.txt')], [str(tmp_path / 'z.txt')])]
+    with pytest.raises(FileNotFoundError, match="Stage 'z' is missing inputs"):
+        run_pipeline(missing, state_path=str(tmp_path / 'state.json'), max_workers=1)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from preprocessing import preprocess_price, preprocess_rainfall
+from seasons import add_calendar_columns
+from streaming import SeenHashes
+
+RAINFALL_COLS = ['rfh', 'rfh_avg', 'r1h', 'r1h_avg', 'r3h', 'r3h_avg', 'rfq', 'r1q', 'r3q']
+
+
+def write_rainfall(path, n_rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1981-01-01', '2024-12-31', freq='10D').strftime('%Y-%m-%d')
+    df = pd.DataFrame({
+        'date': rng.choice(dates, n_rows),
+        'adm_id': rng.choice([25830, 25832, 25840], n_rows),
+        'PCODE': rng.choice(['LK11', 'LK12', 'IN01'], n_rows),
+        'version': rng.choice(['final', 'forecast'], n_rows, p=[0.9, 0.1]),
+        'n_pixels': rng.integers(1, 100, n_rows),
+    })
+    for col in RAINFALL_COLS:
+        values = rng.gamma(2, 30, n_rows)
+        values[rng.random(n_rows) < 0.05] = np.nan
+        df[col] = values
+    df.to_csv(path, index=False)
+
+
+def read_sorted(path, keys):
+    return pd.read_csv(path).sort_values(keys).reset_index(drop=True)
+
+
+def test_streamed_rainfall_matches_in_memory(tmp_path):
+    write_rainfall(tmp_path / 'rainfall.csv')
+    preprocess_rainfall(str(tmp_path / 'rainfall.csv'), str(tmp_path / 'full.csv'))
+    preprocess_rainfall(str(tmp_path / 'rainfall.csv'), str(tmp_path / 'streamed.csv'), chunksize=211)
+
+    keys = ['year', 'season', 'adm_id']
+    pd.testing.assert_frame_equal(read_sorted(tmp_path / 'streamed.csv', keys), read_sorted(tmp_path / 'full.csv', keys))
+
+
+def test_streamed_prices_match_in_memory(tmp_path):
+    preprocess_price('data/raw/prices.csv', str(tmp_path / 'full.csv'))
+    preprocess_price('data/raw/prices.csv', str(tmp_path / 'streamed.csv'), chunksize=997)
+
+    keys = ['year', 'season', 'commodity']
+    pd.testing.assert_frame_equal(read_sorted(tmp_path / 'streamed.csv', keys), read_sorted(tmp_path / 'full.csv', keys))
+
+
+def test_maha_months_share_one_agricultural_year():
+    df = pd.DataFrame({'date': pd.to_datetime(['2020-09-01', '2020-12-31', '2021-01-15', '2021-03-31', '2021-04-01', '2021-08-31'])})
+    df = add_calendar_columns(df)
+
+    assert df['season'].tolist() == ['Maha', 'Maha', 'Maha', 'Maha', 'Yala', 'Yala']
+    assert df['year'].tolist() == [2020, 2020, 2020, 2020, 2021, 2021]
+
+
+def test_incremental_prices_match_full_rebuild(tmp_path):
+    lines = open('data/raw/prices.csv').read().splitlines(keepends=True)
+    # header and HXL tag row, then a first release without the last years
+    head, rows = lines[:2], lines[2:]
+    raw = tmp_path / 'prices.csv'
+    raw.write_text(''.join(head + [row for row in rows if row[:4] < '2020']))
+    preprocess_price(str(raw), str(tmp_path / 'incremental.csv'), incremental=True)
+
+    raw.write_text(''.join(lines))
+    preprocess_price(str(raw), str(tmp_path / 'incremental.csv'), incremental=True)
+    preprocess_price(str(raw), str(tmp_path / 'full.csv'))
+
+    keys = ['year', 'season', 'commodity']
+    pd.testing.assert_frame_equal(read_sorted(tmp_path / 'incremental.csv', keys), read_sorted(tmp_path / 'full.csv', keys),
+                                  check_exact=False, rtol=1e-12)
+
+
+def test_incremental_rainfall_matches_full_rebuild(tmp_path):
+    write_rainfall(tmp_path / 'rainfall.csv')
+    full = pd.read_csv(tmp_path / 'rainfall.csv')
+    raw = tmp_path / 'release.csv'
+    full[full['date'] < '2010-01-01'].to_csv(raw, index=False)
+    preprocess_rainfall(str(raw), str(tmp_path / 'incremental.csv'), incremental=True)
+
+    full.sort_values('date').to_csv(raw, index=False)
+    preprocess_rainfall(str(raw), str(tmp_path / 'incremental.csv'), incremental=True)
+    preprocess_rainfall(str(raw), str(tmp_path / 'full.csv'))
+
+    keys = ['year', 'season', 'adm_id']
+    pd.testing.assert_frame_equal(read_sorted(tmp_path / 'incremental.csv', keys), read_sorted(tmp_path / 'full.csv', keys),
+                                  check_exact=False, rtol=1e-12)
+
+
+def test_seen_hashes_drop_duplicates_across_chunks():
+    seen = SeenHashes()
+    np.testing.assert_array_equal(seen.add([5, 3, 5, 9]), [True, True, False, True])
+    np.testing.assert_array_equal(seen.add([9, 1, 1, 2**64 - 1]), [False, True, False, True])
+    np.testing.assert_array_equal(seen.add([]), [])
+    # one sorted uint64 array, not a set of Python ints
+    assert seen.hashes.dtype == np.uint64 and seen.hashes.tolist() == [1, 3, 5, 9, 2**64 - 1]
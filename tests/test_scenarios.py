@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from feature_schema import FEATURE_NAMES, build_schema
+from scenarios import run_sweep
+
+
+def make_model(n_rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({name: rng.uniform(0, 100, n_rows) for name in FEATURE_NAMES})
+    df['season'] = np.where(rng.random(n_rows) < 0.5, 'Maha', 'Yala')
+    df['Season_Encoded'] = (df['season'] == 'Maha').astype(int)
+    df['Year'] = 2000
+    df['Avg_Yield_Kg_Ha'] = 3000 + 10 * df['Sown_Ha'] + 5 * df['rfh_avg']
+    schema = build_schema(df)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(schema.build_matrix(df, fill_defaults=False), df['Avg_Yield_Kg_Ha'])
+    return model, schema
+
+
+def test_grid_summaries_match_scoring_every_scenario():
+    model, schema = make_model()
+    levers = {'season': ['Maha', 'Yala'], 'Sown_Ha': np.linspace(0, 100, 7), 'rfh_avg': np.linspace(0, 100, 5)}
+    result = run_sweep(model, schema, levers, pairs=[('Sown_Ha', 'rfh_avg')], chunk_rows=9)
+
+    seasons, sown, rain = np.meshgrid(*levers.values(), indexing='ij')
+    X = schema.build_matrix({'season': seasons.ravel(), 'Sown_Ha': sown.ravel(), 'rfh_avg': rain.ravel()})
+    expected = model.predict(X).reshape(seasons.shape)
+
+    assert result['n_scenarios'] == 70
+    np.testing.assert_allclose(result['mean_yield'], expected.mean())
+    np.testing.assert_allclose(result['partial_dependence']['Sown_Ha']['mean_yield'], expected.mean(axis=(0, 2)))
+    np.testing.assert_allclose(result['heatmaps'][('Sown_Ha', 'rfh_avg')].to_numpy(), expected.mean(axis=0))
+
+
+def test_monte_carlo_sweep_bins_draws():
+    model, schema = make_model()
+    levers = {'season': ['Maha'], 'Sown_Ha': {'dist': 'uniform', 'low': 0, 'high': 100}, 'Crisis_Indicator': [0, 1]}
+    result = run_sweep(model, schema, levers, n_samples=5000, n_bins=10, chunk_rows=1000)
+
+    pd_sown = result['partial_dependence']['Sown_Ha']
+    assert len(pd_sown) == 10 and pd_sown['scenarios'].sum() == 5000
+    # yield grows with sown area in the training data
+    assert pd_sown['mean_yield'].iloc[-1] > pd_sown['mean_yield'].iloc[0]
+
+    with pytest.raises(ValueError, match="n_samples"):
+        run_sweep(model, schema, levers)
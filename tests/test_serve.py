@@ -0,0 +1,120 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+from feature_schema import build_schema
+from serve import MicroBatcher, ServingStats, create_server
+from storage import read_table, table_path
+
+
+class RecordingModel:
+    # predicts the first feature and remembers every batch it was called with
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, X):
+        self.batches.append(len(X))
+        return np.asarray(X)[:, 0] * 2.0
+
+
+def test_concurrent_submits_share_one_predict_call():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_wait_ms=500.0)
+    inputs = [np.full((i + 1, 3), float(i)) for i in range(8)]
+    results = [None] * len(inputs)
+    barrier = threading.Barrier(len(inputs))
+
+    def call(i):
+        barrier.wait()
+        results[i] = batcher.submit(inputs[i]).result(timeout=10)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.batches == [sum(len(X) for X in inputs)]
+    # every caller gets back exactly the predictions of its own rows
+    for X, result in zip(inputs, results):
+        np.testing.assert_array_equal(result, X[:, 0] * 2.0)
+    assert batcher.stats.summary()['batches'] == 1
+
+
+def test_batches_close_once_max_batch_rows_is_reached():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_wait_ms=300.0, max_batch_rows=4)
+    futures = [batcher.submit(np.full((2, 3), float(i))) for i in range(3)]
+    results = [future.result(timeout=10) for future in futures]
+    assert model.batches == [4, 2]
+    np.testing.assert_array_equal(np.concatenate(results), [0, 0, 2, 2, 4, 4])
+
+
+def test_serving_stats_label_every_request_with_its_status():
+    stats = ServingStats()
+    for latency, status in [(1.0, 200), (3.0, 200), (250.0, 400)]:
+        stats.record_request(latency, status)
+    stats.record_batch(3)
+    summary = stats.summary()
+    assert summary['requests'] == 3
+    assert summary['latency_ms_p99'] > 200
+    assert summary['requests_by_status']['400'] == {'requests': 1, 'latency_ms_p50': 250.0, 'latency_ms_p99': 250.0}
+    assert summary['requests_by_status']['200']['latency_ms_p50'] == 2.0
+    assert summary['batch_size_histogram'] == {'<=4': 1}
+
+
+@pytest.fixture(scope='module')
+def server():
+    df = read_table(table_path('data/processed/feature_engineered_dataset.csv'))
+    schema = build_schema(df)
+    model = RecordingModel()
+    server, batcher = create_server(model, schema, port=0, max_wait_ms=20.0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    rows = json.loads(df.head(3).to_json(orient='records'))
+    yield f"http://127.0.0.1:{server.server_address[1]}", rows, schema.build_matrix(df.head(3), fill_defaults=False)
+    server.shutdown()
+
+
+def request(url, body=None):
+    data = None if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode('utf-8'))
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_bad_requests_get_a_400_without_failing_the_others(server):
+    url, rows, X = server
+    results = {}
+
+    def call(name, body):
+        results[name] = request(f"{url}/predict", body)
+
+    calls = [('good', {'rows': rows}), ('malformed', b'{"rows": [}'), ('bad_value', {'rows': [dict(rows[0], Sown_Ha='lots')]}),
+             ('missing', {'rows': [{'Year': 2020, 'season': 'Maha'}]}), ('empty', {'rows': []}),
+             # one row without a key the other row has is rejected, not scored with a NaN
+             ('partial', {'rows': [rows[0], {key: value for key, value in rows[1].items() if key != 'rfq'}]})]
+    threads = [threading.Thread(target=call, args=item) for item in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    status, body = results['good']
+    assert status == 200
+    np.testing.assert_allclose(body['predictions'], X[:, 0] * 2.0)
+    for name in ['malformed', 'bad_value', 'missing', 'empty', 'partial']:
+        assert results[name][0] == 400, name
+        assert 'error' in results[name][1]
+    assert 'Row 1 has keys' in results['partial'][1]['error']
+
+    status, metrics = request(f"{url}/metrics")
+    assert status == 200
+    assert metrics['requests_by_status']['200']['requests'] >= 1
+    assert metrics['requests_by_status']['400']['requests'] >= 5
+    assert metrics['requests'] == sum(entry['requests'] for entry in metrics['requests_by_status'].values())
+    assert request(f"{url}/nowhere")[0] == 404
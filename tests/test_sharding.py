@@ -0,0 +1,59 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from batch_predict import predict_batch
+from feature_schema import FEATURE_NAMES, build_schema
+from sharding import ShardRouter, train_shards
+
+
+def make_frame(n_years=30, districts=(101, 102), seed=0):
+    rng = np.random.default_rng(seed)
+    rows = [(1990 + i, season, d) for i in range(n_years) for season in ['Maha', 'Yala'] for d in districts]
+    df = pd.DataFrame(rows, columns=['Year', 'season', 'adm_id'])
+    for name in FEATURE_NAMES:
+        df[name] = rng.normal(size=len(df))
+    df['Season_Encoded'] = (df['season'] == 'Maha').astype(int)
+    df['Avg_Yield_Kg_Ha'] = 3000 + 100 * df['Sown_Ha'] + np.where(df['season'] == 'Maha', 500, 0)
+    return df
+
+
+def test_router_sends_rows_to_their_shard(tmp_path):
+    df = make_frame()
+    national = df[df['adm_id'] == 101].drop(columns='adm_id')
+    schema = build_schema(national)
+    train_shards(national, schema, df, output_dir=str(tmp_path), max_workers=2)
+
+    router = ShardRouter(str(tmp_path / 'manifest.json'))
+    assert sorted(router.shards) == ['Maha', 'Maha-101', 'Maha-102', 'Yala', 'Yala-101', 'Yala-102']
+
+    rows = df.sample(20, random_state=0).reset_index(drop=True)
+    # a district without a shard of its own falls back to its season's model
+    rows.loc[0, 'adm_id'] = 999
+    # shards are only loaded once they have rows to score
+    assert router._models == {}
+    predictions = predict_batch(router, rows, router.schema)
+    assert set(router._models) == set(router.route(rows))
+
+    X = schema.build_matrix(rows, fill_defaults=False)
+    for i, row in rows.iterrows():
+        key = row['season'] if row['adm_id'] == 999 else f"{row['season']}-{row['adm_id']}"
+        model = joblib.load(tmp_path / f"{key}.pkl")
+        np.testing.assert_allclose(predictions[i], model.predict(X[i:i + 1])[0])
+
+    # rows of one district plus a fallback row load exactly those two shards
+    lazy = ShardRouter(str(tmp_path / 'manifest.json'))
+    subset = df[(df['season'] == 'Maha') & (df['adm_id'] == 101)].head(3).reset_index(drop=True)
+    subset.loc[0, 'adm_id'] = 999
+    predict_batch(lazy, subset, lazy.schema)
+    assert sorted(lazy._models) == ['Maha', 'Maha-101']
+
+
+def test_router_rejects_unknown_seasons(tmp_path):
+    df = make_frame()
+    schema = build_schema(df)
+    train_shards(df, schema, output_dir=str(tmp_path), max_workers=1)
+
+    router = ShardRouter(str(tmp_path / 'manifest.json'))
+    with pytest.raises(ValueError, match="No shard"):
+        router.route({'season': ['Spring'], 'adm_id': [101]})
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from storage import read_table, resolve_table, table_path, table_rows, write_table
+
+
+def make_frame():
+    return pd.DataFrame({
+        'Year': pd.array([1951, 1952], dtype='Int64'),
+        'season': pd.Categorical(['Maha', 'Yala'], categories=['Maha', 'Yala'], ordered=True),
+        'Sown_to_Harvest_Ratio': [0.9464882943143813, 283 / 299],
+    })
+
+
+@pytest.mark.parametrize('fmt', ['feather', 'parquet'])
+def test_columnar_round_trip_keeps_dtypes_and_floats(tmp_path, fmt):
+    path = table_path(str(tmp_path / 'yield.csv'), fmt)
+    write_table(make_frame(), path, export_csv=True)
+
+    result = read_table(path)
+    pd.testing.assert_frame_equal(result, make_frame())
+    assert (tmp_path / 'yield.csv').exists()
+
+
+def test_read_falls_back_to_csv_snapshot(tmp_path):
+    make_frame().to_csv(tmp_path / 'yield.csv', index=False)
+
+    result = read_table(table_path(str(tmp_path / 'yield.csv'), 'feather'), columns=['Year'])
+    assert result['Year'].tolist() == [1951, 1952]
+
+
+@pytest.mark.parametrize('fmt', ['feather', 'parquet', 'csv'])
+def test_table_rows_without_reading_the_table(tmp_path, fmt):
+    path = table_path(str(tmp_path / 'yield.csv'), fmt)
+    write_table(make_frame(), path)
+    assert table_rows(path) == 2
+
+
+def test_table_rows_counts_a_last_line_without_newline(tmp_path):
+    (tmp_path / 'raw.csv').write_bytes(b'a,b\n1,2\n3,4')
+    assert table_rows(str(tmp_path / 'raw.csv')) == 2
+    assert table_rows(str(tmp_path / 'book.xlsx')) is None
+
+
+def test_stale_columnar_file_loses_to_a_newer_csv(tmp_path):
+    path = table_path(str(tmp_path / 'yield.csv'), 'feather')
+    write_table(make_frame(), path, export_csv=True)
+    assert resolve_table(path) == path
+
+    # e.g. a pull that updates the committed snapshot
+    make_frame().iloc[:1].to_csv(tmp_path / 'yield.csv', index=False)
+    stat = os.stat(path)
+    os.utime(tmp_path / 'yield.csv', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert resolve_table(path) == str(tmp_path / 'yield.csv')
+    assert len(read_table(path)) == 1
+
+
+def test_feather_numeric_columns_are_read_without_a_copy(tmp_path):
+    if not os.path.exists('/proc/self/maps'):
+        pytest.skip('needs /proc/self/maps to find the mapping')
+    path = table_path(str(tmp_path / 'wide.csv'), 'feather')
+    write_table(pd.DataFrame({'a': np.arange(200_000, dtype=np.float64), 'b': np.ones(200_000)}), path)
+
+    # keep the frame alive, the mapping goes away with it
+    df = read_table(path)
+    address = df['a'].to_numpy().__array_interface__['data'][0]
+    with open('/proc/self/maps') as f:
+        mapped = [line.split()[0].split('-') for line in f if line.rstrip().endswith(path)]
+    assert any(int(start, 16) <= address < int(end, 16) for start, end in mapped)
@@ -0,0 +1,39 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from tuning import ScoreCache, tune_forest
+
+PARAM_GRID = {'n_estimators': [5, 10], 'max_depth': [3, None], 'max_features': ['sqrt', 1.0]}
+
+
+def make_data(n_rows=120, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 4))
+    y = X[:, 0] * 3 + X[:, 1] ** 2 + rng.normal(scale=0.1, size=n_rows)
+    return X, y
+
+
+def test_grid_mode_matches_grid_search_cv(tmp_path):
+    X, y = make_data()
+    cv = TimeSeriesSplit(n_splits=3)
+    best_params, results = tune_forest(X, y, PARAM_GRID, cv, mode='grid', cache_path=str(tmp_path / 'cache.json'), n_jobs=1)
+
+    search = GridSearchCV(RandomForestRegressor(random_state=42), PARAM_GRID, cv=cv, scoring='neg_mean_squared_error').fit(X, y)
+    expected = {tuple(sorted(p.items(), key=str)): s for p, s in zip(search.cv_results_['params'], search.cv_results_['mean_test_score'])}
+    for r in results:
+        params = {name: r[name] for name in PARAM_GRID}
+        np.testing.assert_allclose(r['mean_test_score'], expected[tuple(sorted(params.items(), key=str))], rtol=1e-10)
+    assert best_params == search.best_params_
+
+
+def test_cached_cells_are_not_refitted(tmp_path, capsys):
+    X, y = make_data()
+    cv = TimeSeriesSplit(n_splits=3)
+    cache_path = str(tmp_path / 'cache.json')
+    first = tune_forest(X, y, PARAM_GRID, cv, mode='halving', eta=2, cache_path=cache_path, n_jobs=1)
+    assert len(ScoreCache(cache_path).scores) > 0
+
+    capsys.readouterr()
+    second = tune_forest(X, y, PARAM_GRID, cv, mode='halving', eta=2, cache_path=cache_path, n_jobs=1)
+    assert second == first
+    assert "Fitted 0 of" in capsys.readouterr().out
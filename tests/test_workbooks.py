@@ -0,0 +1,39 @@
+import shutil
+import pandas as pd
+import pytest
+from preprocessing import preprocess_paddy_season
+from workbooks import parse_years, read_sheet, season_layout
+
+
+def test_parse_years_handles_both_label_styles():
+    assert parse_years(['1951/52', 1952.0, '1953', None, 'Total']).tolist() == [1951, 1952, 1953, pd.NA, pd.NA]
+
+
+@pytest.mark.parametrize('season, workbook, snapshot', [
+    ('Maha', 'data/raw/Paddy_Maha_Season.xlsx', 'data/processed/yeild_maha_season.csv'),
+    ('Yala', 'data/raw/Paddy_Yala_Season.xlsx', 'data/processed/yeild_yala_season.csv'),
+])
+def test_preprocess_paddy_season_matches_snapshot(tmp_path, season, workbook, snapshot):
+    paddy = preprocess_paddy_season(workbook, str(tmp_path / 'paddy.feather'), season, cache_dir=str(tmp_path / 'cache'))
+    pd.testing.assert_frame_equal(paddy.reset_index(drop=True), pd.read_csv(snapshot), check_dtype=False)
+    assert paddy['Year'].dtype == 'int64'
+
+
+def test_unchanged_workbooks_are_read_from_the_cache(tmp_path, monkeypatch):
+    workbook = tmp_path / 'maha.xlsx'
+    shutil.copy('data/raw/Paddy_Maha_Season.xlsx', workbook)
+    layout = season_layout('Maha')
+    parsed = read_sheet(str(workbook), layout, cache_dir=str(tmp_path / 'cache'))
+    assert len(list((tmp_path / 'cache').glob('*.feather'))) == 1
+
+    def no_excel(*args, **kwargs):
+        raise AssertionError("workbook parsed again")
+
+    monkeypatch.setattr(pd, 'read_excel', no_excel)
+    pd.testing.assert_frame_equal(read_sheet(str(workbook), layout, cache_dir=str(tmp_path / 'cache')), parsed)
+
+    # any change to the workbook is a cache miss
+    with open(workbook, 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(AssertionError, match="parsed again"):
+        read_sheet(str(workbook), layout, cache_dir=str(tmp_path / 'cache'))